@@ -0,0 +1,154 @@
+"""Load test: the chat API under ASGI vs WSGI.
+
+Starts benchmarks/fake_gemini.py in-process (with --latency seconds per
+reply), then runs the project under uvicorn twice, once as ASGI
+(``fitmind.asgi``) and once as WSGI (``fitmind.wsgi``, uvicorn's thread-pool
+WSGI adapter). Each run has `--concurrency` clients posting to
+``/api/chatsessions/<id>/messages/`` for `--seconds`, each in its own session
+with unique messages, so every turn waits on the fake Gemini.
+
+Runs against a throwaway SQLite file; the project's db.sqlite3 is not touched.
+
+Usage: python benchmarks/asgi_vs_wsgi.py [--concurrency 200] [--seconds 10] [--latency 0.5]
+"""
+import argparse
+import asyncio
+import os
+import secrets
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+WORKDIR = tempfile.mkdtemp()
+FAKE_GEMINI_PORT = 8765
+os.environ.update({
+    'DJANGO_SETTINGS_MODULE': 'fitmind.settings',
+    'FITMIND_SQLITE_PATH': os.path.join(WORKDIR, 'bench.sqlite3'),
+    'GEMINI_API_BASE': f'http://127.0.0.1:{FAKE_GEMINI_PORT}',
+    'GOOGLE_API_KEY': 'fake',
+})
+
+import django
+
+django.setup()
+
+import httpx
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management import call_command
+
+from fake_gemini import serve
+from maini.models import ChatSession
+
+SERVERS = {
+    'asgi': ['fitmind.asgi:application'],
+    'wsgi': ['fitmind.wsgi:application', '--interface', 'wsgi'],
+}
+
+
+def prepare(concurrency):
+    """Migrate the scratch DB; return (cookies, session ids) for one logged-in user."""
+    call_command('migrate', verbosity=0)
+    user = User.objects.create_user('bench@example.com', 'bench@example.com', 'x')
+    store = SessionStore()
+    store[SESSION_KEY] = str(user.pk)
+    store[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+    store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    store.create()
+    # These endpoints are CSRF-protected; a matching cookie and header pass the check
+    csrf = secrets.token_hex(16)
+    cookies = {settings.SESSION_COOKIE_NAME: store.session_key, settings.CSRF_COOKIE_NAME: csrf}
+    sessions = ChatSession.objects.bulk_create(
+        [ChatSession(user=user, title=f'bench {i}', cache_opt_out=True) for i in range(concurrency)]
+    )
+    return cookies, [s.id for s in sessions]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, port):
+    cmd = [sys.executable, '-m', 'uvicorn', *SERVERS[kind], '--port', str(port),
+           '--log-level', 'warning', '--no-access-log']
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=os.environ.copy(), stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f'{kind} server did not start')
+
+
+async def client_loop(client, session_id, deadline, latencies, errors):
+    n = 0
+    while time.monotonic() < deadline:
+        n += 1
+        started = time.monotonic()
+        try:
+            resp = await client.post(f'/api/chatsessions/{session_id}/messages/',
+                                     json={'message': f'session {session_id} question {n}'})
+            resp.raise_for_status()
+        except httpx.HTTPError:
+            errors.append(1)
+        else:
+            latencies.append(time.monotonic() - started)
+
+
+async def run_load(port, cookies, session_ids, seconds):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=len(session_ids))
+    headers = {'X-CSRFToken': cookies[settings.CSRF_COOKIE_NAME]}
+    async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', cookies=cookies, headers=headers,
+                                 limits=limits, timeout=60) as client:
+        deadline = time.monotonic() + seconds
+        await asyncio.gather(*(client_loop(client, sid, deadline, latencies, errors) for sid in session_ids))
+    return sorted(latencies), len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--latency', type=float, default=0.5, help='fake Gemini seconds per reply')
+    parser.add_argument('--only', choices=sorted(SERVERS))
+    args = parser.parse_args()
+
+    gemini = serve(FAKE_GEMINI_PORT, latency=args.latency)
+    threading.Thread(target=gemini.serve_forever, daemon=True).start()
+    cookies, session_ids = prepare(args.concurrency)
+
+    print(f'{args.concurrency} concurrent clients, {args.seconds:.0f}s, Gemini latency {args.latency * 1000:.0f}ms')
+    for kind in [args.only] if args.only else ['wsgi', 'asgi']:
+        port = free_port()
+        proc = start_server(kind, port)
+        try:
+            latencies, errors = asyncio.run(run_load(port, cookies, session_ids, args.seconds))
+        finally:
+            proc.terminate()
+            proc.wait()
+        line = f'  {kind}: {len(latencies) / args.seconds:7.1f} req/s, {errors} errors'
+        if latencies:
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            line += f', p50 {statistics.median(latencies) * 1000:.0f}ms, p99 {p99 * 1000:.0f}ms'
+        print(line)
+    gemini.shutdown()
+
+
+if __name__ == '__main__':
+    main()
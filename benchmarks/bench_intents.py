@@ -0,0 +1,96 @@
+"""Microbenchmark: per-message routing cost of the chatbot intent router.
+
+Compares the original linear keyword scan (reproduced below exactly as it
+used to run inside ``generate_chatbot_response``) with the precompiled
+``maini.intents`` router, checks that both pick the same intent for every
+sample, and times the full ``generate_chatbot_response`` for reference.
+
+Usage: python benchmarks/bench_intents.py [--number N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fitmind.settings')
+
+import django
+
+django.setup()
+
+from maini.intents import route_intent
+from maini.views import generate_chatbot_response
+
+
+SAMPLES = [
+    'hi',
+    'How do I sleep better?',
+    'Give me a 15 minute workout I can do at home without any equipment',
+    'I feel so much stress at work lately and I cannot focus on anything',
+    'what should I eat for a high protein vegetarian dinner tonight',
+    'I have been feeling sad and my mood is low most days',
+    'help me build a morning routine and track my progress',
+    "sometimes I feel like I can't go on anymore",
+    'I want to understand how breathing exercises help with anxiety and worry before exams',
+    'tell me something interesting about the history of the olympic games and marathon runners',
+]
+
+
+def legacy_route(user_message):
+    # Baseline implementation: keyword sets rebuilt and scanned per intent.
+    message_lower = user_message.lower()
+    words = set(message_lower.split())
+    crisis_terms = ['suicide', 'self-harm', 'kill myself', "i can't go on", 'hurt myself', 'want to die']
+    if any(term in message_lower for term in crisis_terms):
+        return 'crisis'
+    meditation_keywords = {'meditation', 'mindfulness', 'breathe', 'breathing', 'relax', 'relaxation', 'calm', 'peace', 'focus', 'anxiety', 'worry'}
+    if any(word in words for word in meditation_keywords) or 'stress' in message_lower:
+        return 'meditation'
+    workout_keywords = {'workout', 'exercise', 'training', 'gym', 'pushups', 'squat', 'fitness', 'run', 'walk', 'cardio', 'strength', 'sport', 'active', 'move'}
+    if any(word in words for word in workout_keywords):
+        return 'workout'
+    nutrition_keywords = {'diet', 'nutrition', 'meal', 'calories', 'protein', 'vegetarian', 'vegan', 'snack', 'eat', 'food', 'weight', 'cook', 'recipe', 'healthy'}
+    if any(word in words for word in nutrition_keywords):
+        return 'nutrition'
+    sleep_keywords = {'sleep', 'insomnia', 'tired', 'rest', 'fatigue', 'sleepy', 'awake', 'bed', 'nap', 'dream'}
+    if any(word in words for word in sleep_keywords):
+        return 'sleep'
+    mood_keywords = {'mood', 'happy', 'sad', 'depressed', 'energy', 'motivation', 'confidence', 'brain', 'mental', 'feeling', 'emotion'}
+    if any(word in words for word in mood_keywords):
+        return 'mood'
+    habit_keywords = {'habit', 'routine', 'goal', 'progress', 'improve', 'change', 'build', 'track', 'consistency'}
+    if any(word in words for word in habit_keywords):
+        return 'habit'
+    return None
+
+
+def per_message_us(func, number):
+    def run():
+        for sample in SAMPLES:
+            func(sample)
+    best = min(timeit.repeat(run, number=number, repeat=5))
+    return best / (number * len(SAMPLES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    for sample in SAMPLES:
+        expected, got = legacy_route(sample), route_intent(sample.lower())
+        if expected != got:
+            sys.exit(f'Mismatch for {sample!r}: legacy={expected} router={got}')
+
+    legacy = per_message_us(legacy_route, args.number)
+    routed = per_message_us(lambda m: route_intent(m.lower()), args.number)
+    full = per_message_us(generate_chatbot_response, args.number // 4)
+
+    print(f'legacy keyword scan        {legacy:8.2f} us/message')
+    print(f'compiled intent router     {routed:8.2f} us/message  ({legacy / routed:.1f}x)')
+    print(f'generate_chatbot_response  {full:8.2f} us/message')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Microbenchmark: vectorized recommendation scoring on a synthetic catalog.
+
+Builds `--items` random rows per catalog, encodes them with
+``maini.recommend.encode`` (no database involved) and times:
+
+- one user: score every item and take the top 5 (`top_items`' hot path),
+  against a plain-Python loop computing the same scores,
+- the nightly batch: `batch_top_ids` for `--users` random profiles.
+
+Usage: python benchmarks/bench_recommend.py [--items 100000] [--users 10000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fitmind.settings')
+
+import django
+
+django.setup()
+
+import numpy as np
+
+from maini import recommend
+from maini.profiles import ProfileSnapshot
+
+MEDITATION_TYPES = ['Mindfulness', 'Breathing', 'Visualization', 'Loving Kindness', 'Sleep', 'Body Scan']
+
+
+def synthetic_rows(kind, n, rng):
+    if kind == 'workouts':
+        return [(i, f'Workout {i}', rng.choice(['low', 'medium', 'high']), rng.randint(5, 90), rng.randint(20, 900))
+                for i in range(1, n + 1)]
+    if kind == 'meals':
+        return [(i, f'Meal {i}', rng.choice(['breakfast', 'lunch', 'dinner', 'snack']), rng.randint(100, 1200),
+                 rng.uniform(0, 60), rng.uniform(0, 120), rng.uniform(0, 60), rng.randint(1, 90))
+                for i in range(1, n + 1)]
+    return [(i, f'Meditation {i}', rng.choice(['beginner', 'intermediate', 'advanced']), rng.randint(3, 60),
+             rng.choice(MEDITATION_TYPES)) for i in range(1, n + 1)]
+
+
+def synthetic_profile(user_id, rng):
+    bmi = round(rng.uniform(16, 38), 1)
+    return ProfileSnapshot(
+        user_id=user_id, age=30, height_cm=170, weight_kg=70, sleep_hours=rng.choice([5, 7, 8]),
+        activity_minutes=30, activity_level=rng.choice(['low', 'moderate', 'high']),
+        stress_level=rng.choice(['low', 'medium', 'high']), bmi=bmi,
+        bmi_category='Underweight' if bmi < 18.5 else 'Normal' if bmi < 25 else 'Overweight' if bmi < 30 else 'Obese',
+        low_sleep=rng.random() < 0.3, high_stress=rng.random() < 0.3,
+    )
+
+
+def best_of(func, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    profile = synthetic_profile(1, rng)
+    profiles = [synthetic_profile(i, rng) for i in range(args.users)]
+
+    for kind in ('workouts', 'meals', 'meditations'):
+        rows = synthetic_rows(kind, args.items, rng)
+        started = time.perf_counter()
+        matrix = recommend.encode(kind, rows)
+        encode_ms = (time.perf_counter() - started) * 1000
+        weights = matrix.vector(recommend.profile_weights(kind, profile))
+
+        def vectorized():
+            return matrix.ids[recommend._top_k(matrix.features @ weights, 5)]
+
+        features, w = matrix.features.tolist(), weights.tolist()
+
+        def python_loop():
+            scores = [sum(f * x for f, x in zip(row, w)) for row in features]
+            return sorted(scores, reverse=True)[:5]
+
+        # Ties make the ids ambiguous; the top scores must match
+        scores = matrix.features @ weights
+        if not np.allclose(python_loop(), scores[vectorized() - 1], atol=1e-4):
+            sys.exit(f'{kind}: python and numpy scoring disagree')
+
+        fast = best_of(vectorized)
+        slow = best_of(python_loop, repeat=1)
+        batch = best_of(lambda: recommend.batch_top_ids(kind, profiles, matrix=matrix), repeat=1)
+        print(f'{kind:<12} {len(matrix):>7} items x {len(matrix.columns):>2} features  '
+              f'encode {encode_ms:7.1f} ms  one user {fast * 1000:6.2f} ms (python {slow * 1000:7.1f} ms, '
+              f'{slow / fast:.0f}x)  {len(profiles)} users {batch * 1000:7.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Load test: chat-write throughput with concurrent writers.
+
+Each writer thread replays the write path of a session chat turn: read the
+recent history, insert the user message, insert the assistant reply and touch
+the session. Reader threads page through history the way the chat UI does.
+Everything runs against a throwaway test database (a temporary file for
+SQLite, ``test_<name>`` for PostgreSQL). Run it once with the configured
+database options and once with ``--baseline`` to compare:
+
+- SQLite: configured = WAL/busy_timeout/IMMEDIATE pragmas from settings,
+  baseline = Django's defaults (rollback journal, deferred transactions).
+- PostgreSQL (FITMIND_DB=postgresql): configured = persistent connections,
+  baseline = CONN_MAX_AGE=0 (a new connection per turn).
+
+``--write-behind`` hands the two messages to the transcript queue
+(maini/transcripts.py) the way the views do, instead of inserting them inline.
+
+Usage: python benchmarks/chat_write_load.py [--threads N] [--readers N] [--seconds S] [--baseline] [--write-behind]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fitmind.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import OperationalError, close_old_connections, connection, connections, transaction
+from django.utils import timezone
+
+from maini import transcripts
+from maini.models import ChatSession, SessionMessage
+
+
+def chat_turn(session, n):
+    list(session.messages.order_by('-id').values_list('role', 'content')[:40])
+    if transcripts.get_queue() is not None:
+        transcripts.record_session_messages(session, [
+            ('user', f'question {n}: how long should I rest between sets?'),
+            ('assistant', 'Rest 60-90 seconds for hypertrophy work. ' * 8),
+        ])
+        return
+    with transaction.atomic():
+        SessionMessage.objects.create(session=session, role='user', content=f'question {n}: how long should I rest between sets?')
+        SessionMessage.objects.create(session=session, role='assistant', content='Rest 60-90 seconds for hypertrophy work. ' * 8)
+        ChatSession.objects.filter(pk=session.pk).update(updated_at=timezone.now())
+
+
+def worker(session, deadline, per_turn_connection, results):
+    latencies = []
+    errors = 0
+    n = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            chat_turn(session, n)
+        except OperationalError:
+            errors += 1
+        else:
+            latencies.append(time.perf_counter() - start)
+        n += 1
+        if per_turn_connection:
+            # What the request cycle does at the end of each request
+            close_old_connections()
+    connection.close()
+    results.append((latencies, errors))
+
+
+def reader(sessions, deadline, results):
+    reads = 0
+    errors = 0
+    while time.perf_counter() < deadline:
+        try:
+            list(SessionMessage.objects.filter(session=sessions[reads % len(sessions)])
+                 .order_by('-created_at', '-id').values('id', 'role', 'content')[:20])
+        except OperationalError:
+            errors += 1
+        reads += 1
+    connection.close()
+    results.append((reads, errors))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--baseline', action='store_true', help="use Django's default database options")
+    parser.add_argument('--write-behind', action='store_true', help='queue writes instead of inserting inline')
+    args = parser.parse_args()
+
+    settings.FITMIND_TRANSCRIPT_QUEUE = dict(
+        settings.FITMIND_TRANSCRIPT_QUEUE, ENABLED=args.write_behind, SPOOL_DIR=tempfile.mkdtemp())
+
+    db = settings.DATABASES['default']
+    if connection.vendor == 'sqlite':
+        # A file-backed test DB; the default in-memory one would not show lock contention
+        db.setdefault('TEST', {})['NAME'] = os.path.join(tempfile.mkdtemp(), 'chat_write_load.sqlite3')
+        if args.baseline:
+            db['OPTIONS'] = {}
+    elif args.baseline:
+        db['CONN_MAX_AGE'] = 0
+    connection.close()
+
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        user = User.objects.create_user('loadtest@example.com', 'loadtest@example.com', 'x')
+        sessions = [ChatSession.objects.create(user=user, title=f'load {i}') for i in range(args.threads)]
+        connection.close()
+
+        results = []
+        read_results = []
+        deadline = time.perf_counter() + args.seconds
+        threads = [
+            threading.Thread(target=worker, args=(session, deadline, db.get('CONN_MAX_AGE', 0) == 0, results))
+            for session in sessions
+        ] + [threading.Thread(target=reader, args=(sessions, deadline, read_results)) for _ in range(args.readers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        queue = transcripts.get_queue()
+        if queue is not None:
+            queue.stop()
+            stored = SessionMessage.objects.count()
+
+        latencies = sorted(l for lat, _ in results for l in lat)
+        errors = sum(e for _, e in results)
+        mode = 'baseline' if args.baseline else 'configured'
+        if queue is not None:
+            mode += f', write-behind, {stored} rows stored'
+        print(f'{connection.vendor} ({mode}), {args.threads} writers, {args.readers} readers, {args.seconds:.0f}s')
+        print(f'  turns ok:      {len(latencies)}  ({len(latencies) / args.seconds:.1f}/s, {2 * len(latencies) / args.seconds:.1f} inserts/s)')
+        print(f'  reads ok:      {sum(r for r, _ in read_results) / args.seconds:.1f}/s')
+        print(f'  lock errors:   {errors + sum(e for _, e in read_results)}')
+        if latencies:
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            print(f'  latency ms:    p50 {statistics.median(latencies) * 1000:.1f}  p99 {p99 * 1000:.1f}  max {latencies[-1] * 1000:.1f}')
+    finally:
+        for alias in connections:
+            connections[alias].close()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""pytest setup for the microbenchmarks: Django, plus a throwaway test database.
+
+The database is created once per run (in memory for SQLite) with the sample
+catalog imported and one user with a profile and a long chat session; the
+project's db.sqlite3 is never opened.
+"""
+import io
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fitmind.settings')
+
+import django
+
+django.setup()
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+SESSION_MESSAGES = 200
+
+
+@pytest.fixture(scope='session')
+def bench_db():
+    """A seeded test database; yields the benchmark user."""
+    from django.contrib.auth.models import User
+
+    from maini.models import ChatSession, SessionMessage, UserProfile
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        for kind in ('workouts', 'meals', 'meditations'):
+            call_command('import_catalog', kind, os.path.join(ROOT, 'maini', 'seed', f'{kind}.json'),
+                         stdout=io.StringIO())
+        user = User.objects.create_user('bench@example.com', 'bench@example.com', 'x')
+        UserProfile.objects.create(user=user, age=34, height_cm=172, weight_kg=81, sleep_hours=5.5,
+                                   activity_minutes=20, activity_level='low', stress_level='high')
+        session = ChatSession.objects.create(user=user, title='bench')
+        SessionMessage.objects.bulk_create([
+            SessionMessage(session=session, role='user' if i % 2 == 0 else 'assistant',
+                           content=f'message {i}: ' + 'how should I plan my training week? ' * 6)
+            for i in range(SESSION_MESSAGES)
+        ])
+        yield user
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
@@ -0,0 +1,93 @@
+"""Local stand-in for the Gemini HTTP API, for tests and load runs.
+
+Serves both the one-shot endpoint used by ``call_gemini`` and the
+``streamGenerateContent?alt=sse`` endpoint used by the streaming relay.
+Point the app at it with:
+
+    GEMINI_API_BASE=http://127.0.0.1:8765 GOOGLE_API_KEY=fake python manage.py runserver
+
+Usage: python benchmarks/fake_gemini.py [--port 8765] [--chunks 8] [--chunk-delay 0.05] [--latency 0.2]
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+REPLY = (
+    "Direct Answer: Try a short guided breathing practice. "
+    "Personalized Guidance: Inhale for 4 counts, hold 1, exhale for 6 and repeat six times. "
+    "Motivation Line: Small practices add up."
+)
+
+
+def split_reply(text, chunks):
+    words = text.split(' ')
+    size = max(1, -(-len(words) // chunks))
+    return [' '.join(words[i:i + size]) + ' ' for i in range(0, len(words), size)]
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    options = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        opts = self.options
+        time.sleep(opts.latency)
+
+        if ':streamGenerateContent' in self.path:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            for piece in split_reply(REPLY, opts.chunks):
+                chunk = {'candidates': [{'content': {'role': 'model', 'parts': [{'text': piece}]}}]}
+                self.wfile.write(f'data: {json.dumps(chunk)}\r\n\r\n'.encode())
+                self.wfile.flush()
+                time.sleep(opts.chunk_delay)
+            self.close_connection = True
+            return
+
+        body = json.dumps({'candidates': [{'content': [{'type': 'output_text', 'text': REPLY}]}]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 refuses connections under load tests
+    request_queue_size = 1024
+
+
+def serve(port=8765, chunks=8, chunk_delay=0.05, latency=0.2):
+    FakeGeminiHandler.options = argparse.Namespace(chunks=chunks, chunk_delay=chunk_delay, latency=latency)
+    server = FakeGeminiServer(('127.0.0.1', port), FakeGeminiHandler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--chunks', type=int, default=8)
+    parser.add_argument('--chunk-delay', type=float, default=0.05)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds before the first byte')
+    args = parser.parse_args()
+    server = serve(args.port, args.chunks, args.chunk_delay, args.latency)
+    print(f'Fake Gemini listening on http://127.0.0.1:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
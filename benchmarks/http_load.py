@@ -0,0 +1,276 @@
+"""Load test: latency percentiles and throughput across the FitMind HTTP surface.
+
+Seeds a throwaway SQLite database (sample catalog, `--users` users with
+profiles and a chat session each), starts benchmarks/fake_gemini.py
+in-process and the project under uvicorn (ASGI by default), then runs
+`--concurrency` closed-loop clients for `--seconds` after a `--warmup`.
+Each client is logged in as one of the users and picks endpoints at random
+by weight (``ENDPOINTS``). Reports requests/s, errors and p50/p95/p99 per
+endpoint and overall.
+
+``--save-baseline`` writes the results to a JSON file (default
+benchmarks/baselines/http_load.json); ``--check`` compares a run with it and
+exits 1 when an endpoint's p95 or throughput is more than `--tolerance`
+worse, or it errors more. Compare runs made with the same options on the
+same machine.
+
+Usage: python benchmarks/http_load.py [--concurrency 20] [--seconds 15] [--latency 0.2] [--save-baseline | --check]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+WORKDIR = tempfile.mkdtemp()
+FAKE_GEMINI_PORT = 8766
+os.environ.update({
+    'DJANGO_SETTINGS_MODULE': 'fitmind.settings',
+    'FITMIND_SQLITE_PATH': os.path.join(WORKDIR, 'bench.sqlite3'),
+    'GEMINI_API_BASE': f'http://127.0.0.1:{FAKE_GEMINI_PORT}',
+    'GOOGLE_API_KEY': 'fake',
+    'FITMIND_LOG_LEVEL': 'WARNING',
+})
+
+import django
+
+django.setup()
+
+import httpx
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management import call_command
+
+from fake_gemini import serve
+from maini.models import ChatSession, SessionMessage, UserProfile
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'http_load.json')
+SERVERS = {
+    'asgi': ['fitmind.asgi:application'],
+    'wsgi': ['fitmind.wsgi:application', '--interface', 'wsgi'],
+}
+CHAT_MESSAGES = [
+    'I feel so much stress at work lately',
+    'Give me a 15 minute workout I can do at home',
+    'what should I eat for a high protein dinner',
+    'How do I sleep better?',
+    'hi',
+]
+
+# name -> (weight, method, path template, JSON body or None); {session} is the client's session id
+ENDPOINTS = {
+    'chatbot': (4, 'POST', '/chatbot/', 'chat'),
+    'chatsessions': (3, 'GET', '/api/chatsessions/', None),
+    'session_message': (1, 'POST', '/api/chatsessions/{session}/messages/', 'session'),
+    'profile': (3, 'GET', '/api/profile/', None),
+    'workouts_page': (1, 'GET', '/workouts/', None),
+    'meditation_page': (1, 'GET', '/meditation/', None),
+    'nutrition_page': (1, 'GET', '/nutrition/', None),
+    'catalog_api': (2, 'GET', '/api/catalog/workouts/?sort=-duration_minutes', None),
+    'static': (2, 'GET', '/static/style.css', None),
+}
+
+
+def prepare(users):
+    """Migrate and seed the scratch DB; return [(cookies, session id)] per user."""
+    call_command('migrate', verbosity=0)
+    for kind in ('workouts', 'meals', 'meditations'):
+        call_command('import_catalog', kind, os.path.join(ROOT, 'maini', 'seed', f'{kind}.json'), stdout=io.StringIO())
+    rng = random.Random(1)
+    logins = []
+    for i in range(users):
+        user = User.objects.create_user(f'load{i}@example.com', f'load{i}@example.com', 'x')
+        UserProfile.objects.create(
+            user=user, age=rng.randint(18, 70), height_cm=rng.randint(150, 195), weight_kg=rng.randint(50, 110),
+            sleep_hours=rng.choice([5, 6.5, 8]), activity_minutes=rng.randint(0, 90),
+            activity_level=rng.choice(['low', 'moderate', 'high']), stress_level=rng.choice(['low', 'medium', 'high']),
+        )
+        # Unique messages and no reply cache, so every session turn reaches the fake Gemini
+        session = ChatSession.objects.create(user=user, title='load', cache_opt_out=True)
+        SessionMessage.objects.bulk_create([
+            SessionMessage(session=session, role='user' if n % 2 == 0 else 'assistant', content=f'earlier message {n}')
+            for n in range(30)
+        ])
+        store = SessionStore()
+        store[SESSION_KEY] = str(user.pk)
+        store[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        store.create()
+        # CSRF-protected endpoints accept a matching cookie and header
+        cookies = {settings.SESSION_COOKIE_NAME: store.session_key, settings.CSRF_COOKIE_NAME: secrets.token_hex(16)}
+        logins.append((cookies, session.id))
+    return logins
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, port):
+    cmd = [sys.executable, '-m', 'uvicorn', *SERVERS[kind], '--port', str(port),
+           '--log-level', 'warning', '--no-access-log']
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=os.environ.copy(), stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f'{kind} server did not start')
+
+
+def body_for(kind, session_id, n):
+    if kind == 'chat':
+        return {'message': CHAT_MESSAGES[n % len(CHAT_MESSAGES)]}
+    return {'message': f'session {session_id} question {n}'}
+
+
+async def client_loop(port, cookies, session_id, names, weights, seed, start, deadline, samples):
+    rng = random.Random(seed)
+    headers = {'X-CSRFToken': cookies[settings.CSRF_COOKIE_NAME]}
+    async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', cookies=cookies, headers=headers,
+                                 timeout=60) as client:
+        n = 0
+        while time.monotonic() < deadline:
+            n += 1
+            name = rng.choices(names, weights)[0]
+            _, method, path, body = ENDPOINTS[name]
+            started = time.monotonic()
+            try:
+                resp = await client.request(method, path.format(session=session_id),
+                                            json=body_for(body, session_id, n) if body else None)
+                ok = resp.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if started >= start:
+                samples.append((name, time.monotonic() - started, ok))
+
+
+async def run_load(port, logins, concurrency, names, warmup, seconds):
+    samples = []
+    weights = [ENDPOINTS[name][0] for name in names]
+    start = time.monotonic() + warmup
+    deadline = start + seconds
+    await asyncio.gather(*(
+        client_loop(port, *logins[i % len(logins)], names, weights, i, start, deadline, samples)
+        for i in range(concurrency)
+    ))
+    return samples
+
+
+def percentile(ordered, q):
+    # Nearest-rank percentile of an ascending list
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+def summarize(latencies, errors, seconds):
+    ordered = sorted(latencies)
+    stats = {'requests': len(ordered), 'errors': errors, 'rps': round(len(ordered) / seconds, 1)}
+    for label, q in (('p50_ms', 0.50), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+        stats[label] = round(percentile(ordered, q) * 1000, 2) if ordered else None
+    return stats
+
+
+def report(samples, seconds):
+    results = {}
+    for name in sorted({name for name, _, _ in samples}):
+        mine = [s for s in samples if s[0] == name]
+        results[name] = summarize([lat for _, lat, ok in mine if ok], sum(1 for s in mine if not s[2]), seconds)
+    results['total'] = summarize([lat for _, lat, ok in samples if ok], sum(1 for s in samples if not s[2]), seconds)
+    return results
+
+
+def regressions(results, baseline, tolerance):
+    """Lines describing every endpoint that got worse than `baseline` by more than `tolerance`."""
+    found = []
+    for name, base in baseline.items():
+        now = results.get(name)
+        if now is None:
+            continue
+        if base['p95_ms'] and now['p95_ms'] and now['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            found.append(f'{name}: p95 {now["p95_ms"]}ms vs {base["p95_ms"]}ms')
+        if now['rps'] < base['rps'] * (1 - tolerance):
+            found.append(f'{name}: {now["rps"]} req/s vs {base["rps"]}')
+        if now['errors'] > base['errors']:
+            found.append(f'{name}: {now["errors"]} errors vs {base["errors"]}')
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--seconds', type=float, default=15.0)
+    parser.add_argument('--warmup', type=float, default=3.0, help='seconds of load before measuring')
+    parser.add_argument('--latency', type=float, default=0.2, help='fake Gemini seconds per reply')
+    parser.add_argument('--server', choices=sorted(SERVERS), default='asgi')
+    parser.add_argument('--endpoints', nargs='+', choices=sorted(ENDPOINTS), default=sorted(ENDPOINTS))
+    parser.add_argument('--baseline', default=BASELINE, help='baseline JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed fraction worse than the baseline')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--save-baseline', action='store_true')
+    mode.add_argument('--check', action='store_true', help='exit 1 on a regression against the baseline')
+    args = parser.parse_args()
+
+    gemini = serve(FAKE_GEMINI_PORT, latency=args.latency)
+    threading.Thread(target=gemini.serve_forever, daemon=True).start()
+    logins = prepare(args.users)
+
+    port = free_port()
+    proc = start_server(args.server, port)
+    try:
+        samples = asyncio.run(run_load(port, logins, args.concurrency, args.endpoints, args.warmup, args.seconds))
+    finally:
+        proc.terminate()
+        proc.wait()
+        gemini.shutdown()
+    results = report(samples, args.seconds)
+
+    print(f'{args.server}, {args.concurrency} clients, {args.seconds:.0f}s, Gemini latency {args.latency * 1000:.0f}ms')
+    print(f'  {"endpoint":<18} {"req/s":>8} {"errors":>7} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    for name, stats in results.items():
+        print(f'  {name:<18} {stats["rps"]:>8} {stats["errors"]:>7} {stats["p50_ms"]!s:>8} '
+              f'{stats["p95_ms"]!s:>8} {stats["p99_ms"]!s:>8}')
+
+    options = {key: getattr(args, key) for key in ('server', 'concurrency', 'users', 'seconds', 'latency', 'endpoints')}
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as fh:
+            json.dump({'options': options, 'machine': platform.platform(), 'python': platform.python_version(),
+                       'results': results}, fh, indent=2)
+            fh.write('\n')
+        print(f'baseline written to {args.baseline}')
+    elif args.check:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        if baseline['options'] != options:
+            print(f'warning: baseline was recorded with {baseline["options"]}')
+        found = regressions(results, baseline['results'], args.tolerance)
+        for line in found:
+            print(f'REGRESSION {line}')
+        if found:
+            sys.exit(1)
+        print(f'no regressions beyond {args.tolerance:.0%} of the baseline')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""pytest-benchmark microbenchmarks for the chatbot's hot paths.
+
+- `generate_chatbot_response` for one message per intent, with and without a profile
+- `UserProfile.bmi` / `bmi_category` on an unsaved profile
+- prompt building for ``api_session_messages``: the pure window/render step,
+  and `build_session_prompt` against a 200-message session (steady state:
+  the first call folds the old messages into the summary)
+
+Needs pytest-benchmark (``pip install pytest-benchmark``); skipped without it.
+Baselines are kept per machine type under benchmarks/baselines/micro; compare
+a run with the latest one there, failing on a >20% slower mean, or save a new one:
+
+Usage: python -m pytest benchmarks --benchmark-storage=benchmarks/baselines/micro --benchmark-compare --benchmark-compare-fail=mean:20%
+       python -m pytest benchmarks --benchmark-storage=benchmarks/baselines/micro --benchmark-save=baseline
+"""
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from maini.context import CHAR_BUDGET, build_session_prompt, render_prompt, select_window
+from maini.models import ChatSession, UserProfile
+from maini.profiles import ProfileSnapshot
+from maini.views import generate_chatbot_response
+
+
+MESSAGES = {
+    'greeting': 'hi',
+    'crisis': "sometimes I feel like I can't go on anymore",
+    'meditation': 'I feel so much stress at work lately and I cannot focus on anything',
+    'workout': 'Give me a 15 minute workout I can do at home without any equipment',
+    'nutrition': 'what should I eat for a high protein vegetarian dinner tonight',
+    'sleep': 'How do I sleep better?',
+    'fallback': 'tell me something interesting about the history of the olympic games',
+}
+
+
+@pytest.fixture(scope='module')
+def snapshot(bench_db):
+    return ProfileSnapshot.from_profile(bench_db.profile)
+
+
+@pytest.mark.parametrize('intent', sorted(MESSAGES))
+def test_chatbot_response(benchmark, snapshot, intent):
+    reply = benchmark(generate_chatbot_response, MESSAGES[intent], snapshot)
+    assert reply
+
+
+@pytest.mark.parametrize('intent', ['workout', 'fallback'])
+def test_chatbot_response_anonymous(benchmark, bench_db, intent):
+    assert benchmark(generate_chatbot_response, MESSAGES[intent], None)
+
+
+def test_bmi(benchmark):
+    profile = UserProfile(height_cm=172, weight_kg=81)
+    assert benchmark(profile.bmi) == 27.4
+
+
+def test_bmi_category(benchmark):
+    profile = UserProfile(height_cm=172, weight_kg=81)
+    assert benchmark(profile.bmi_category) == 'Overweight'
+
+
+def test_prompt_window(benchmark):
+    # 40 newest-first rows, as build_session_prompt reads them
+    history = [(i, 'user' if i % 2 else 'assistant', 'how should I plan my training week? ' * 6)
+               for i in range(40, 0, -1)]
+    user_text = 'and what about rest days?'
+
+    def build():
+        window, _ = select_window(history, len(user_text) + 7)
+        return render_prompt('user: earlier question', window, user_text)
+
+    prompt = benchmark(build)
+    assert len(prompt) <= CHAR_BUDGET
+
+
+def test_build_session_prompt(benchmark, bench_db):
+    session = ChatSession.objects.get(user=bench_db)
+    build_session_prompt(session, 'warm up')
+    prompt = benchmark(build_session_prompt, session, 'and what about rest days?')
+    assert prompt.endswith('user: and what about rest days?')
@@ -3,6 +3,12 @@ ASGI config for fitmind project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. ``uvicorn fitmind.asgi:application``) so the
+async streaming chat endpoint holds no worker thread while waiting on Gemini.
+Django does not handle the ASGI lifespan protocol, so it is answered here to
+pool Gemini connections on the server's event loop at startup and close them
+on shutdown.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +19,20 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fitmind.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from maini import llm  # noqa: E402  (needs the app registry loaded above)
+
+
+async def application(scope, receive, send):
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await llm.pool_async_client()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await llm.aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
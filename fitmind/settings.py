@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -36,12 +37,19 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    # Lets runserver serve static files through WhiteNoise too
+    'whitenoise.runserver_nostatic',
     'django.contrib.staticfiles',
     'maini',
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack
+    'maini.metrics.MetricsMiddleware',
+    'maini.log.RequestContextMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # WhiteNoise, made async capable so ASGI requests stay on the event loop
+    'maini.staticfiles.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -73,13 +81,67 @@ WSGI_APPLICATION = 'fitmind.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# FITMIND_DB=sqlite (default) or postgresql; see the environment variables below.
+# SQLite runs in WAL mode so readers never block the single writer, and write
+# transactions take the lock up front (IMMEDIATE) so concurrent writers queue
+# on busy_timeout instead of failing with "database is locked".
+
+FITMIND_DB = os.environ.get('FITMIND_DB', 'sqlite')
+
+if FITMIND_DB == 'postgresql':
+    # Requires psycopg (pip install "psycopg[binary]")
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'fitmind'),
+            'USER': os.environ.get('POSTGRES_USER', 'fitmind'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # Keep connections open between requests; check them before reuse
+            'CONN_MAX_AGE': int(os.environ.get('FITMIND_DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': 5,
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('FITMIND_SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA busy_timeout=5000;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA mmap_size=134217728;'
+                ),
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+
+
+# Cache
+# Catalog pages and payloads are cached with versioned keys (maini/catalog.py).
+# The version is derived from the catalog tables, so every process agrees on
+# it and sees another's change within FITMIND_CATALOG_VERSION_TTL seconds.
+# Use a shared backend such as Redis when running several processes.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fitmind',
     }
 }
 
+FITMIND_CATALOG_VERSION_TTL = 5
+# Profile snapshots (maini/profiles.py) are dropped on save only in the saving
+# process; other processes rebuild theirs after this many seconds.
+FITMIND_PROFILE_SNAPSHOT_TTL = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -116,10 +178,115 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Page CSS and JS live in maini/static, not inline, so browsers cache them
+# across page views. Outside DEBUG, `manage.py collectstatic` writes them to
+# STATIC_ROOT with content-hashed names plus .gz and .br copies (.br needs the
+# Brotli package), and WhiteNoise (maini.staticfiles) serves them with a far-future immutable
+# Cache-Control. In DEBUG they are served unhashed from the app folders.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': ('django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+                    else 'whitenoise.storage.CompressedManifestStaticFilesStorage'),
+    },
+}
+
+# Gemini relay (see maini/llm.py)
+# Split connect/read timeouts in seconds; retries apply to 429/5xx and connect
+# errors, never to read timeouts, and all attempts share GEMINI_DEADLINE seconds.
+
+GEMINI_CONNECT_TIMEOUT = 3.05
+GEMINI_READ_TIMEOUT = 20.0
+GEMINI_MAX_RETRIES = 2
+GEMINI_DEADLINE = 25.0
+GEMINI_POOL_SIZE = 20
+GEMINI_BREAKER_THRESHOLD = 5
+GEMINI_BREAKER_RESET_SECONDS = 30.0
+
+# Reply cache for Gemini (see maini/response_cache.py).
+# BACKEND: 'locmem' (per process), 'file' (shared via PATH) or None to disable.
+
+FITMIND_RESPONSE_CACHE = {
+    'BACKEND': 'locmem',
+    'TTL': 60 * 60,
+    'MAX_ENTRIES': 1000,
+    'PATH': BASE_DIR / '.cache' / 'llm_replies',
+}
 
-# When DEBUG is True Django's dev server will serve static files
-# from app `static/` folders. STATIC_URL should be an absolute
-# URL path so `{% static '...' %}` produces an absolute path.
+# Cursor pagination for the chat session/message APIs (?limit= is capped at the max)
+
+FITMIND_PAGE_SIZE = 20
+FITMIND_MAX_PAGE_SIZE = 100
+
+# Write-behind queue for chat transcripts (see maini/transcripts.py). Off by
+# default: messages are written on the request path. FITMIND_TRANSCRIPT_QUEUE=1
+# spools them to SPOOL_DIR and inserts them in batches from a background thread.
+# FSYNC trades write latency for surviving power loss, not just a crash.
+
+FITMIND_TRANSCRIPT_QUEUE = {
+    'ENABLED': os.environ.get('FITMIND_TRANSCRIPT_QUEUE', '0') == '1',
+    'BATCH_SIZE': 100,
+    'FLUSH_INTERVAL': 0.5,
+    'MAX_PENDING': 5000,
+    'SPOOL_DIR': BASE_DIR / '.cache' / 'transcripts',
+    'FSYNC': False,
+}
+
+# Chat retention (see maini/retention.py): rows older than POLICIES days are
+# moved to gzipped NDJSON archives under ARCHIVE_DIR, one file per month,
+# and deleted BATCH_SIZE rows per transaction. None keeps a table forever.
+
+FITMIND_RETENTION = {
+    'POLICIES': {
+        'chat_messages': int(os.environ.get('FITMIND_RETAIN_DAYS', 90)),
+        'session_messages': int(os.environ.get('FITMIND_RETAIN_DAYS', 90)),
+    },
+    'ARCHIVE_DIR': BASE_DIR / 'archive',
+    'BATCH_SIZE': 1000,
+}
+
+# Request metrics (see maini/metrics.py), served at /metrics in Prometheus
+# format. Requests running more than N_PLUS_ONE_THRESHOLD queries are logged
+# as N+1 suspects. With TOKEN set, /metrics needs "Authorization: Bearer <TOKEN>".
+
+FITMIND_METRICS = {
+    'ENABLED': os.environ.get('FITMIND_METRICS', '1') == '1',
+    'N_PLUS_ONE_THRESHOLD': 30,
+    'TOKEN': os.environ.get('FITMIND_METRICS_TOKEN', ''),
+}
+
+# Logging (see maini/log.py): records go through a queue to a listener thread
+# that writes JSON lines (FITMIND_LOG_FORMAT=text for plain lines) to stderr,
+# tagged with request and user ids. At the default INFO level in production,
+# logger.debug calls cost one level check; when DEBUG is enabled,
+# DEBUG_SAMPLE_RATE of requests keep their debug records.
+
+FITMIND_LOGGING = {
+    'LEVEL': os.environ.get('FITMIND_LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO'),
+    'FORMAT': os.environ.get('FITMIND_LOG_FORMAT', 'json'),
+    'DEBUG_SAMPLE_RATE': float(os.environ.get('FITMIND_LOG_DEBUG_SAMPLE', 1.0 if DEBUG else 0.01)),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'queue': {
+            '()': 'maini.log.queue_handler',
+            'fmt': FITMIND_LOGGING['FORMAT'],
+            'debug_sample_rate': FITMIND_LOGGING['DEBUG_SAMPLE_RATE'],
+        },
+    },
+    'root': {'handlers': ['queue'], 'level': 'WARNING'},
+    'loggers': {
+        'django': {'handlers': ['queue'], 'level': 'INFO', 'propagate': False},
+        'maini': {'level': FITMIND_LOGGING['LEVEL']},
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
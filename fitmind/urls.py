@@ -13,9 +13,18 @@ urlpatterns = [
     path('register/', register, name='register'),
     path('logout/', logout, name='logout'),
     path('chatbot/', chatbot, name='chatbot'),
+    path('api/chatbot/batch/', chatbot_batch, name='api_chatbot_batch'),
     # API for chat sessions
     path('api/chatsessions/', api_chatsessions, name='api_chatsessions'),
     path('api/chatsessions/<int:session_id>/messages/', api_session_messages, name='api_session_messages'),
+    path('api/chatsessions/<int:session_id>/messages/stream/', api_session_messages_stream, name='api_session_messages_stream'),
+    path('api/chatsessions/<int:session_id>/restore/', api_session_restore, name='api_session_restore'),
     path('api/profile/', api_profile, name='api_profile'),
+    path('api/dashboard/', api_dashboard, name='api_dashboard'),
+    path('api/recommendations/', api_recommendations, name='api_recommendations'),
+    path('api/catalog/<str:kind>/', api_catalog, name='api_catalog'),
+    path('api/search/', api_search, name='api_search'),
+    path('api/export/', api_export, name='api_export'),
+    path('metrics', metrics_view, name='metrics'),
     path('admin/', admin.site.urls),
 ]
@@ -1,15 +1,17 @@
 from django.contrib import admin
 from .models import (
-    Workout, MealPlan, Meditation, UserProgress,
-    UserWorkout, UserMealPlan, UserMeditation, ChatMessage
+    Workout, MealPlan, Meditation, UserProgress, DailyActivity,
+    UserWorkout, UserMealPlan, UserMeditation, ChatMessage, UserRecommendation
 )
+from .search import FullTextSearchMixin
 
 
 @admin.register(Workout)
-class WorkoutAdmin(admin.ModelAdmin):
+class WorkoutAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('name', 'intensity', 'duration_minutes', 'calories_burned', 'created_at')
     list_filter = ('intensity', 'created_at')
     search_fields = ('name', 'description')
+    fulltext_kind = 'workout'
     readonly_fields = ('created_at', 'updated_at')
     fieldsets = (
         ('Basic Information', {
@@ -26,10 +28,11 @@ class WorkoutAdmin(admin.ModelAdmin):
 
 
 @admin.register(MealPlan)
-class MealPlanAdmin(admin.ModelAdmin):
+class MealPlanAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('name', 'meal_type', 'calories', 'preparation_time', 'created_at')
     list_filter = ('meal_type', 'created_at')
     search_fields = ('name', 'description', 'ingredients')
+    fulltext_kind = 'meal'
     readonly_fields = ('created_at', 'updated_at')
     fieldsets = (
         ('Basic Information', {
@@ -49,10 +52,11 @@ class MealPlanAdmin(admin.ModelAdmin):
 
 
 @admin.register(Meditation)
-class MeditationAdmin(admin.ModelAdmin):
+class MeditationAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('title', 'difficulty', 'duration_minutes', 'meditation_type', 'created_at')
     list_filter = ('difficulty', 'meditation_type', 'created_at')
     search_fields = ('title', 'description', 'benefits')
+    fulltext_kind = 'meditation'
     readonly_fields = ('created_at', 'updated_at')
     fieldsets = (
         ('Basic Information', {
@@ -85,6 +89,9 @@ class UserProgressAdmin(admin.ModelAdmin):
         ('Fitness Metrics', {
             'fields': ('workouts_completed', 'meditation_sessions', 'total_calories_burned', 'daily_water_intake')
         }),
+        ('Streaks', {
+            'fields': ('current_streak', 'longest_streak', 'last_active_date')
+        }),
         ('Physical Measurements', {
             'fields': ('current_weight', 'goal_weight', 'height', 'age')
         }),
@@ -95,6 +102,22 @@ class UserProgressAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(DailyActivity)
+class DailyActivityAdmin(admin.ModelAdmin):
+    list_display = ('user', 'date', 'workouts', 'meditations', 'calories_burned', 'active_minutes')
+    list_filter = ('date',)
+    search_fields = ('user__username',)
+    date_hierarchy = 'date'
+
+
+@admin.register(UserRecommendation)
+class UserRecommendationAdmin(admin.ModelAdmin):
+    list_display = ('user', 'kind', 'computed_at')
+    list_filter = ('kind', 'computed_at')
+    search_fields = ('user__username',)
+    readonly_fields = ('item_ids', 'catalog_version', 'computed_at')
+
+
 @admin.register(UserWorkout)
 class UserWorkoutAdmin(admin.ModelAdmin):
     list_display = ('user', 'workout', 'completed', 'assigned_date', 'completed_date')
@@ -144,10 +167,12 @@ class UserMeditationAdmin(admin.ModelAdmin):
 
 
 @admin.register(ChatMessage)
-class ChatMessageAdmin(admin.ModelAdmin):
+class ChatMessageAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('user', 'timestamp', 'is_helpful')
     list_filter = ('timestamp', 'is_helpful')
     search_fields = ('user__username', 'message', 'response')
+    fulltext_kind = 'chat'
+    extra_search_fields = ('user__username',)
     readonly_fields = ('timestamp',)
     fieldsets = (
         ('User & Timestamp', {
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class MainiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'maini'
+
+    def ready(self):
+        # Register model signal handlers (catalog cache invalidation) and
+        # the per-connection query recorder used by the metrics middleware
+        from . import metrics, signals  # noqa: F401
@@ -0,0 +1,206 @@
+"""Versioned caching for the workout, meal plan and meditation catalogs.
+
+Each catalog has a version number derived from its table (row count, newest
+``updated_at`` and highest id), so every process computes the same number for
+the same rows. Rendered fragments and serialized data are stored under keys
+containing that version, so any insert, edit or delete invalidates everything
+at once without tracking individual keys.
+
+The version is memoized in the Django cache for ``FITMIND_CATALOG_VERSION_TTL``
+seconds; ``bump_catalog_version`` (called by the model signals in
+``maini.signals`` and by bulk loaders) drops the memo so the writing process
+sees its change at once, and other processes see it within the TTL.
+"""
+import hashlib
+import math
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
+
+from .models import Workout, MealPlan, Meditation
+
+
+CATALOG_MODELS = {
+    'workouts': Workout,
+    'meals': MealPlan,
+    'meditations': Meditation,
+}
+
+KIND_FOR_MODEL = {model: kind for kind, model in CATALOG_MODELS.items()}
+
+CATALOG_TIMEOUT = 60 * 60 * 24
+CATALOG_VERSION_TTL = getattr(settings, 'FITMIND_CATALOG_VERSION_TTL', 5)
+
+SERIALIZED_FIELDS = {
+    'workouts': ('id', 'name', 'description', 'intensity', 'duration_minutes', 'calories_burned', 'updated_at'),
+    'meals': ('id', 'name', 'meal_type', 'description', 'calories', 'protein_grams', 'carbs_grams',
+              'fat_grams', 'ingredients', 'preparation_time', 'updated_at'),
+    'meditations': ('id', 'title', 'description', 'difficulty', 'duration_minutes', 'instructor',
+                    'meditation_type', 'benefits', 'updated_at'),
+}
+
+
+def _version_key(kind):
+    return f'catalog:{kind}:version'
+
+
+def _table_version(kind):
+    # Inserts and edits move max(updated_at) (auto_now), deletes move the count
+    state = CATALOG_MODELS[kind].objects.aggregate(rows=Count('id'), newest=Max('updated_at'), last_id=Max('id'))
+    newest = state['newest'].isoformat() if state['newest'] else ''
+    digest = hashlib.sha1(f'{state["rows"]}:{newest}:{state["last_id"]}'.encode('utf-8')).digest()
+    # Fits the signed 64-bit UserRecommendation.catalog_version column
+    return int.from_bytes(digest[:8], 'big') >> 1
+
+
+def catalog_version(kind):
+    return cache.get_or_set(_version_key(kind), lambda: _table_version(kind), timeout=CATALOG_VERSION_TTL)
+
+
+def bump_catalog_version(kind):
+    cache.delete(_version_key(kind))
+    cache.set(f'catalog:{kind}:changed_at', time.time(), timeout=None)
+
+
+def catalog_data(kind):
+    """Serialized catalog rows (list of dicts), cached until the next change."""
+    key = f'catalog:{kind}:data:{catalog_version(kind)}'
+    data = cache.get(key)
+    if data is None:
+        rows = CATALOG_MODELS[kind].objects.order_by('id').values(*SERIALIZED_FIELDS[kind])
+        data = [dict(row, updated_at=row['updated_at'].isoformat()) for row in rows]
+        cache.set(key, data, CATALOG_TIMEOUT)
+    return data
+
+
+def catalog_last_modified(kind):
+    """Newest change to the catalog: max(updated_at), or the last delete if later."""
+    key = f'catalog:{kind}:last_modified:{catalog_version(kind)}'
+    stamp = cache.get(key)
+    if stamp is None:
+        newest = CATALOG_MODELS[kind].objects.aggregate(newest=Max('updated_at'))['newest']
+        stamp = newest.timestamp() if newest else 0.0
+        cache.set(key, stamp, CATALOG_TIMEOUT)
+    changed_at = cache.get(f'catalog:{kind}:changed_at') or 0.0
+    stamp = max(stamp, changed_at)
+    return datetime.fromtimestamp(stamp, tz=timezone.utc) if stamp else None
+
+
+def catalog_etag(kind, request):
+    # The page shows the visitor's name in the navbar, so the tag is per user
+    user_id = request.user.pk if request.user.is_authenticated else 'anon'
+    return f'{kind}-{catalog_version(kind)}-{user_id}'
+
+
+def catalog_page(kind):
+    """Decorate a catalog page view with ETag/Last-Modified revalidation.
+
+    Repeat visitors get a 304 without the template being rendered; the view
+    itself should pass ``catalog_version`` to its template for fragment caching.
+    """
+    def decorator(view):
+        view = condition(
+            etag_func=lambda request, *args, **kwargs: catalog_etag(kind, request),
+            last_modified_func=lambda request, *args, **kwargs: catalog_last_modified(kind),
+        )(view)
+        view = cache_control(private=True, no_cache=True)(view)
+        return vary_on_cookie(view)
+    return decorator
+
+
+# Server-side query API: per catalog, which params filter which field, which
+# fields can be sorted on and which get facet counts.
+#   choice:  ?intensity=low,high        -> field__in
+#   range:   ?calories_min=&calories_max= -> field__gte / field__lte
+CATALOG_QUERY = {
+    'workouts': {
+        'choice': {'intensity': 'intensity'},
+        'range': {'duration': 'duration_minutes', 'calories': 'calories_burned'},
+        'sort': ('name', 'duration_minutes', 'calories_burned', 'created_at'),
+        'facets': ('intensity',),
+    },
+    'meals': {
+        'choice': {'meal_type': 'meal_type'},
+        'range': {'calories': 'calories', 'protein': 'protein_grams', 'carbs': 'carbs_grams',
+                  'fat': 'fat_grams', 'prep': 'preparation_time'},
+        'sort': ('name', 'calories', 'protein_grams', 'preparation_time', 'created_at'),
+        'facets': ('meal_type',),
+    },
+    'meditations': {
+        'choice': {'difficulty': 'difficulty', 'type': 'meditation_type'},
+        'range': {'duration': 'duration_minutes'},
+        'sort': ('title', 'duration_minutes', 'created_at'),
+        'facets': ('difficulty', 'meditation_type'),
+    },
+}
+
+QUERY_CACHE_TIMEOUT = 60 * 5
+
+
+class CatalogQueryError(ValueError):
+    pass
+
+
+def parse_catalog_filters(kind, params):
+    """Translate query params into {field: {lookup: value}} for CATALOG_QUERY[kind]."""
+    spec = CATALOG_QUERY[kind]
+    filters = {}
+    for param, field in spec['choice'].items():
+        raw = params.get(param)
+        if raw:
+            filters[field] = {f'{field}__in': [v for v in raw.split(',') if v]}
+    for param, field in spec['range'].items():
+        for suffix, lookup in (('min', 'gte'), ('max', 'lte')):
+            raw = params.get(f'{param}_{suffix}')
+            if raw in (None, ''):
+                continue
+            try:
+                value = float(raw)
+            except ValueError:
+                value = None
+            if value is None or not math.isfinite(value):
+                raise CatalogQueryError(f'{param}_{suffix} must be a number')
+            filters.setdefault(field, {})[f'{field}__{lookup}'] = value
+    return filters
+
+
+def catalog_ordering(kind, sort):
+    spec = CATALOG_QUERY[kind]
+    sort = sort or 'id'
+    field = sort.lstrip('-')
+    if field != 'id' and field not in spec['sort']:
+        raise CatalogQueryError(f'cannot sort by {field}; choose from {", ".join(spec["sort"])}')
+    if field == 'id':
+        return (sort,)
+    # Ties broken by id in the same direction so keyset cursors stay stable
+    return (sort, '-id' if sort.startswith('-') else 'id')
+
+
+def catalog_facets(kind, filters):
+    """Counts per value of each facet field.
+
+    Each facet ignores its own filter (so picking 'lunch' still shows how many
+    dinners there are) but honours all the others.
+    """
+    model = CATALOG_MODELS[kind]
+    facets = {}
+    for field in CATALOG_QUERY[kind]['facets']:
+        lookups = {}
+        for other, conditions in filters.items():
+            if other != field:
+                lookups.update(conditions)
+        rows = model.objects.filter(**lookups).values(field).annotate(count=Count('id')).order_by(field)
+        facets[field] = {row[field]: row['count'] for row in rows}
+    return facets
+
+
+def query_cache_key(kind, params):
+    canonical = '&'.join(f'{k}={v}' for k, v in sorted(params.items()))
+    digest = hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+    return f'catalog:{kind}:query:{catalog_version(kind)}:{digest}'
@@ -0,0 +1,181 @@
+"""Streaming bulk import for the workout, meal plan and meditation catalogs.
+
+Rows are read one at a time from CSV, JSON Lines or a JSON array (optionally
+gzipped), validated with the model field validators (``clean_fields``) and
+upserted in batches with ``bulk_create(update_conflicts=True)`` keyed on the
+catalog's natural key (``NATURAL_KEYS``). Only one batch is held in memory,
+so file size does not matter.
+
+``bulk_create`` skips model signals, so each batch is added to the search
+index here and the catalog version is bumped once at the end.
+"""
+import csv
+import gzip
+import json
+import os
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+
+from . import search
+from .catalog import CATALOG_MODELS, bump_catalog_version
+
+
+NATURAL_KEYS = {
+    'workouts': 'name',
+    'meals': 'name',
+    'meditations': 'title',
+}
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'json'}
+READ_SIZE = 64 * 1024
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def import_fields(model):
+    """Names of the fields an import may set: no pk, timestamps or files."""
+    return [
+        f.name for f in model._meta.concrete_fields
+        if not f.primary_key and not isinstance(f, models.FileField)
+        and not getattr(f, 'auto_now', False) and not getattr(f, 'auto_now_add', False)
+    ]
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    fmt = FORMATS.get(os.path.splitext(name)[1].lower())
+    if fmt is None:
+        raise ImportFormatError(f'cannot tell the format of {path}; pass one of {", ".join(sorted(set(FORMATS.values())))}')
+    return fmt
+
+
+def _open(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8-sig', newline='')
+    return open(path, encoding='utf-8-sig', newline='')
+
+
+def _json_array(fh):
+    """Yield the elements of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    started = False
+    eof = False
+    while True:
+        # Skip whitespace and separators
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != '[':
+                    raise ImportFormatError('a .json catalog must be a list of objects')
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                if eof:
+                    raise ImportFormatError('truncated or invalid JSON')
+                value = None
+            else:
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(buffer) or eof:
+                    yield value
+                    pos = end
+                    continue
+        if eof:
+            raise ImportFormatError('truncated JSON: missing closing ]')
+        chunk = fh.read(READ_SIZE)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def read_rows(path, fmt=None):
+    """Yield (position, row dict) from a catalog file; position is a line or element number."""
+    fmt = fmt or detect_format(path)
+    with _open(path) as fh:
+        if fmt == 'csv':
+            reader = csv.DictReader(fh)
+            for row in reader:
+                yield reader.line_num, row
+        elif fmt == 'jsonl':
+            for number, line in enumerate(fh, 1):
+                if line.strip():
+                    try:
+                        yield number, json.loads(line)
+                    except ValueError as e:
+                        raise ImportFormatError(f'line {number}: {e}')
+        elif fmt == 'json':
+            yield from enumerate(_json_array(fh), 1)
+        else:
+            raise ImportFormatError(f'unknown format {fmt!r}')
+
+
+def _build(model, fields, exclude, row):
+    if not isinstance(row, dict):
+        raise ValidationError('each row must be an object')
+    obj = model(**{f: row[f] for f in fields if f in row and row[f] is not None})
+    # Converts CSV strings to field types and runs validators and choices
+    obj.clean_fields(exclude=exclude)
+    return obj
+
+
+def _upsert(model, key, fields, objs):
+    update_fields = [f for f in fields if f != key] + ['updated_at']
+    with transaction.atomic():
+        model.objects.bulk_create(objs, update_conflicts=True, unique_fields=[key], update_fields=update_fields)
+        if any(obj.pk is None for obj in objs):
+            # Backends that cannot return ids from an upsert
+            ids = dict(model.objects.filter(**{f'{key}__in': [getattr(o, key) for o in objs]}).values_list(key, 'pk'))
+            for obj in objs:
+                obj.pk = ids.get(getattr(obj, key))
+        search.index_objects([obj for obj in objs if obj.pk is not None])
+
+
+def import_catalog(kind, path, fmt=None, batch_size=1000, dry_run=False, on_error=None):
+    """Validate and upsert every row of `path` into catalog `kind`.
+
+    `on_error(position, message)` is called for each invalid row, which is
+    skipped. Returns a dict of counts: read, imported, invalid, duplicates
+    (later rows in the same batch replace earlier ones with the same key).
+    """
+    model = CATALOG_MODELS[kind]
+    key = NATURAL_KEYS[kind]
+    fields = import_fields(model)
+    exclude = [f.name for f in model._meta.fields if f.name not in fields]
+    counts = {'read': 0, 'imported': 0, 'invalid': 0, 'duplicates': 0}
+    batch = {}
+
+    def flush():
+        if batch and not dry_run:
+            _upsert(model, key, fields, list(batch.values()))
+        counts['imported'] += len(batch)
+        batch.clear()
+
+    for position, row in read_rows(path, fmt):
+        counts['read'] += 1
+        try:
+            obj = _build(model, fields, exclude, row)
+        except ValidationError as e:
+            counts['invalid'] += 1
+            if on_error:
+                errors = e.message_dict if hasattr(e, 'error_dict') else {'row': e.messages}
+                on_error(position, '; '.join(f'{field}: {" ".join(msgs)}' for field, msgs in errors.items()))
+            continue
+        natural_key = getattr(obj, key)
+        if natural_key in batch:
+            counts['duplicates'] += 1
+        batch[natural_key] = obj
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    if counts['imported'] and not dry_run:
+        bump_catalog_version(kind)
+    return counts
@@ -0,0 +1,99 @@
+"""Prompt context for chat sessions.
+
+Only the tail of a session is read: newest messages first, with a LIMIT, until a
+character budget is used up. Anything older that drops out of the window is
+folded once into ``ChatSession.summary`` and never read again, so building a
+prompt costs the same for a 10-message session and a 10,000-message one.
+"""
+from django.conf import settings
+
+from .models import ChatSession
+from .transcripts import pending_for_session
+
+
+CHAR_BUDGET = getattr(settings, 'FITMIND_CONTEXT_CHAR_BUDGET', 6000)
+MAX_MESSAGES = getattr(settings, 'FITMIND_CONTEXT_MAX_MESSAGES', 40)
+SUMMARY_BUDGET = getattr(settings, 'FITMIND_CONTEXT_SUMMARY_BUDGET', 1500)
+SUMMARY_LINE_CHARS = 160
+
+
+def summarize_line(role, content):
+    text = ' '.join(content.split())
+    if len(text) > SUMMARY_LINE_CHARS:
+        text = text[:SUMMARY_LINE_CHARS - 1].rstrip() + '…'
+    return f'{role}: {text}'
+
+
+def fold_summary(summary, lines, budget=SUMMARY_BUDGET):
+    """Append summary lines, dropping the oldest ones once over budget."""
+    kept = [line for line in summary.split('\n') if line] + list(lines)
+    total = sum(len(line) + 1 for line in kept)
+    while kept and total > budget:
+        total -= len(kept.pop(0)) + 1
+    return '\n'.join(kept)
+
+
+def select_window(history, reserved, budget=CHAR_BUDGET):
+    """Split newest-first (id, role, content) rows into (kept, dropped).
+
+    `kept` is oldest-first and fits in `budget - reserved` characters;
+    `dropped` holds the older rows that did not fit, oldest-first.
+    """
+    remaining = budget - reserved
+    kept = []
+    for i, (msg_id, role, content) in enumerate(history):
+        cost = len(role) + len(content) + 3
+        if cost > remaining:
+            return kept[::-1], list(history[i:])[::-1]
+        remaining -= cost
+        kept.append((msg_id, role, content))
+    return kept[::-1], []
+
+
+def render_prompt(summary, window, user_text):
+    parts = []
+    if summary:
+        parts.append(f'summary: Earlier in this conversation -\n{summary}')
+    parts.extend(f'{role}: {content}' for _, role, content in window)
+    parts.append(f'user: {user_text}')
+    return '\n'.join(parts)
+
+
+def build_session_prompt(session, user_text):
+    """Return the prompt for `user_text` (not yet saved) in `session`.
+
+    Reads at most MAX_MESSAGES recent rows, plus any rows between the stored
+    summary and that window (only non-empty the first time a long session
+    is seen), with messages still in the write-behind queue in front of them.
+    Updates the session's rolling summary when messages age out.
+    """
+    # Read the queue before the table: a row mid-flush may then appear twice, never zero times
+    pending = pending_for_session(session.pk)
+    history = list(
+        session.messages.filter(id__gt=session.summary_through)
+        .order_by('-id')
+        .values_list('id', 'role', 'content')[:MAX_MESSAGES]
+    )
+    # Leave room for the user's line and a full-size summary
+    reserved = len(user_text) + 7 + SUMMARY_BUDGET + 40
+    window, dropped = select_window(pending + history, reserved)
+    # Queued rows have no id yet, so they can't be summarized; they are just left out
+    dropped = [row for row in dropped if row[0] is not None]
+
+    if len(history) == MAX_MESSAGES:
+        # Rows older than the fetched tail that were never summarized
+        oldest = history[-1][0]
+        backlog = session.messages.filter(id__gt=session.summary_through, id__lt=oldest).order_by('id')
+        dropped = list(backlog.values_list('id', 'role', 'content').iterator()) + dropped
+
+    if dropped:
+        summary = fold_summary(session.summary, (summarize_line(role, content) for _, role, content in dropped))
+        through = dropped[-1][0]
+        # Conditional, so a concurrent turn that folded first is not overwritten; then use its summary
+        if ChatSession.objects.filter(pk=session.pk, summary_through=session.summary_through).update(
+                summary=summary, summary_through=through):
+            session.summary, session.summary_through = summary, through
+        else:
+            session.refresh_from_db(fields=['summary', 'summary_through'])
+
+    return render_prompt(session.summary, window, user_text)
@@ -0,0 +1,163 @@
+"""Data for the personalized dashboard API.
+
+`build_dashboard` loads a user's assignments and progress in a fixed number
+of queries however many rows they have: one for the user joined to
+UserProgress, one prefetch each for workouts, meal plans and meditations
+(each joined to its catalog row), and one for the weekly rollup. Each
+list holds at most ASSIGNMENTS_PER_LIST rows, newest first.
+Recommendations come from the cached profile snapshot and the in-process
+catalog matrices of ``maini.recommend``, so they add no queries once those
+are warm.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import F, Prefetch, Window
+from django.db.models.functions import RowNumber
+
+from .models import UserMealPlan, UserMeditation, UserProgress, UserWorkout
+from .profiles import get_snapshot
+from .progress import live_streak, weekly_totals
+from .recommend import top_items
+
+
+RECOMMENDATIONS_PER_KIND = 3
+ASSIGNMENTS_PER_LIST = getattr(settings, 'FITMIND_DASHBOARD_ASSIGNMENTS', 50)
+
+
+def _newest(queryset, *partition):
+    # The ASSIGNMENTS_PER_LIST newest rows per user (and per `partition` value) in the same single query
+    return queryset.annotate(row=Window(
+        RowNumber(), partition_by=[F('user_id'), *map(F, partition)],
+        order_by=[F('assigned_date').desc(), F('id').desc()],
+    )).filter(row__lte=ASSIGNMENTS_PER_LIST)
+
+
+def _user_with_assignments(user_id):
+    return (
+        User.objects.filter(pk=user_id)
+        .select_related('userprogress')
+        .prefetch_related(
+            Prefetch('user_workouts', queryset=_newest(UserWorkout.objects.select_related('workout'), 'completed')
+                     .order_by('-assigned_date', '-id')),
+            Prefetch('user_meal_plans', queryset=_newest(UserMealPlan.objects.filter(is_active=True)
+                                                         .select_related('meal_plan'))
+                     .order_by('meal_plan__meal_type', 'id')),
+            Prefetch('user_meditations', queryset=_newest(UserMeditation.objects.select_related('meditation'),
+                                                          'completed')
+                     .order_by('-assigned_date', '-id')),
+        )
+        .get()
+    )
+
+
+def _workout(assignment):
+    w = assignment.workout
+    return {
+        'id': assignment.id,
+        'workout': {'id': w.id, 'name': w.name, 'intensity': w.intensity,
+                    'duration_minutes': w.duration_minutes, 'calories_burned': w.calories_burned},
+        'assigned_date': assignment.assigned_date.isoformat(),
+        'completed_date': assignment.completed_date.isoformat() if assignment.completed_date else None,
+    }
+
+
+def _meditation(assignment):
+    m = assignment.meditation
+    return {
+        'id': assignment.id,
+        'meditation': {'id': m.id, 'title': m.title, 'difficulty': m.difficulty,
+                       'duration_minutes': m.duration_minutes, 'meditation_type': m.meditation_type},
+        'assigned_date': assignment.assigned_date.isoformat(),
+        'completed_date': assignment.completed_date.isoformat() if assignment.completed_date else None,
+    }
+
+
+def _meal_plan(assignment):
+    m = assignment.meal_plan
+    return {
+        'id': assignment.id,
+        'meal_plan': {'id': m.id, 'name': m.name, 'meal_type': m.meal_type, 'calories': m.calories,
+                      'protein_grams': m.protein_grams, 'preparation_time': m.preparation_time},
+        'assigned_date': assignment.assigned_date.isoformat(),
+    }
+
+
+def _items(kind, snapshot, exclude):
+    label = 'title' if kind == 'meditations' else 'name'
+    return [{'id': item_id, label: name}
+            for item_id, name, _ in top_items(kind, snapshot, RECOMMENDATIONS_PER_KIND, exclude)]
+
+
+def recommendations(snapshot, assigned):
+    """Catalog suggestions scored by ``maini.recommend``, skipping items already assigned.
+
+    `assigned` maps catalog kind ('workouts', 'meals', 'meditations') to a set of ids.
+    """
+    if snapshot is None:
+        return [{'kind': 'profile', 'reason': 'Complete your profile to get personalized suggestions.', 'items': []}]
+
+    overweight = snapshot.bmi_category in ('Overweight', 'Obese')
+    if overweight:
+        workouts = f'Your BMI is {snapshot.bmi:.1f} ({snapshot.bmi_category}).'
+    elif snapshot.activity_level == 'low':
+        workouts = 'Easy workouts to build a routine.'
+    else:
+        workouts = f'Matched to your {snapshot.activity_level} activity level.'
+    if overweight:
+        meals = 'Lower-calorie meals'
+    elif snapshot.bmi_category == 'Underweight':
+        meals = f'Your BMI is {snapshot.bmi:.1f} ({snapshot.bmi_category}).'
+    else:
+        meals = 'Protein-rich meals'
+    if snapshot.high_stress or snapshot.low_sleep:
+        reason = 'Your stress level is high.' if snapshot.high_stress else 'You are sleeping under 6 hours.'
+        meditations = f'{reason} Short sessions help.'
+    else:
+        meditations = 'Short sessions to keep a calm routine.'
+
+    recs = []
+    for kind, reason in (('workouts', workouts), ('meals', meals), ('meditations', meditations)):
+        items = _items(kind, snapshot, assigned[kind])
+        if items:
+            recs.append({'kind': kind, 'reason': reason, 'items': items})
+    return recs
+
+
+def build_dashboard(user):
+    """Everything /api/dashboard/ returns for `user`, as a JSON-ready dict."""
+    user = _user_with_assignments(user.pk)
+    workouts = list(user.user_workouts.all())
+    meals = list(user.user_meal_plans.all())
+    meditations = list(user.user_meditations.all())
+
+    try:
+        p = user.userprogress
+    except UserProgress.DoesNotExist:
+        p = None
+    progress = {
+        'workouts_completed': p.workouts_completed if p else 0,
+        'meditation_sessions': p.meditation_sessions if p else 0,
+        'total_calories_burned': p.total_calories_burned if p else 0,
+        'current_streak': live_streak(p) if p else 0,
+        'longest_streak': p.longest_streak if p else 0,
+        'weekly': weekly_totals(user.pk),
+    }
+
+    assigned = {
+        'workouts': {a.workout_id for a in workouts},
+        'meals': {a.meal_plan_id for a in meals},
+        'meditations': {a.meditation_id for a in meditations},
+    }
+    return {
+        'meal_plans': [_meal_plan(a) for a in meals],
+        'workouts': {
+            'pending': [_workout(a) for a in workouts if not a.completed],
+            'completed': [_workout(a) for a in workouts if a.completed],
+        },
+        'meditations': {
+            'pending': [_meditation(a) for a in meditations if not a.completed],
+            'completed': [_meditation(a) for a in meditations if a.completed],
+        },
+        'progress': progress,
+        'recommendations': recommendations(get_snapshot(user), assigned),
+    }
@@ -0,0 +1,208 @@
+"""Streaming export of user data: chats, transcripts, profiles and assignments.
+
+Each dataset in ``DATASETS`` is read in primary-key order, `chunk_size` rows
+per query (keyset pagination, ``pk > last``), so no query holds a read
+snapshot or server-side cursor for longer than one chunk and memory stays
+bounded however many rows there are. Rows are rendered as NDJSON (one object
+per line, with a ``dataset`` field when several datasets are mixed) or CSV
+(one dataset, with a header), grouped into ~64 KB pieces and optionally
+gzip-compressed on the fly.
+
+Chat messages and transcripts that retention (``maini.retention``) moved to
+the archive are included, read from the month files before the hot rows;
+an id present in both places is exported once, from the table. A per-user
+export reads only the month files indexed as holding that user's rows.
+
+`export_chunks` yields bytes and backs both ``/api/export/`` (a
+StreamingHttpResponse; `aexport_chunks` under ASGI) and ``manage.py export_data``.
+"""
+import csv
+import io
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import (ChatArchiveMonth, ChatMessage, ChatSession, DailyActivity, SessionArchiveMonth, SessionMessage,
+                     UserMealPlan, UserMeditation, UserProfile, UserProgress, UserWorkout)
+
+
+# dataset -> (model, lookup from the row to its user, exported fields)
+DATASETS = {
+    'profile': (UserProfile, 'user_id', ('id', 'user_id', 'age', 'height_cm', 'weight_kg', 'sleep_hours',
+                                         'activity_minutes', 'activity_level', 'stress_level', 'updated_at')),
+    'progress': (UserProgress, 'user_id', ('id', 'user_id', 'workouts_completed', 'meditation_sessions',
+                                           'total_calories_burned', 'current_weight', 'goal_weight', 'height', 'age',
+                                           'daily_water_intake', 'current_streak', 'longest_streak',
+                                           'last_active_date', 'created_at', 'updated_at')),
+    'daily_activity': (DailyActivity, 'user_id', ('id', 'user_id', 'date', 'workouts', 'meditations',
+                                                  'calories_burned', 'active_minutes')),
+    'workouts': (UserWorkout, 'user_id', ('id', 'user_id', 'workout_id', 'workout__name', 'completed',
+                                          'assigned_date', 'completed_date')),
+    'meal_plans': (UserMealPlan, 'user_id', ('id', 'user_id', 'meal_plan_id', 'meal_plan__name', 'is_active',
+                                             'assigned_date')),
+    'meditations': (UserMeditation, 'user_id', ('id', 'user_id', 'meditation_id', 'meditation__title', 'completed',
+                                                'assigned_date', 'completed_date')),
+    'chat_messages': (ChatMessage, 'user_id', ('id', 'user_id', 'message', 'response', 'timestamp', 'is_helpful')),
+    'chat_sessions': (ChatSession, 'user_id', ('id', 'user_id', 'title', 'summary', 'created_at', 'updated_at')),
+    'session_messages': (SessionMessage, 'session__user_id', ('id', 'session_id', 'role', 'content', 'created_at')),
+}
+
+CHUNK_SIZE = 2000
+PIECE_SIZE = 64 * 1024
+FORMATS = ('ndjson', 'csv')
+
+
+class ExportError(ValueError):
+    pass
+
+
+def _archived_rows(dataset, user_id, chunk_size):
+    # Imported here: retention builds its archive layout from DATASETS
+    from .retention import ARCHIVED, _archived_records
+
+    if dataset not in ARCHIVED:
+        return
+    model, _, fields = DATASETS[dataset]
+    key = 'session_id' if dataset == 'session_messages' else 'user_id'
+    months = None
+    if user_id is None:
+        wanted = None
+    elif key == 'session_id':
+        wanted = set(ChatSession.objects.filter(user_id=user_id).values_list('pk', flat=True))
+        # Only the month files indexed as holding this user's rows, so one export never scans everyone's
+        months = set(SessionArchiveMonth.objects.filter(session__user_id=user_id).values_list('month', flat=True))
+    else:
+        wanted = {user_id}
+        months = set(ChatArchiveMonth.objects.filter(user_id=user_id).values_list('month', flat=True))
+    if months is not None and not months:
+        return
+
+    def flush(records):
+        # Rows still (or again) in the table are exported from there
+        hot = set(model.objects.filter(pk__in=[r['id'] for r in records]).values_list('pk', flat=True))
+        return [tuple(r.get(f) for f in fields) for r in records if r['id'] not in hot]
+
+    records = []
+    for record in _archived_records(dataset, lambda record: wanted is None or record[key] in wanted, months=months):
+        records.append(record)
+        if len(records) == chunk_size:
+            yield from flush(records)
+            records = []
+    if records:
+        yield from flush(records)
+
+
+def iter_rows(dataset, user_id=None, chunk_size=CHUNK_SIZE):
+    """Yield value tuples (in DATASETS field order) for `dataset`, optionally for one user.
+
+    Archived rows (chat datasets only) come first, then the table's.
+    """
+    yield from _archived_rows(dataset, user_id, chunk_size)
+    model, user_lookup, fields = DATASETS[dataset]
+    queryset = model.objects.all()
+    if user_id is not None:
+        queryset = queryset.filter(**{user_lookup: user_id})
+    queryset = queryset.order_by('pk').values_list(*fields)
+    last = 0
+    while True:
+        # ids are first in every field list
+        rows = list(queryset.filter(pk__gt=last)[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1][0]
+
+
+def _ndjson_lines(datasets, user_id, chunk_size):
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    tagged = len(datasets) > 1
+    for dataset in datasets:
+        fields = [f.replace('__', '_') for f in DATASETS[dataset][2]]
+        for row in iter_rows(dataset, user_id, chunk_size):
+            record = dict(zip(fields, row))
+            if tagged:
+                record = {'dataset': dataset, **record}
+            yield encoder.encode(record) + '\n'
+
+
+def _csv_lines(dataset, user_id, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    yield line([f.replace('__', '_') for f in DATASETS[dataset][2]])
+    for row in iter_rows(dataset, user_id, chunk_size):
+        yield line(['' if v is None else v.isoformat() if hasattr(v, 'isoformat') else v for v in row])
+
+
+def check_export(datasets, fmt):
+    """Validate an export request up front; return the list of datasets (all when empty)."""
+    datasets = list(datasets or DATASETS)
+    unknown = [d for d in datasets if d not in DATASETS]
+    if unknown:
+        raise ExportError(f'unknown dataset {unknown[0]!r}; choose from {", ".join(DATASETS)}')
+    if fmt not in FORMATS:
+        raise ExportError(f'format must be one of {", ".join(FORMATS)}')
+    if fmt == 'csv' and len(datasets) != 1:
+        raise ExportError('CSV exports one dataset at a time')
+    return datasets
+
+
+def export_chunks(datasets=None, user_id=None, fmt='ndjson', compress=False, chunk_size=CHUNK_SIZE):
+    """Yield the export as bytes pieces of roughly PIECE_SIZE (gzip stream when `compress`).
+
+    Call `check_export` first: this is a generator, so its errors only surface on iteration.
+    """
+    datasets = check_export(datasets, fmt)
+    lines = _csv_lines(datasets[0], user_id, chunk_size) if fmt == 'csv' else _ndjson_lines(datasets, user_id, chunk_size)
+    # wbits=31: gzip container, so the output is a valid .gz file
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def emit(data):
+        return compressor.compress(data) if compressor else data
+
+    pending, size = [], 0
+    for text in lines:
+        pending.append(text)
+        size += len(text)
+        if size >= PIECE_SIZE:
+            piece = emit(''.join(pending).encode('utf-8'))
+            pending, size = [], 0
+            if piece:
+                yield piece
+    piece = emit(''.join(pending).encode('utf-8'))
+    if compressor:
+        piece += compressor.flush()
+    if piece:
+        yield piece
+
+
+async def aexport_chunks(*args, **kwargs):
+    """`export_chunks` as an async iterator, for StreamingHttpResponse under ASGI.
+
+    Django would otherwise drain a sync iterator into a list before sending
+    anything. Each piece is produced in the request's sync thread.
+    """
+    pieces = export_chunks(*args, **kwargs)
+    step = sync_to_async(next)
+    try:
+        while True:
+            piece = await step(pieces, None)
+            if piece is None:
+                return
+            yield piece
+    finally:
+        await sync_to_async(pieces.close)()
+
+
+def export_filename(datasets, user_id, fmt, compress):
+    name = datasets[0] if len(datasets) == 1 else 'all'
+    who = f'user{user_id}' if user_id is not None else 'everyone'
+    return f'fitmind-{name}-{who}.{fmt}' + ('.gz' if compress else '')
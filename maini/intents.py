@@ -0,0 +1,77 @@
+import re
+
+
+# Intents in priority order: when a message matches several, the earliest wins.
+INTENT_PRIORITY = ('crisis', 'meditation', 'workout', 'nutrition', 'sleep', 'mood', 'habit')
+
+# Phrases matched anywhere in the lowercased message (substring semantics).
+PHRASE_INTENTS = {
+    'crisis': ('suicide', 'self-harm', 'kill myself', "i can't go on", 'hurt myself', 'want to die'),
+    'meditation': ('stress',),
+}
+
+# Whole words matched against the whitespace-split message.
+KEYWORD_INTENTS = {
+    'meditation': ('meditation', 'mindfulness', 'breathe', 'breathing', 'relax', 'relaxation', 'calm', 'peace', 'focus', 'anxiety', 'worry'),
+    'workout': ('workout', 'exercise', 'training', 'gym', 'pushups', 'squat', 'fitness', 'run', 'walk', 'cardio', 'strength', 'sport', 'active', 'move'),
+    'nutrition': ('diet', 'nutrition', 'meal', 'calories', 'protein', 'vegetarian', 'vegan', 'snack', 'eat', 'food', 'weight', 'cook', 'recipe', 'healthy'),
+    'sleep': ('sleep', 'insomnia', 'tired', 'rest', 'fatigue', 'sleepy', 'awake', 'bed', 'nap', 'dream'),
+    'mood': ('mood', 'happy', 'sad', 'depressed', 'energy', 'motivation', 'confidence', 'brain', 'mental', 'feeling', 'emotion'),
+    'habit': ('habit', 'routine', 'goal', 'progress', 'improve', 'change', 'build', 'track', 'consistency'),
+}
+
+
+class IntentRouter:
+    """Classify a chat message into one intent in a single pass.
+
+    Built once at import: keywords go into one inverted index (word -> rank)
+    and all substring phrases are compiled into a single alternation, so a
+    message is scanned once in C instead of once per intent.
+    """
+
+    def __init__(self, priority=INTENT_PRIORITY, phrases=PHRASE_INTENTS, keywords=KEYWORD_INTENTS):
+        self.priority = tuple(priority)
+        rank = {intent: i for i, intent in enumerate(self.priority)}
+
+        # Inverted index; a word listed under several intents keeps the best rank.
+        self.keyword_rank = {}
+        for intent, words in keywords.items():
+            for word in words:
+                self.keyword_rank[word] = min(self.keyword_rank.get(word, len(self.priority)), rank[intent])
+        self.keywords = frozenset(self.keyword_rank)
+
+        # One alternation for every phrase; higher-priority (then longer)
+        # phrases come first so they win when two start at the same offset.
+        self.phrase_rank = {}
+        for intent, terms in phrases.items():
+            for term in terms:
+                self.phrase_rank[term] = min(self.phrase_rank.get(term, len(self.priority)), rank[intent])
+        ordered = sorted(self.phrase_rank, key=lambda t: (self.phrase_rank[t], -len(t)))
+        self.phrase_pattern = re.compile('|'.join(re.escape(t) for t in ordered))
+
+    def route(self, message_lower, words=None):
+        """Return the highest-priority intent for a lowercased message, or None."""
+        best = len(self.priority)
+        search = self.phrase_pattern.search
+        match = search(message_lower)
+        while match:
+            best = min(best, self.phrase_rank[match.group()])
+            if best == 0:
+                return self.priority[0]
+            # Resume one character later so a lower-priority match (e.g.
+            # 'stress') never hides a crisis phrase overlapping its letters.
+            match = search(message_lower, match.start() + 1)
+
+        if words is None:
+            words = message_lower.split()
+        for word in self.keywords.intersection(words):
+            best = min(best, self.keyword_rank[word])
+
+        return self.priority[best] if best < len(self.priority) else None
+
+
+router = IntentRouter()
+
+
+def route_intent(message_lower, words=None):
+    return router.route(message_lower, words)
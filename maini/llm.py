@@ -0,0 +1,495 @@
+"""Shared pieces for talking to Google Gemini.
+
+`GEMINI_API_BASE` can point at a local fake server (see benchmarks/fake_gemini.py)
+for testing without network access or an API key.
+
+One-shot calls go through one pooled, keep-alive `GeminiClient` with bounded
+retries and a circuit breaker, from sync code (`generate`) or async views
+(`agenerate`); the streaming relay uses the same async client. Both record
+into the module-level `stats` counters.
+
+Async connection pooling is for ASGI: `fitmind.asgi` calls `pool_async_client`
+at lifespan startup, so every request on the server's event loop shares one
+httpx client, closed at shutdown. Anywhere else, e.g. async views under WSGI,
+where each request runs on a fresh event loop, each call opens its own client
+and closes it before returning.
+"""
+import asyncio
+import atexit
+import contextlib
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+
+
+GEMINI_MODEL = 'gemini-2.5-flash'
+
+# Prepend a system-style FitMind prompt to guide Gemini's behavior
+SYSTEM_PROMPT = (
+    "You are FitMind — an intelligent, friendly, and supportive wellness chatbot. "
+    "Guide users across meditation, fitness, nutrition, sleep, mood, and habit-building. "
+    "Always be positive, ask clarifying questions only when needed, provide short actionable steps, and for any indication of self-harm or emergency encourage contacting local emergency services and a professional. "
+    "Return concise outputs in three parts: Direct Answer, Personalized Guidance, Motivation Line."
+)
+
+# Changes whenever the prompt text does, so cached replies never outlive it
+SYSTEM_PROMPT_VERSION = hashlib.sha256(SYSTEM_PROMPT.encode('utf-8')).hexdigest()[:12]
+
+NOT_CONFIGURED_REPLY = "(Gemini not configured) Please set GOOGLE_API_KEY or GOOGLE_API_BEARER on the server."
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class LLMUnavailable(Exception):
+    """Raised when the upstream is failing or the circuit breaker is open."""
+
+
+class NotConfigured(Exception):
+    """Raised when no Gemini credentials are set."""
+
+
+def api_base():
+    return os.environ.get('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com').rstrip('/')
+
+
+def auth():
+    """Return (headers, params) for the configured credentials, or None if unset."""
+    api_key = os.environ.get('GOOGLE_API_KEY')
+    bearer = os.environ.get('GOOGLE_API_BEARER')
+    headers = {'Content-Type': 'application/json'}
+    params = {}
+    if api_key:
+        params['key'] = api_key
+    elif bearer:
+        headers['Authorization'] = f'Bearer {bearer}'
+    else:
+        return None
+    return headers, params
+
+
+def _chunk_text(data):
+    # streamGenerateContent chunk: {'candidates': [{'content': {'parts': [{'text': '...'}]}}]}
+    parts = []
+    for candidate in data.get('candidates') or []:
+        content = candidate.get('content') or {}
+        for part in content.get('parts') or []:
+            if isinstance(part, dict) and part.get('text'):
+                parts.append(part['text'])
+    return ''.join(parts)
+
+
+async def stream_gemini(prompt_text):
+    """Yield reply text fragments from Gemini's streaming API as they arrive.
+
+    Raises NotConfigured or LLMUnavailable (circuit open) before the first fragment.
+    """
+    credentials = auth()
+    if credentials is None:
+        raise NotConfigured(NOT_CONFIGURED_REPLY)
+    if not breaker.allow():
+        stats.incr('short_circuits')
+        raise LLMUnavailable('circuit open')
+    headers, params = credentials
+    params = dict(params, alt='sse')
+
+    url = f'{api_base()}/v1beta/models/{GEMINI_MODEL}:streamGenerateContent'
+    body = {
+        'systemInstruction': {'parts': [{'text': SYSTEM_PROMPT}]},
+        'contents': [{'role': 'user', 'parts': [{'text': prompt_text}]}],
+        'generationConfig': {'maxOutputTokens': 512},
+    }
+
+    stats.incr('requests')
+    started = time.monotonic()
+    ok = None
+    try:
+        async with get_client()._async_client() as client, \
+                client.stream('POST', url, headers=headers, params=params, json=body) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line.startswith('data:'):
+                    continue
+                payload = line[5:].strip()
+                if not payload:
+                    continue
+                text = _chunk_text(json.loads(payload))
+                if text:
+                    yield text
+        ok = True
+    except Exception:
+        ok = False
+        raise
+    finally:
+        # Settle the breaker however the stream ends, so a half-open trial slot is never kept
+        if ok is None:
+            # GeneratorExit / CancelledError: the client went away, no verdict on Gemini
+            breaker.release()
+        else:
+            if ok:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+            stats.observe(time.monotonic() - started, ok=ok)
+
+
+def sse_event(data, event=None):
+    """Format one server-sent event frame with a JSON payload."""
+    frame = f'event: {event}\n' if event else ''
+    return f'{frame}data: {json.dumps(data)}\n\n'
+
+
+class LLMStats:
+    """Thread-safe latency and error counters for outbound LLM calls."""
+
+    FIELDS = ('requests', 'successes', 'failures', 'retries', 'short_circuits')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = dict.fromkeys(self.FIELDS, 0)
+            self.latency_total = 0.0
+            self.latency_max = 0.0
+
+    def incr(self, field, n=1):
+        with self._lock:
+            self.counts[field] += n
+
+    def observe(self, seconds, ok):
+        with self._lock:
+            self.counts['successes' if ok else 'failures'] += 1
+            self.latency_total += seconds
+            self.latency_max = max(self.latency_max, seconds)
+        metrics.record_llm(seconds, ok)
+
+    def snapshot(self):
+        with self._lock:
+            done = self.counts['successes'] + self.counts['failures']
+            return dict(
+                self.counts,
+                latency_avg=self.latency_total / done if done else 0.0,
+                latency_max=self.latency_max,
+                breaker_state=breaker.state,
+            )
+
+
+class CircuitBreaker:
+    """Fail fast after repeated upstream failures.
+
+    closed -> open after `threshold` consecutive failures; open -> half-open once
+    `reset_timeout` seconds pass, letting one trial call through; that call's
+    outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold=5, reset_timeout=30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release(self):
+        """Give back a trial slot without recording an outcome."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+def _extract_text(data):
+    # Try to extract text from the response in a few common locations
+    # Typical structure: { 'candidates': [ { 'content': [ { 'type': 'output_text', 'text': '...' } ] } ] }
+    text = None
+    if isinstance(data, dict):
+        # check 'candidates'
+        candidates = data.get('candidates') or data.get('responses') or []
+        if candidates and isinstance(candidates, list):
+            first = candidates[0]
+            # search in nested content
+            content = first.get('content') or first.get('message') or []
+            if isinstance(content, list) and len(content) > 0:
+                # find first item with a text-like key
+                for c in content:
+                    if isinstance(c, dict) and ('text' in c):
+                        text = c.get('text')
+                        break
+            # fallback: first.get('text')
+            if not text:
+                text = first.get('text')
+
+    if not text:
+        # try alternate field
+        text = data.get('output', {}).get('content', '') if isinstance(data, dict) else None
+    return text
+
+
+class GeminiClient:
+    """Pooled keep-alive client for Gemini's one-shot endpoint.
+
+    One `requests.Session` is shared by all threads so TCP/TLS connections are
+    reused; async callers get one `httpx.AsyncClient` per event loop. Failures
+    where Gemini never got the request (connect errors) or refused it (429/5xx)
+    are retried with full-jitter exponential backoff, within `deadline` seconds
+    for the whole call; read timeouts and broken responses are not resent.
+    Every terminal failure feeds the circuit breaker.
+    """
+
+    def __init__(self, connect_timeout=3.05, read_timeout=20.0, max_retries=2,
+                 backoff_base=0.25, backoff_cap=4.0, pool_size=20, deadline=25.0):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.pool_size = pool_size
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def _delay(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** attempt)))
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), self.backoff_cap))
+            except ValueError:
+                pass
+        return delay
+
+    def _retry_delay(self, attempt, started, retry_after=None):
+        # Seconds to wait before retry `attempt`, or None if the deadline leaves no room for it
+        delay = self._delay(attempt - 1, retry_after)
+        if time.monotonic() - started + delay + self.timeout[0] >= self.deadline:
+            return None
+        return delay
+
+    def _timeouts(self, started):
+        # (connect, read) for the next attempt, the read cut short by the deadline
+        remaining = self.deadline - (time.monotonic() - started)
+        return self.timeout[0], max(0.0, min(self.timeout[1], remaining - self.timeout[0]))
+
+    def _prepare(self, prompt_text):
+        # (url, headers, params, body) for one call, after the credential and breaker checks
+        credentials = auth()
+        if credentials is None:
+            raise NotConfigured(NOT_CONFIGURED_REPLY)
+        if not breaker.allow():
+            stats.incr('short_circuits')
+            raise LLMUnavailable('circuit open')
+        headers, params = credentials
+
+        url = f'{api_base()}/v1beta2/models/{GEMINI_MODEL}:generateMessage'
+        body = {
+            'messages': [
+                { 'author': 'system', 'content': [ { 'type': 'text', 'text': SYSTEM_PROMPT } ] },
+                { 'author': 'user', 'content': [ { 'type': 'text', 'text': prompt_text } ] }
+            ],
+            'maxOutputTokens': 512,
+        }
+        stats.incr('requests')
+        return url, headers, params, body
+
+    def _settle(self, started, status_code, load_json):
+        # Non-retryable outcome: the upstream answered, so even a 4xx counts as healthy
+        breaker.record_success()
+        if status_code >= 400:
+            stats.observe(time.monotonic() - started, ok=False)
+            raise LLMUnavailable(f'{status_code} from Gemini')
+        try:
+            text = _extract_text(load_json())
+        except ValueError as e:
+            stats.observe(time.monotonic() - started, ok=False)
+            raise LLMUnavailable(str(e)) from e
+        stats.observe(time.monotonic() - started, ok=True)
+        return text or "(No response from Gemini)"
+
+    def _give_up(self, started, error):
+        breaker.record_failure()
+        stats.observe(time.monotonic() - started, ok=False)
+        raise LLMUnavailable(str(error)) from error
+
+    def generate(self, prompt_text):
+        """Return Gemini's reply text; raise LLMUnavailable or NotConfigured."""
+        url, headers, params, body = self._prepare(prompt_text)
+        started = time.monotonic()
+        error = retry_after = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                delay = self._retry_delay(attempt, started, retry_after)
+                if delay is None:
+                    break
+                time.sleep(delay)
+                stats.incr('retries')
+            retry_after = None
+            try:
+                resp = self.session.post(url, headers=headers, params=params, json=body,
+                                         timeout=self._timeouts(started))
+            except requests.ConnectionError as e:
+                # Includes ConnectTimeout: nothing reached Gemini, so resending is safe
+                error = e
+                continue
+            except requests.RequestException as e:
+                # Read timeouts, broken bodies: Gemini may still be working; don't pile on
+                error = e
+                break
+
+            if resp.status_code in RETRY_STATUSES:
+                error = requests.HTTPError(f'{resp.status_code} from Gemini', response=resp)
+                retry_after = resp.headers.get('Retry-After')
+                continue
+
+            return self._settle(started, resp.status_code, resp.json)
+
+        self._give_up(started, error)
+
+    def _new_async_client(self):
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+            limits=httpx.Limits(max_connections=self.pool_size * 5, max_keepalive_connections=self.pool_size),
+        )
+
+    def pool_async_client(self):
+        """Share one async client across calls on the running (long-lived) event loop."""
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_clients:
+            self._async_clients[loop] = self._new_async_client()
+
+    @contextlib.asynccontextmanager
+    async def _async_client(self):
+        # httpx async clients are bound to their loop: the loop's pooled one, else one for this call
+        client = self._async_clients.get(asyncio.get_running_loop())
+        if client is not None:
+            yield client
+            return
+        async with self._new_async_client() as client:
+            yield client
+
+    async def aclose(self):
+        """Close the pooled async client of the running event loop."""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def close(self):
+        """Close the session, and pooled async clients whose loop is idle (e.g. at exit)."""
+        self.session.close()
+        for loop, client in list(self._async_clients.items()):
+            # A running loop closes its own client (aclose); a closed one took its sockets with it
+            if not loop.is_closed() and not loop.is_running():
+                loop.run_until_complete(client.aclose())
+        self._async_clients.clear()
+
+    async def agenerate(self, prompt_text):
+        """Async `generate`: awaits Gemini without holding a thread."""
+        url, headers, params, body = self._prepare(prompt_text)
+        async with self._async_client() as client:
+            started = time.monotonic()
+            error = retry_after = None
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    delay = self._retry_delay(attempt, started, retry_after)
+                    if delay is None:
+                        break
+                    await asyncio.sleep(delay)
+                    stats.incr('retries')
+                retry_after = None
+                connect, read = self._timeouts(started)
+                try:
+                    resp = await client.post(url, headers=headers, params=params, json=body,
+                                             timeout=httpx.Timeout(read, connect=connect))
+                except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                    error = e
+                    continue
+                except httpx.HTTPError as e:
+                    error = e
+                    break
+
+                if resp.status_code in RETRY_STATUSES:
+                    error = httpx.HTTPStatusError(f'{resp.status_code} from Gemini', request=resp.request,
+                                                  response=resp)
+                    retry_after = resp.headers.get('Retry-After')
+                    continue
+
+                return self._settle(started, resp.status_code, resp.json)
+
+            self._give_up(started, error)
+
+
+stats = LLMStats()
+breaker = CircuitBreaker(
+    threshold=getattr(settings, 'GEMINI_BREAKER_THRESHOLD', 5),
+    reset_timeout=getattr(settings, 'GEMINI_BREAKER_RESET_SECONDS', 30.0),
+)
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GeminiClient(
+                    connect_timeout=getattr(settings, 'GEMINI_CONNECT_TIMEOUT', 3.05),
+                    read_timeout=getattr(settings, 'GEMINI_READ_TIMEOUT', 20.0),
+                    max_retries=getattr(settings, 'GEMINI_MAX_RETRIES', 2),
+                    pool_size=getattr(settings, 'GEMINI_POOL_SIZE', 20),
+                    deadline=getattr(settings, 'GEMINI_DEADLINE', 25.0),
+                )
+                atexit.register(_client.close)
+    return _client
+
+
+async def pool_async_client():
+    """Pool Gemini connections on the running event loop (ASGI lifespan startup)."""
+    get_client().pool_async_client()
+
+
+async def aclose():
+    """Close the shared client's connections on the running loop (ASGI shutdown)."""
+    if _client is not None:
+        await _client.aclose()
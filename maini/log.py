@@ -0,0 +1,189 @@
+"""Non-blocking, structured logging.
+
+`queue_handler` (wired up by ``LOGGING`` in settings) returns a QueueHandler:
+the request thread only merges the message with its args, tags the record
+with the current request and user id, and puts it on an in-memory queue. A
+QueueListener thread does the JSON formatting and the writes to stderr, and
+is flushed at exit.
+
+`RequestContextMiddleware` gives each request an id (the incoming
+``X-Request-ID`` or a new one, echoed in the response) and decides once per
+request whether its DEBUG records are kept, so a sampled request is logged
+completely. The state is cleared on ``request_finished`` (after a streamed
+body's last chunk), not when the middleware returns, so the lines Django's
+handler logs afterwards ("Bad Request: ...") still carry the request's ids
+and a worker thread never keeps a finished request's. Anything above DEBUG is always kept. With the ``maini`` logger at
+INFO (``FITMIND_LOG_LEVEL``), ``logger.debug`` calls return before doing any
+of this.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.signals import request_finished
+
+
+current_request = ContextVar('fitmind_log_request', default=None)
+REQUEST_ID = re.compile(r'[\w.-]{1,64}')
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_STANDARD = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id', 'user_id'}
+
+
+class RequestState:
+    __slots__ = ('request', 'request_id', 'sampled')
+
+    def __init__(self, request, request_id, sampled):
+        self.request = request
+        self.request_id = request_id
+        self.sampled = sampled
+
+
+def _user_id(request):
+    # Only users the request has already loaded; logging never triggers the query
+    user = request.__dict__.get('_cached_user') or request.__dict__.get('_acached_user')
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with request_id / user_id (runs in the caller's thread, before queueing)."""
+
+    def filter(self, record):
+        state = current_request.get()
+        record.request_id = state.request_id if state else None
+        record.user_id = _user_id(state.request) if state else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep `rate` of DEBUG records: per request when in one, else per record."""
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        state = current_request.get()
+        return state.sampled if state else random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, ids, extras, exception."""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key in ('request_id', 'user_id'):
+            value = getattr(record, key, None)
+            if value is not None:
+                data[key] = value
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc_info'] = record.exc_text
+        if record.stack_info:
+            data['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s')
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Only merge the args here; the listener formats (tracebacks included)
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _stop(listener):
+    # Flush what is queued; safe if already stopped
+    if listener._thread is not None:
+        listener.stop()
+
+
+def queue_handler(fmt='json', stream=None, debug_sample_rate=1.0):
+    """Logging handler factory for dictConfig: a QueueHandler feeding a stream handler thread."""
+    target = logging.StreamHandler(stream or sys.stderr)
+    target.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, target, respect_handler_level=True)
+    listener.start()
+    atexit.register(_stop, listener)
+
+    handler = QueueHandler(records)
+    handler.addFilter(SamplingFilter(debug_sample_rate))
+    handler.addFilter(RequestContextFilter())
+    handler.listener = listener
+    return handler
+
+
+def debug_sample_rate():
+    from django.conf import settings
+
+    return (getattr(settings, 'FITMIND_LOGGING', None) or {}).get('DEBUG_SAMPLE_RATE', 1.0)
+
+
+class RequestContextMiddleware:
+    """Assign a request id and the DEBUG sampling decision (see module docstring)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _start(self, request):
+        request_id = request.headers.get('X-Request-ID', '')
+        if not REQUEST_ID.fullmatch(request_id):
+            request_id = uuid.uuid4().hex
+        rate = debug_sample_rate()
+        current_request.set(RequestState(request, request_id, rate >= 1 or random.random() < rate))
+        return request_id
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request_id = self._start(request)
+        response = self.get_response(request)
+        response['X-Request-ID'] = request_id
+        return response
+
+    async def __acall__(self, request):
+        request_id = self._start(request)
+        response = await self.get_response(request)
+        response['X-Request-ID'] = request_id
+        return response
+
+
+def clear_request(**kwargs):
+    # Sent when the response is closed, after Django has logged it and any streamed body is sent
+    current_request.set(None)
+
+
+request_finished.connect(clear_request, dispatch_uid='fitmind_log_clear_request')
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from maini import retention
+
+
+class Command(BaseCommand):
+    help = 'Move chat rows past their retention policy into monthly gzip archives (see FITMIND_RETENTION).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', action='append', dest='datasets', choices=sorted(retention.ARCHIVED),
+                            help='Only this dataset (repeatable; default: every configured policy).')
+        parser.add_argument('--days', type=int, help='Override the policy: archive rows older than this.')
+        parser.add_argument('--batch-size', type=int, help='Rows per archive/delete transaction.')
+        parser.add_argument('--pause', type=float, default=0.0, help='Seconds to sleep between batches.')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches per dataset.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count rows past their policy.')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            for dataset, count in retention.pending_counts().items():
+                if not options['datasets'] or dataset in options['datasets']:
+                    self.stdout.write(f'{dataset}: {count} rows past retention')
+            return
+        datasets = options['datasets'] or [d for d, days in retention.get_config()['POLICIES'].items()
+                                           if days is not None and d in retention.ARCHIVED]
+        for dataset in datasets:
+            started = time.monotonic()
+            moved = retention.apply_policy(dataset, days=options['days'], batch_size=options['batch_size'],
+                                           pause=options['pause'], max_batches=options['max_batches'])
+            self.stdout.write(f'{dataset}: archived {moved} rows in {time.monotonic() - started:.2f}s')
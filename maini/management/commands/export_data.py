@@ -0,0 +1,41 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from maini import export
+
+
+class Command(BaseCommand):
+    help = 'Stream user data (chats, transcripts, profiles, assignments) to NDJSON or CSV, optionally gzipped.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', action='append', dest='datasets', choices=list(export.DATASETS),
+                            help='Dataset to export (repeatable; default: all, NDJSON only).')
+        parser.add_argument('--user', type=int, dest='user_id', help='Only this user id.')
+        parser.add_argument('--format', choices=export.FORMATS, default='ndjson')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=export.CHUNK_SIZE, help='Rows per query.')
+        parser.add_argument('-o', '--output', default='-', help='File to write (default: stdout).')
+
+    def handle(self, *args, **options):
+        try:
+            datasets = export.check_export(options['datasets'], options['format'])
+        except export.ExportError as e:
+            raise CommandError(str(e))
+
+        started = time.monotonic()
+        written = 0
+        out = sys.stdout.buffer if options['output'] == '-' else open(options['output'], 'wb')
+        try:
+            for piece in export.export_chunks(datasets, options['user_id'], options['format'], options['gzip'],
+                                              chunk_size=options['chunk_size']):
+                out.write(piece)
+                written += len(piece)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+            else:
+                out.flush()
+        if options['output'] != '-':
+            self.stdout.write(f'wrote {written} bytes to {options["output"]} in {time.monotonic() - started:.2f}s')
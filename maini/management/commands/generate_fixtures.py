@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from maini import synthetic
+
+
+class Command(BaseCommand):
+    help = 'Insert synthetic users, profiles, catalogs, assignments and chat histories for scale testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help='Multiplier on %s; 1 is about 110k message rows.' % synthetic.BASE_COUNTS)
+        parser.add_argument('--seed', type=int, default=0, help='Same seed, same data; each seed can be loaded once.')
+        parser.add_argument('--workers', type=int, default=1, help='Processes generating and inserting users.')
+        parser.add_argument('--batch-size', type=int, default=synthetic.BATCH_SIZE)
+        parser.add_argument('--days', type=int, default=365, help='How far back timestamps go.')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def report(totals):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {sum(totals.values())} rows after {time.monotonic() - started:.1f}s')
+
+        try:
+            totals = synthetic.generate(options['scale'], options['seed'], workers=options['workers'],
+                                        batch_size=options['batch_size'], days=options['days'], progress=report)
+        except synthetic.GenerateError as e:
+            raise CommandError(str(e))
+        elapsed = time.monotonic() - started
+        rows = sum(totals.values())
+        for table, n in totals.items():
+            self.stdout.write(f'  {table}: {n}')
+        self.stdout.write(f'generated {rows} rows in {elapsed:.2f}s ({rows / elapsed:.0f} rows/s); '
+                          'run rebuild_search_index and rebuild_progress to cover them')
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from maini import catalog_import
+from maini.catalog import CATALOG_MODELS
+
+
+class Command(BaseCommand):
+    help = 'Stream a CSV, JSON Lines or JSON catalog file into workouts, meals or meditations (upsert by name/title).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(CATALOG_MODELS))
+        parser.add_argument('path', help='File to import; .gz is read compressed.')
+        parser.add_argument('--format', choices=sorted(set(catalog_import.FORMATS.values())),
+                            help='Default: from the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; write nothing.')
+        parser.add_argument('--max-errors', type=int, default=20, help='Invalid rows to print.')
+
+    def handle(self, *args, **options):
+        shown = 0
+
+        def report(position, message):
+            nonlocal shown
+            shown += 1
+            if shown <= options['max_errors']:
+                self.stderr.write(f'{options["path"]}:{position}: {message}')
+
+        started = time.monotonic()
+        try:
+            counts = catalog_import.import_catalog(
+                options['kind'], options['path'], fmt=options['format'], batch_size=options['batch_size'],
+                dry_run=options['dry_run'], on_error=report,
+            )
+        except (OSError, catalog_import.ImportFormatError) as e:
+            raise CommandError(str(e))
+        elapsed = time.monotonic() - started
+        rate = counts['read'] / elapsed if elapsed else 0
+        self.stdout.write(
+            f'{options["kind"]}: {counts["imported"]} {"valid" if options["dry_run"] else "imported"}, '
+            f'{counts["invalid"]} invalid, {counts["duplicates"]} duplicate keys, '
+            f'{counts["read"]} rows in {elapsed:.2f}s ({rate:.0f} rows/s)'
+        )
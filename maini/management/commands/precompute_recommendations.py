@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from maini import recommend
+
+
+class Command(BaseCommand):
+    help = 'Score every catalog for every user and store the top items (run nightly).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only precompute for this user id (repeatable).')
+        parser.add_argument('--top', type=int, default=recommend.PRECOMPUTED_ITEMS,
+                            help='Items to keep per catalog.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        users = recommend.precompute(options['user_ids'], k=options['top'], batch_size=options['batch_size'])
+        self.stdout.write(f'precomputed recommendations for {users} users in {time.monotonic() - started:.2f}s')
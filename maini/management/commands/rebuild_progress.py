@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from maini import progress
+
+
+class Command(BaseCommand):
+    help = 'Recompute UserProgress counters, streaks and the DailyActivity rollup from completions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only rebuild this user id (repeatable).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        users = progress.rebuild(options['user_ids'], batch_size=options['batch_size'])
+        self.stdout.write(f'rebuilt progress for {users} users in {time.monotonic() - started:.2f}s')
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from maini import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from the catalog and chat tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if not search.backend():
+            raise CommandError('No search index table; run migrate on SQLite (with FTS5) or PostgreSQL.')
+
+        chunk_size = options['chunk_size']
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+
+        for kind, (_, model) in search.KINDS.items():
+            queryset = model.objects.order_by('pk')
+            if kind == 'session':
+                queryset = queryset.select_related('session')
+            total = 0
+            batch = []
+            for obj in queryset.iterator(chunk_size=chunk_size):
+                batch.append(obj)
+                if len(batch) >= chunk_size:
+                    search.index_objects(batch)
+                    total += len(batch)
+                    batch = []
+            search.index_objects(batch)
+            total += len(batch)
+            self.stdout.write(f'{kind}: indexed {total} rows')
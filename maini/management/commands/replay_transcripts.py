@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from maini.transcripts import TranscriptQueue
+
+
+class Command(BaseCommand):
+    help = 'Write chat transcripts left in the write-behind spool by processes that exited before flushing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=float, default=0,
+            help='Only take spool files untouched for this many seconds (use >0 while app servers are running).',
+        )
+
+    def handle(self, *args, **options):
+        config = getattr(settings, 'FITMIND_TRANSCRIPT_QUEUE', None) or {}
+        queue = TranscriptQueue(config['SPOOL_DIR'])
+        claimed = queue.claim_orphans(min_age=options['min_age'])
+        written = queue.flush()
+        self.stdout.write(f'claimed {claimed} queued messages, wrote {written} (rest were already stored)')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from maini import retention
+from maini.models import ChatSession
+
+
+class Command(BaseCommand):
+    help = 'Restore archived chat history: a session\'s messages, or a user\'s chatbot messages.'
+
+    def add_arguments(self, parser):
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument('--session', type=int, help='ChatSession id.')
+        group.add_argument('--user', type=int, help='User id (ChatMessage rows).')
+
+    def handle(self, *args, **options):
+        if options['session'] is not None:
+            try:
+                session = ChatSession.objects.get(pk=options['session'])
+            except ChatSession.DoesNotExist:
+                raise CommandError(f'no session {options["session"]}')
+            restored = retention.restore_session(session)
+            self.stdout.write(f'session {session.pk}: restored {restored} messages')
+        else:
+            restored = retention.restore_chat_messages(options['user'])
+            self.stdout.write(f'user {options["user"]}: restored {restored} chat messages')
@@ -0,0 +1,281 @@
+"""In-process request metrics, served in Prometheus text format at /metrics.
+
+`MetricsMiddleware` times every request and, per view, records wall time,
+database query count and time, outbound LLM time and response size into
+histograms. Queries are counted by an ``execute_wrapper`` installed on every
+database connection as it opens (``connection_created``); it charges the
+request whose `RequestStats` is in the `current` context variable, which
+asgiref carries into ``sync_to_async`` threads. LLM latency is reported by
+``maini.llm.LLMStats.observe``.
+
+A request running more than ``N_PLUS_ONE_THRESHOLD`` queries is logged as an
+N+1 suspect along with its most repeated statement. LLM, response cache and
+transcript queue counters are read from their own ``snapshot()`` at scrape
+time. Metrics are per process; with several workers, scrape each one.
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def get_config():
+    config = getattr(settings, 'FITMIND_METRICS', None) or {}
+    return {
+        'ENABLED': config.get('ENABLED', True),
+        'N_PLUS_ONE_THRESHOLD': config.get('N_PLUS_ONE_THRESHOLD', 30),
+        'TOKEN': config.get('TOKEN', ''),
+    }
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, labels, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series = {}
+
+    def observe(self, value, *label_values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for label_values, series in items:
+            labels = _labels(self.labels, label_values)
+            total = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                total += count
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {total}')
+            lines.append(f'{self.name}_sum{{{labels}}} {series[-1]}')
+            lines.append(f'{self.name}_count{{{labels}}} {total}')
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = Counter()
+
+    def inc(self, *label_values, n=1):
+        with self._lock:
+            self._values[label_values] += n
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f'{self.name}{{{_labels(self.labels, k)}}} {v}' for k, v in items)
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values):
+    return ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+
+
+REQUEST_SECONDS = Histogram('fitmind_request_duration_seconds', 'Wall time per request.',
+                            ('view', 'method', 'status'), LATENCY_BUCKETS)
+DB_QUERIES = Histogram('fitmind_request_db_queries', 'Database queries per request.', ('view',), QUERY_BUCKETS)
+DB_SECONDS = Histogram('fitmind_request_db_seconds', 'Time in database queries per request.', ('view',), LATENCY_BUCKETS)
+LLM_SECONDS = Histogram('fitmind_request_llm_seconds', 'Time waiting on the LLM per request (requests that called it).',
+                        ('view',), LATENCY_BUCKETS)
+RESPONSE_BYTES = Histogram('fitmind_response_size_bytes', 'Response body size.', ('view',), SIZE_BUCKETS)
+LLM_CALLS = Histogram('fitmind_llm_call_seconds', 'Outbound Gemini call latency, retries included.',
+                      ('outcome',), LATENCY_BUCKETS)
+N_PLUS_ONE = CounterMetric('fitmind_n_plus_one_suspects_total', 'Requests over the query threshold.', ('view',))
+
+METRICS = (REQUEST_SECONDS, DB_QUERIES, DB_SECONDS, LLM_SECONDS, RESPONSE_BYTES, LLM_CALLS, N_PLUS_ONE)
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_seconds', 'llm_seconds', 'statements', 'finished')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.llm_seconds = 0.0
+        self.statements = Counter()
+        self.finished = False
+
+
+current = ContextVar('fitmind_request_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current.get()
+    if stats is None or stats.finished:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_seconds += time.perf_counter() - started
+        stats.queries += 1
+        stats.statements[sql] += 1
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def record_llm(seconds, ok):
+    """Called by maini.llm for every finished Gemini call."""
+    LLM_CALLS.observe(seconds, 'ok' if ok else 'error')
+    stats = current.get()
+    if stats is not None:
+        stats.llm_seconds += seconds
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return (match.view_name or match._func_path) if match else '<unmatched>'
+
+
+def _finish(request, response, stats, started, size):
+    stats.finished = True
+    view = _view_name(request)
+    REQUEST_SECONDS.observe(time.perf_counter() - started, view, request.method, response.status_code)
+    DB_QUERIES.observe(stats.queries, view)
+    DB_SECONDS.observe(stats.db_seconds, view)
+    if stats.llm_seconds:
+        LLM_SECONDS.observe(stats.llm_seconds, view)
+    RESPONSE_BYTES.observe(size, view)
+    threshold = get_config()['N_PLUS_ONE_THRESHOLD']
+    if threshold and stats.queries > threshold:
+        N_PLUS_ONE.inc(view)
+        sql, repeats = stats.statements.most_common(1)[0]
+        logger.warning('N+1 suspect: %s %s ran %d queries (%d distinct); repeated %d times: %s',
+                       request.method, request.path, stats.queries, len(stats.statements), repeats, sql[:300])
+
+
+def _count_sync(chunks, done):
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    finally:
+        done(size)
+
+
+async def _count_async(chunks, done):
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    finally:
+        done(size)
+
+
+class MetricsMiddleware:
+    """Record per-view timings, query counts and response sizes (see module docstring)."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _start(self):
+        if not get_config()['ENABLED']:
+            return None, None
+        stats = RequestStats()
+        current.set(stats)
+        return stats, time.perf_counter()
+
+    def _complete(self, request, response, stats, started):
+        if response.streaming:
+            # Timed until the last chunk is sent
+            counter = _count_async if response.is_async else _count_sync
+            response.streaming_content = counter(response.streaming_content,
+                                                 lambda size: _finish(request, response, stats, started, size))
+        else:
+            _finish(request, response, stats, started, len(response.content))
+        return response
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats, started = self._start()
+        response = self.get_response(request)
+        return self._complete(request, response, stats, started) if stats else response
+
+    async def __acall__(self, request):
+        stats, started = self._start()
+        response = await self.get_response(request)
+        return self._complete(request, response, stats, started) if stats else response
+
+
+def _collected():
+    """Gauges read from the LLM client, response cache and transcript queue at scrape time."""
+    from . import llm, response_cache, transcripts
+
+    gauges = []
+    llm_stats = llm.stats.snapshot()
+    for field in llm.LLMStats.FIELDS:
+        gauges.append(('fitmind_llm_' + field + '_total', 'counter', 'Gemini client ' + field.replace('_', ' ') + '.',
+                       llm_stats[field]))
+    gauges.append(('fitmind_llm_circuit_open', 'gauge', '1 while the Gemini circuit breaker is open.',
+                   int(llm_stats['breaker_state'] == 'open')))
+    reply_cache = response_cache.get_cache()
+    if reply_cache is not None:
+        for field, value in reply_cache.snapshot().items():
+            kind = 'gauge' if field == 'hit_ratio' else 'counter'
+            name = f'fitmind_response_cache_{field}' + ('' if kind == 'gauge' else '_total')
+            gauges.append((name, kind, f'Response cache {field.replace("_", " ")}.', value))
+    queue = transcripts.get_queue()
+    if queue is not None:
+        for field, value in queue.snapshot().items():
+            kind = 'gauge' if field == 'pending' else 'counter'
+            name = f'fitmind_transcripts_{field}' + ('' if kind == 'gauge' else '_total')
+            gauges.append((name, kind, f'Transcript queue {field}.', value))
+    return gauges
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for name, kind, help_text, value in _collected():
+        lines.extend([f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value}'])
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maini', '0002_chatsession_sessionmessage_userprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsession',
+            name='cache_opt_out',
+            field=models.BooleanField(default=False, help_text="Never serve or store this chat's replies in the response cache"),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maini', '0003_chatsession_cache_opt_out'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsession',
+            name='summary',
+            field=models.TextField(blank=True, default='', help_text='Rolling summary of messages older than the prompt window'),
+        ),
+        migrations.AddField(
+            model_name='chatsession',
+            name='summary_through',
+            field=models.BigIntegerField(default=0, help_text='Id of the newest message folded into the summary'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maini', '0004_chatsession_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatsession',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='chatsession_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sessionmessage',
+            index=models.Index(fields=['session', 'created_at', 'id'], name='sessionmsg_session_created_idx'),
+        ),
+    ]
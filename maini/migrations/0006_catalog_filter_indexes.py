@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maini', '0005_chat_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mealplan',
+            index=models.Index(fields=['meal_type', 'calories'], name='mealplan_type_calories_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mealplan',
+            index=models.Index(fields=['calories'], name='mealplan_calories_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mealplan',
+            index=models.Index(fields=['protein_grams'], name='mealplan_protein_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='meditation',
+            index=models.Index(fields=['difficulty', 'duration_minutes'], name='meditation_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='meditation',
+            index=models.Index(fields=['meditation_type'], name='meditation_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='meditation',
+            index=models.Index(fields=['duration_minutes'], name='meditation_duration_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['intensity', 'duration_minutes'], name='workout_intensity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['duration_minutes'], name='workout_duration_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['calories_burned'], name='workout_calories_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Full-text index for maini.search: FTS5 on SQLite, tsvector + GIN on PostgreSQL.
+# Other backends get no table and searches fall back to the ORM.
+
+from django.db import migrations
+from django.db.utils import OperationalError
+
+
+# rowid = object id * 8 + kind code (see maini.search.KINDS)
+BACKFILL = [
+    "INSERT INTO maini_search (rowid, kind, object_id, owner_id, title, body) "
+    "SELECT id * 8 + 1, 'workout', id, NULL, name, description FROM maini_workout",
+    "INSERT INTO maini_search (rowid, kind, object_id, owner_id, title, body) "
+    "SELECT id * 8 + 2, 'meal', id, NULL, name, description || char(10) || ingredients FROM maini_mealplan",
+    "INSERT INTO maini_search (rowid, kind, object_id, owner_id, title, body) "
+    "SELECT id * 8 + 3, 'meditation', id, NULL, title, "
+    "description || char(10) || benefits || char(10) || meditation_type || char(10) || instructor FROM maini_meditation",
+    "INSERT INTO maini_search (rowid, kind, object_id, owner_id, title, body) "
+    "SELECT id * 8 + 4, 'chat', id, user_id, '', message || char(10) || response FROM maini_chatmessage",
+    "INSERT INTO maini_search (rowid, kind, object_id, owner_id, title, body) "
+    "SELECT m.id * 8 + 5, 'session', m.id, s.user_id, s.title, m.content "
+    "FROM maini_sessionmessage m JOIN maini_chatsession s ON s.id = m.session_id",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    "CREATE VIRTUAL TABLE maini_search USING fts5("
+                    "kind UNINDEXED, object_id UNINDEXED, owner_id UNINDEXED, title, body, "
+                    "tokenize = 'porter unicode61')"
+                )
+            except OperationalError:
+                # SQLite built without FTS5
+                return
+        elif vendor == 'postgresql':
+            cursor.execute(
+                "CREATE TABLE maini_search ("
+                "rowid bigint PRIMARY KEY, kind varchar(16) NOT NULL, object_id bigint NOT NULL, "
+                "owner_id integer NULL, title text NOT NULL, body text NOT NULL, "
+                "document tsvector GENERATED ALWAYS AS ("
+                "setweight(to_tsvector('english', title), 'A') || setweight(to_tsvector('english', body), 'B')"
+                ") STORED)"
+            )
+            cursor.execute("CREATE INDEX maini_search_document_idx ON maini_search USING gin (document)")
+        else:
+            return
+        for statement in BACKFILL:
+            if vendor == 'postgresql':
+                statement = statement.replace('char(10)', 'chr(10)')
+            cursor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS maini_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maini', '0006_catalog_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maini', '0007_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprogress',
+            name='current_streak',
+            field=models.IntegerField(default=0, help_text='consecutive active days ending on last_active_date'),
+        ),
+        migrations.AddField(
+            model_name='userprogress',
+            name='last_active_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprogress',
+            name='longest_streak',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='DailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('workouts', models.IntegerField(default=0)),
+                ('meditations', models.IntegerField(default=0)),
+                ('calories_burned', models.IntegerField(default=0)),
+                ('active_minutes', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'daily activity',
+                'constraints': [models.UniqueConstraint(fields=('user', 'date'), name='dailyactivity_user_date_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maini', '0008_progress_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('workouts', 'Workouts'), ('meals', 'Meal plans'), ('meditations', 'Meditations')], max_length=20)),
+                ('item_ids', models.JSONField(default=list, help_text='Catalog ids, best first')),
+                ('catalog_version', models.BigIntegerField(help_text='Catalog version the ids were scored against')),
+                ('computed_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'kind'), name='userrecommendation_user_kind_uniq')],
+            },
+        ),
+    ]
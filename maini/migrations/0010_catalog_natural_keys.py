@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:26
+
+# Catalog names were not unique before this migration. Rename every
+# duplicate but the oldest to "<name> (2)", "<name> (3)", ... so the unique
+# constraints can be added without losing rows or the assignments that point
+# at them. The search index title follows the new name.
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# model -> (natural key field, maini.search kind code)
+CATALOGS = {
+    'Workout': ('name', 1),
+    'MealPlan': ('name', 2),
+    'Meditation': ('title', 3),
+}
+
+
+def rename_duplicates(apps, schema_editor):
+    connection = schema_editor.connection
+    indexed = 'maini_search' in connection.introspection.table_names()
+    for model_name, (field, code) in CATALOGS.items():
+        model = apps.get_model('maini', model_name)
+        max_length = model._meta.get_field(field).max_length
+        duplicated = (model.objects.order_by().values(field).annotate(n=Count('id'))
+                      .filter(n__gt=1).values_list(field, flat=True))
+        taken = None
+        for value in list(duplicated):
+            if taken is None:
+                taken = set(model.objects.values_list(field, flat=True))
+            n = 1
+            for pk in model.objects.filter(**{field: value}).order_by('id').values_list('id', flat=True)[1:]:
+                while True:
+                    n += 1
+                    suffix = f' ({n})'
+                    renamed = value[:max_length - len(suffix)] + suffix
+                    if renamed not in taken:
+                        break
+                taken.add(renamed)
+                model.objects.filter(pk=pk).update(**{field: renamed})
+                if indexed:
+                    with connection.cursor() as cursor:
+                        cursor.execute('UPDATE maini_search SET title = %s WHERE rowid = %s', [renamed, pk * 8 + code])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maini', '0009_user_recommendations'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='mealplan',
+            constraint=models.UniqueConstraint(fields=('name',), name='mealplan_name_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='meditation',
+            constraint=models.UniqueConstraint(fields=('title',), name='meditation_title_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='workout',
+            constraint=models.UniqueConstraint(fields=('name',), name='workout_name_uniq'),
+        ),
+    ]
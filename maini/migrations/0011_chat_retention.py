@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maini', '0010_catalog_natural_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatsession',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, help_text='Older messages were moved to the archive (maini.retention)', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['timestamp'], name='chatmessage_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sessionmessage',
+            index=models.Index(fields=['created_at'], name='sessionmsg_created_idx'),
+        ),
+    ]
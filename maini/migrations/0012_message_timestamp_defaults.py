@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maini', '0011_chat_retention'),
+    ]
+
+    # auto_now_add -> default=timezone.now changes nothing in the schema; state
+    # only, so SQLite does not rebuild the two largest tables
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='chatmessage',
+                    name='timestamp',
+                    field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+                migrations.AlterField(
+                    model_name='sessionmessage',
+                    name='created_at',
+                    field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+            ],
+        ),
+    ]
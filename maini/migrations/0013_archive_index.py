@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maini', '0012_message_timestamp_defaults'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='restored_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Brought back from the archive; its line is still there', null=True),
+        ),
+        migrations.AddField(
+            model_name='sessionmessage',
+            name='restored_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Brought back from the archive; its line is still there', null=True),
+        ),
+        migrations.CreateModel(
+            name='SessionArchiveMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.CharField(help_text='YYYY-MM', max_length=7)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archive_months', to='maini.chatsession')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('session', 'month'), name='sessionarchivemonth_uniq')],
+            },
+        ),
+    ]
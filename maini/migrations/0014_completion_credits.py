@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:05
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def credit_existing(apps, schema_editor):
+    # Rows completed before this migration were counted with the catalog values of the time;
+    # today's values are the best record of that left
+    UserWorkout = apps.get_model('maini', 'UserWorkout')
+    UserMeditation = apps.get_model('maini', 'UserMeditation')
+    Workout = apps.get_model('maini', 'Workout')
+    Meditation = apps.get_model('maini', 'Meditation')
+    workout = Workout.objects.filter(pk=OuterRef('workout_id'))
+    UserWorkout.objects.filter(completed=True).update(
+        credited_calories=Subquery(workout.values('calories_burned')),
+        credited_minutes=Subquery(workout.values('duration_minutes')),
+    )
+    meditation = Meditation.objects.filter(pk=OuterRef('meditation_id'))
+    UserMeditation.objects.filter(completed=True).update(
+        credited_minutes=Subquery(meditation.values('duration_minutes')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maini', '0013_archive_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usermeditation',
+            name='credited_minutes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='userworkout',
+            name='credited_calories',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='userworkout',
+            name='credited_minutes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(credit_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:27
+
+import gzip
+import json
+import os
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def index_existing_archives(apps, schema_editor):
+    # Per-user exports read only indexed month files: index what is already archived
+    config = getattr(settings, 'FITMIND_RETENTION', None) or {}
+    archive_dir = str(config.get('ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive')))
+    indexes = {
+        'chat_messages': (apps.get_model('maini', 'ChatArchiveMonth'), 'user'),
+        'session_messages': (apps.get_model('maini', 'SessionArchiveMonth'), 'session'),
+    }
+    for dataset, (model, field) in indexes.items():
+        owner_model = model._meta.get_field(field).related_model
+        directory = os.path.join(archive_dir, dataset)
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.ndjson.gz'):
+                continue
+            with gzip.open(os.path.join(directory, name), 'rt', encoding='utf-8') as fh:
+                owners = {json.loads(line)[f'{field}_id'] for line in fh}
+            # Users and sessions deleted since keep their lines but get no index row
+            owners = owner_model.objects.filter(pk__in=owners).values_list('pk', flat=True)
+            model.objects.bulk_create([model(**{f'{field}_id': owner, 'month': name[:7]}) for owner in owners],
+                                      ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maini', '0014_completion_credits'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatArchiveMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.CharField(help_text='YYYY-MM', max_length=7)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_archive_months', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'month'), name='chatarchivemonth_uniq')],
+            },
+        ),
+        migrations.RunPython(index_existing_archives, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 
 # Workout Model
 class Workout(models.Model):
@@ -18,6 +19,17 @@ class Workout(models.Model):
     image = models.ImageField(upload_to='workouts/', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['intensity', 'duration_minutes'], name='workout_intensity_idx'),
+            models.Index(fields=['duration_minutes'], name='workout_duration_idx'),
+            models.Index(fields=['calories_burned'], name='workout_calories_idx'),
+        ]
+        constraints = [
+            # Natural key for catalog imports (maini.catalog_import)
+            models.UniqueConstraint(fields=['name'], name='workout_name_uniq'),
+        ]
     
     def __str__(self):
         return self.name
@@ -44,6 +56,17 @@ class MealPlan(models.Model):
     image = models.ImageField(upload_to='meals/', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['meal_type', 'calories'], name='mealplan_type_calories_idx'),
+            models.Index(fields=['calories'], name='mealplan_calories_idx'),
+            models.Index(fields=['protein_grams'], name='mealplan_protein_idx'),
+        ]
+        constraints = [
+            # Natural key for catalog imports (maini.catalog_import)
+            models.UniqueConstraint(fields=['name'], name='mealplan_name_uniq'),
+        ]
     
     def __str__(self):
         return self.name
@@ -68,6 +91,17 @@ class Meditation(models.Model):
     image = models.ImageField(upload_to='meditation_covers/', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['difficulty', 'duration_minutes'], name='meditation_difficulty_idx'),
+            models.Index(fields=['meditation_type'], name='meditation_type_idx'),
+            models.Index(fields=['duration_minutes'], name='meditation_duration_idx'),
+        ]
+        constraints = [
+            # Natural key for catalog imports (maini.catalog_import)
+            models.UniqueConstraint(fields=['title'], name='meditation_title_uniq'),
+        ]
     
     def __str__(self):
         return self.title
@@ -84,6 +118,10 @@ class UserProgress(models.Model):
     height = models.FloatField(null=True, blank=True, help_text="in cm")
     age = models.IntegerField(null=True, blank=True)
     daily_water_intake = models.IntegerField(default=0, help_text="in ml")
+    # Maintained by maini.progress from DailyActivity; see progress.live_streak for display
+    current_streak = models.IntegerField(default=0, help_text="consecutive active days ending on last_active_date")
+    longest_streak = models.IntegerField(default=0)
+    last_active_date = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -91,6 +129,25 @@ class UserProgress(models.Model):
         return f"{self.user.username}'s Progress"
 
 
+# Per-user daily rollup of completions, for streaks and weekly totals
+class DailyActivity(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_activity')
+    date = models.DateField()
+    workouts = models.IntegerField(default=0)
+    meditations = models.IntegerField(default=0)
+    calories_burned = models.IntegerField(default=0)
+    active_minutes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='dailyactivity_user_date_uniq'),
+        ]
+        verbose_name_plural = 'daily activity'
+
+    def __str__(self):
+        return f"{self.user.username} - {self.date}"
+
+
 # User profile for chatbot personalization
 class UserProfile(models.Model):
     ACTIVITY_CHOICES = [
@@ -146,6 +203,9 @@ class UserWorkout(models.Model):
     completed = models.BooleanField(default=False)
     completed_date = models.DateField(null=True, blank=True)
     assigned_date = models.DateField(auto_now_add=True)
+    # What the completion added to the progress aggregates (maini.progress)
+    credited_calories = models.PositiveIntegerField(default=0, editable=False)
+    credited_minutes = models.PositiveIntegerField(default=0, editable=False)
     
     class Meta:
         unique_together = ('user', 'workout')
@@ -175,6 +235,8 @@ class UserMeditation(models.Model):
     completed = models.BooleanField(default=False)
     completed_date = models.DateField(null=True, blank=True)
     assigned_date = models.DateField(auto_now_add=True)
+    # What the completion added to the progress aggregates (maini.progress)
+    credited_minutes = models.PositiveIntegerField(default=0, editable=False)
     
     class Meta:
         unique_together = ('user', 'meditation')
@@ -188,8 +250,17 @@ class ChatMessage(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_messages')
     message = models.TextField()
     response = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # A default rather than auto_now_add so queued and restored rows keep their own time
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     is_helpful = models.BooleanField(null=True, blank=True)
+    restored_at = models.DateTimeField(null=True, blank=True, editable=False,
+                                       help_text='Brought back from the archive; its line is still there')
+
+    class Meta:
+        indexes = [
+            # Retention scans and the admin date filter
+            models.Index(fields=['timestamp'], name='chatmessage_timestamp_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
@@ -199,9 +270,19 @@ class ChatMessage(models.Model):
 class ChatSession(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_sessions')
     title = models.CharField(max_length=200, default='New chat')
+    cache_opt_out = models.BooleanField(default=False, help_text='Never serve or store this chat\'s replies in the response cache')
+    summary = models.TextField(blank=True, default='', help_text='Rolling summary of messages older than the prompt window')
+    summary_through = models.BigIntegerField(default=0, help_text='Id of the newest message folded into the summary')
+    archived_at = models.DateTimeField(null=True, blank=True, help_text='Older messages were moved to the archive (maini.retention)')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Backs the keyset-paginated session list (newest first)
+            models.Index(fields=['user', 'updated_at', 'id'], name='chatsession_user_updated_idx'),
+        ]
+
     def __str__(self):
         return f"{self.title} ({self.user.username})"
 
@@ -216,10 +297,69 @@ class SessionMessage(models.Model):
     session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name='messages')
     role = models.CharField(max_length=20, choices=ROLE_CHOICES)
     content = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    restored_at = models.DateTimeField(null=True, blank=True, editable=False,
+                                       help_text='Brought back from the archive; its line is still there')
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Backs keyset-paginated history and the prompt tail window
+            models.Index(fields=['session', 'created_at', 'id'], name='sessionmsg_session_created_idx'),
+            # Retention scans across all sessions
+            models.Index(fields=['created_at'], name='sessionmsg_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.session.title} - {self.role} @ {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+# Which archive month files (maini.retention) hold messages of a session
+class SessionArchiveMonth(models.Model):
+    session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name='archive_months')
+    month = models.CharField(max_length=7, help_text='YYYY-MM')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'month'], name='sessionarchivemonth_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.session_id} @ {self.month}"
+
+
+# Which archive month files (maini.retention) hold chat messages of a user
+class ChatArchiveMonth(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_archive_months')
+    month = models.CharField(max_length=7, help_text='YYYY-MM')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month'], name='chatarchivemonth_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.month}"
+
+
+# Nightly precomputed recommendations (maini.recommend / precompute_recommendations)
+class UserRecommendation(models.Model):
+    KIND_CHOICES = [
+        ('workouts', 'Workouts'),
+        ('meals', 'Meal plans'),
+        ('meditations', 'Meditations'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recommendations')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    item_ids = models.JSONField(default=list, help_text='Catalog ids, best first')
+    catalog_version = models.BigIntegerField(help_text='Catalog version the ids were scored against')
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'kind'], name='userrecommendation_user_kind_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.kind}"
@@ -0,0 +1,112 @@
+"""Keyset (cursor) pagination for JSON list endpoints.
+
+A cursor is an opaque token holding the sort values of the last row served.
+The next page is fetched with ``WHERE (sort_key, id) < (last_sort_key, last_id)``
+so every page costs one index range scan, however deep the client scrolls.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+PAGE_SIZE = getattr(settings, 'FITMIND_PAGE_SIZE', 20)
+MAX_PAGE_SIZE = getattr(settings, 'FITMIND_MAX_PAGE_SIZE', 100)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_plain(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor('invalid cursor') from e
+    if not isinstance(values, list):
+        raise InvalidCursor('invalid cursor')
+    return values
+
+
+def page_size(request, default=PAGE_SIZE):
+    try:
+        size = int(request.GET.get('limit', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _after(fields, values):
+    # (f1, f2, ...) beyond (v1, v2, ...) in the requested direction, as nested ORs
+    condition = None
+    for i in reversed(range(len(fields))):
+        name = fields[i].lstrip('-')
+        op = 'lt' if fields[i].startswith('-') else 'gt'
+        step = Q(**{f'{name}__{op}': values[i]})
+        if condition is not None:
+            step |= Q(**{name: values[i]}) & condition
+        condition = step
+    return condition
+
+
+def _cursor_values(model, ordering, values):
+    # Cursors come from the client: coerce each value with its field, or reject it
+    if len(values) != len(ordering):
+        raise InvalidCursor('invalid cursor')
+    converted = []
+    for name, value in zip(ordering, values):
+        field = model._meta.get_field(name.lstrip('-'))
+        if value is None and not field.null or isinstance(value, (dict, list)):
+            raise InvalidCursor('invalid cursor')
+        try:
+            converted.append(field.to_python(value))
+        except (ValidationError, TypeError, ValueError) as e:
+            raise InvalidCursor('invalid cursor') from e
+    return converted
+
+
+def _page_queryset(queryset, ordering, cursor):
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = _cursor_values(queryset.model, ordering, decode_cursor(cursor))
+        queryset = queryset.filter(_after(ordering, values))
+    return queryset
+
+
+def _split_page(rows, ordering, limit):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        get = last.get if isinstance(last, dict) else lambda name: getattr(last, name)
+        next_cursor = encode_cursor([get(f.lstrip('-')) for f in ordering])
+    return rows, next_cursor
+
+
+def keyset_page(queryset, ordering, cursor=None, limit=PAGE_SIZE):
+    """Return (rows, next_cursor) for one page of `queryset`.
+
+    `ordering` must end in a unique field (normally ``'-id'`` or ``'id'``) so
+    the order is total. `next_cursor` is None on the last page.
+    """
+    queryset = _page_queryset(queryset, ordering, cursor)
+    return _split_page(list(queryset[:limit + 1]), ordering, limit)
+
+
+async def akeyset_page(queryset, ordering, cursor=None, limit=PAGE_SIZE):
+    """Async `keyset_page`, for async views."""
+    queryset = _page_queryset(queryset, ordering, cursor)
+    return _split_page([row async for row in queryset[:limit + 1]], ordering, limit)
@@ -0,0 +1,117 @@
+"""Cached, read-only snapshots of user profiles.
+
+Chat personalization reads a profile on every message. A `ProfileSnapshot`
+holds the stored fields plus everything derived from them (BMI, category,
+sleep and stress flags), computed once when the snapshot is built. Snapshots
+live in the Django cache per user and are dropped by ``maini.signals`` when
+the profile is saved or deleted. That reaches only the saving process's
+cache (LocMem by default) and ``QuerySet.update()`` bypasses it, so
+snapshots also expire after ``FITMIND_PROFILE_SNAPSHOT_TTL`` seconds: other
+workers see a change within that.
+"""
+from dataclasses import asdict, dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import UserProfile
+
+
+SNAPSHOT_TIMEOUT = getattr(settings, 'FITMIND_PROFILE_SNAPSHOT_TTL', 30)
+LOW_SLEEP_HOURS = 6
+
+# Cached for users without a profile, so they don't hit the DB every message either
+_NO_PROFILE = 'none'
+
+
+@dataclass(frozen=True, slots=True)
+class ProfileSnapshot:
+    user_id: int
+    age: int | None
+    height_cm: float | None
+    weight_kg: float | None
+    sleep_hours: float | None
+    activity_minutes: int | None
+    activity_level: str
+    stress_level: str
+    bmi: float | None
+    bmi_category: str | None
+    low_sleep: bool
+    high_stress: bool
+
+    @classmethod
+    def from_profile(cls, profile):
+        bmi = profile.bmi()
+        return cls(
+            user_id=profile.user_id,
+            age=profile.age,
+            height_cm=profile.height_cm,
+            weight_kg=profile.weight_kg,
+            sleep_hours=profile.sleep_hours,
+            activity_minutes=profile.activity_minutes,
+            activity_level=profile.activity_level,
+            stress_level=profile.stress_level,
+            bmi=bmi,
+            bmi_category=_bmi_category(bmi),
+            low_sleep=bool(profile.sleep_hours) and profile.sleep_hours < LOW_SLEEP_HOURS,
+            high_stress=profile.stress_level == 'high',
+        )
+
+    def as_dict(self):
+        """Fields served by /api/profile/."""
+        data = asdict(self)
+        for key in ('user_id', 'low_sleep', 'high_stress'):
+            del data[key]
+        return data
+
+
+def _bmi_category(bmi):
+    # Same bands as UserProfile.bmi_category, without recomputing the BMI
+    if bmi is None:
+        return None
+    if bmi < 18.5:
+        return 'Underweight'
+    if bmi < 25:
+        return 'Normal'
+    if bmi < 30:
+        return 'Overweight'
+    return 'Obese'
+
+
+def _key(user_id):
+    return f'profile:{user_id}:snapshot'
+
+
+def _unpack(cached):
+    return None if cached == _NO_PROFILE else cached
+
+
+def get_snapshot(user):
+    """The user's ProfileSnapshot, or None for anonymous users and users without a profile."""
+    if user is None or not user.is_authenticated:
+        return None
+    key = _key(user.pk)
+    cached = cache.get(key)
+    if cached is not None:
+        return _unpack(cached)
+    profile = UserProfile.objects.filter(user_id=user.pk).first()
+    snapshot = ProfileSnapshot.from_profile(profile) if profile else None
+    cache.set(key, snapshot or _NO_PROFILE, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+async def aget_snapshot(user):
+    if user is None or not user.is_authenticated:
+        return None
+    key = _key(user.pk)
+    cached = await cache.aget(key)
+    if cached is not None:
+        return _unpack(cached)
+    profile = await UserProfile.objects.filter(user_id=user.pk).afirst()
+    snapshot = ProfileSnapshot.from_profile(profile) if profile else None
+    await cache.aset(key, snapshot or _NO_PROFILE, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def invalidate(user_id):
+    cache.delete(_key(user_id))
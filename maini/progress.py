@@ -0,0 +1,256 @@
+"""Incrementally maintained progress aggregates.
+
+`UserProgress` counters and the `DailyActivity` rollup are updated from the
+UserWorkout / UserMeditation signals in ``maini.signals`` whenever a row's
+``completed`` flag or ``completed_date`` changes. Every update is a single
+``UPDATE ... SET n = n + delta`` (F() expressions) inside one transaction,
+so concurrent completions never lose counts and reads never aggregate.
+
+Calories and minutes are taken from the workout/meditation at completion
+time and stored on the completion row (``credited_*``); un-completing or
+moving the day takes exactly those amounts back, however the catalog has
+changed since. ``QuerySet.update()`` and raw SQL bypass the signals; run
+``manage.py rebuild_progress`` after bulk changes.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Greatest, TruncWeek
+from django.utils import timezone
+
+from .models import DailyActivity, Meditation, UserMeditation, UserProgress, UserWorkout, Workout
+
+
+ACTIVE = Q(workouts__gt=0) | Q(meditations__gt=0)
+COUNTERS = ('workouts_completed', 'meditation_sessions', 'total_calories_burned')
+STREAK_FIELDS = ('current_streak', 'longest_streak', 'last_active_date')
+
+
+# Marks a field that was deferred when the row was loaded
+UNKNOWN = object()
+
+
+def completion_state(instance):
+    # Read from __dict__ so a deferred field never triggers a query
+    return instance.__dict__.get('completed', UNKNOWN), instance.__dict__.get('completed_date', UNKNOWN)
+
+
+# model -> fields holding what a completion credited
+CREDIT_FIELDS = {
+    UserWorkout: ('credited_calories', 'credited_minutes'),
+    UserMeditation: ('credited_minutes',),
+}
+
+
+def _catalog_credit(instance):
+    """{credit field: amount} for completing `instance` now, from its catalog item."""
+    if isinstance(instance, UserWorkout):
+        calories, minutes = Workout.objects.filter(pk=instance.workout_id).values_list(
+            'calories_burned', 'duration_minutes').first() or (0, 0)
+        return {'credited_calories': calories, 'credited_minutes': minutes}
+    minutes = Meditation.objects.filter(pk=instance.meditation_id).values_list('duration_minutes', flat=True).first() or 0
+    return {'credited_minutes': minutes}
+
+
+def _stored_credit(instance):
+    """{credit field: amount} recorded when `instance` was completed."""
+    fields = CREDIT_FIELDS[type(instance)]
+    credit = {f: instance.__dict__.get(f, UNKNOWN) for f in fields}
+    if UNKNOWN in credit.values():
+        # Deferred when loaded; gone too if this is a delete, then today's values are all there is
+        stored = type(instance).objects.filter(pk=instance.pk).values(*fields).first()
+        credit = stored or _catalog_credit(instance)
+    return credit
+
+
+def _amounts(instance, credit):
+    """(progress deltas, daily deltas) that one completion of `instance` with `credit` contributes."""
+    minutes = credit['credited_minutes']
+    if isinstance(instance, UserWorkout):
+        calories = credit['credited_calories']
+        return (
+            {'workouts_completed': 1, 'total_calories_burned': calories},
+            {'workouts': 1, 'calories_burned': calories, 'active_minutes': minutes},
+        )
+    return {'meditation_sessions': 1}, {'meditations': 1, 'active_minutes': minutes}
+
+
+def credit_completions(**lookups):
+    """Set ``credited_*`` from today's catalog on completed rows matching `lookups`.
+
+    For completions inserted without signals (bulk loads), before `rebuild`.
+    """
+    workout = Workout.objects.filter(pk=OuterRef('workout_id'))
+    UserWorkout.objects.filter(completed=True, **lookups).update(
+        credited_calories=Subquery(workout.values('calories_burned')),
+        credited_minutes=Subquery(workout.values('duration_minutes')),
+    )
+    meditation = Meditation.objects.filter(pk=OuterRef('meditation_id'))
+    UserMeditation.objects.filter(completed=True, **lookups).update(
+        credited_minutes=Subquery(meditation.values('duration_minutes')),
+    )
+
+
+def _add(model, lookup, deltas, sign):
+    """Atomically add sign * deltas to the row matching `lookup`, creating it if needed."""
+    updates = {field: F(field) + sign * value for field, value in deltas.items() if value}
+    if not updates or model.objects.filter(**lookup).update(**updates):
+        return
+    if sign < 0:
+        # Nothing recorded to take away from (aggregates predate this row); rebuild fixes it
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Created concurrently; the row exists now
+        model.objects.filter(**lookup).update(**updates)
+
+
+def record_completion_change(instance, old, new):
+    """Apply the difference between two (completed, completed_date) states of `instance`."""
+    (was_done, old_day), (done, day) = old, new
+    if (bool(was_done), old_day) == (bool(done), day) or not (was_done or done):
+        return
+    credit = _stored_credit(instance) if was_done else _catalog_credit(instance)
+    totals, daily = _amounts(instance, credit)
+    with transaction.atomic():
+        if not was_done:
+            # A field update rather than part of the save, which may have had update_fields
+            type(instance).objects.filter(pk=instance.pk).update(**credit)
+            for field, value in credit.items():
+                setattr(instance, field, value)
+        if bool(was_done) != bool(done):
+            _add(UserProgress, {'user_id': instance.user_id}, totals, 1 if done else -1)
+        if was_done and old_day:
+            _add(DailyActivity, {'user_id': instance.user_id, 'date': old_day}, daily, -1)
+        if done and day:
+            _add(DailyActivity, {'user_id': instance.user_id, 'date': day}, daily, 1)
+        if old_day or day:
+            refresh_streak(instance.user_id)
+
+
+def refresh_streak(user_id):
+    """Recompute the user's current streak from DailyActivity (reads only the run itself)."""
+    days = (DailyActivity.objects.filter(ACTIVE, user_id=user_id)
+            .order_by('-date').values_list('date', flat=True).iterator(chunk_size=64))
+    last_active = None
+    streak = 0
+    for day in days:
+        if last_active is None:
+            last_active = day
+        elif day != last_active - timedelta(days=streak):
+            break
+        streak += 1
+    UserProgress.objects.filter(user_id=user_id).update(
+        current_streak=streak,
+        longest_streak=Greatest(F('longest_streak'), streak),
+        last_active_date=last_active,
+    )
+
+
+def live_streak(progress, today=None):
+    """The streak to show today: the stored run only counts if it reached yesterday or today."""
+    today = today or timezone.localdate()
+    if progress.last_active_date and progress.last_active_date >= today - timedelta(days=1):
+        return progress.current_streak
+    return 0
+
+
+def weekly_totals(user_id, weeks=4, today=None):
+    """Per-week sums for the last `weeks` weeks (Monday-based), oldest first."""
+    today = today or timezone.localdate()
+    start = today - timedelta(days=today.weekday(), weeks=weeks - 1)
+    rows = (DailyActivity.objects.filter(user_id=user_id, date__gte=start)
+            .annotate(week=TruncWeek('date')).values('week')
+            .annotate(workouts=Sum('workouts'), meditations=Sum('meditations'),
+                      calories_burned=Sum('calories_burned'), active_minutes=Sum('active_minutes'))
+            .order_by('week'))
+    by_week = {row['week']: row for row in rows}
+    totals = []
+    for i in range(weeks):
+        week = start + timedelta(weeks=i)
+        row = by_week.get(week, {})
+        totals.append({
+            'week': week.isoformat(),
+            'workouts': row.get('workouts') or 0,
+            'meditations': row.get('meditations') or 0,
+            'calories_burned': row.get('calories_burned') or 0,
+            'active_minutes': row.get('active_minutes') or 0,
+        })
+    return totals
+
+
+def _streaks(dates):
+    """(current run ending at the last date, longest run) for ascending dates."""
+    current = longest = 0
+    previous = None
+    for day in dates:
+        current = current + 1 if previous and day == previous + timedelta(days=1) else 1
+        longest = max(longest, current)
+        previous = day
+    return current, longest
+
+
+def rebuild(user_ids=None, batch_size=1000):
+    """Recompute every aggregate from the completion tables; return the number of users rebuilt."""
+    workouts = UserWorkout.objects.filter(completed=True)
+    meditations = UserMeditation.objects.filter(completed=True)
+    if user_ids is not None:
+        workouts = workouts.filter(user_id__in=user_ids)
+        meditations = meditations.filter(user_id__in=user_ids)
+
+    totals = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for row in workouts.values('user_id').annotate(n=Count('id'), calories=Sum('credited_calories')):
+        totals[row['user_id']].update(workouts_completed=row['n'], total_calories_burned=row['calories'] or 0)
+    for row in meditations.values('user_id').annotate(n=Count('id')):
+        totals[row['user_id']]['meditation_sessions'] = row['n']
+
+    daily = defaultdict(lambda: {'workouts': 0, 'meditations': 0, 'calories_burned': 0, 'active_minutes': 0})
+    for row in (workouts.exclude(completed_date=None).values('user_id', 'completed_date')
+                .annotate(n=Count('id'), calories=Sum('credited_calories'), minutes=Sum('credited_minutes'))):
+        day = daily[row['user_id'], row['completed_date']]
+        day.update(workouts=row['n'], calories_burned=row['calories'] or 0, active_minutes=row['minutes'] or 0)
+    for row in (meditations.exclude(completed_date=None).values('user_id', 'completed_date')
+                .annotate(n=Count('id'), minutes=Sum('credited_minutes'))):
+        day = daily[row['user_id'], row['completed_date']]
+        day['meditations'] = row['n']
+        day['active_minutes'] += row['minutes'] or 0
+
+    dates = defaultdict(list)
+    for user_id, day in sorted(daily):
+        dates[user_id].append(day)
+
+    with transaction.atomic():
+        stale = DailyActivity.objects.all() if user_ids is None else DailyActivity.objects.filter(user_id__in=user_ids)
+        stale.delete()
+        DailyActivity.objects.bulk_create(
+            [DailyActivity(user_id=user_id, date=day, **values) for (user_id, day), values in daily.items()],
+            batch_size=batch_size,
+        )
+
+        progress_rows = UserProgress.objects.all() if user_ids is None else UserProgress.objects.filter(user_id__in=user_ids)
+        existing = {p.user_id: p for p in progress_rows}
+        affected = set(existing) | set(totals)
+        changed, created = [], []
+        for user_id in affected:
+            active_days = dates.get(user_id, [])
+            current, longest = _streaks(active_days)
+            values = dict(
+                totals[user_id],
+                current_streak=current,
+                longest_streak=longest,
+                last_active_date=active_days[-1] if active_days else None,
+            )
+            progress = existing.get(user_id)
+            if progress is None:
+                created.append(UserProgress(user_id=user_id, **values))
+            else:
+                for field, value in values.items():
+                    setattr(progress, field, value)
+                changed.append(progress)
+        UserProgress.objects.bulk_update(changed, COUNTERS + STREAK_FIELDS, batch_size=batch_size)
+        UserProgress.objects.bulk_create(created, batch_size=batch_size)
+    return len(affected)
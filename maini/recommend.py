@@ -0,0 +1,285 @@
+"""Vectorized catalog recommendations.
+
+Each catalog is encoded once into a float32 feature matrix (one-hot
+intensity / meal type / difficulty / meditation type, plus min-max scaled
+numbers such as duration, calories and macros). A profile snapshot becomes a
+weight vector over the same columns, so scoring every item is one
+matrix-vector product and the top k come from ``argpartition``. Matrices
+are rebuilt whenever the catalog version (``maini.catalog``) changes.
+
+`top_items` answers one user live. `batch_top_ids` scores many users at
+once; weight vectors depend only on a few profile fields, so identical ones
+are scored once. ``manage.py precompute_recommendations`` runs it nightly
+for every user and stores the ids in `UserRecommendation`; `stored_items`
+serves them while the catalog is unchanged.
+"""
+import threading
+from collections import Counter
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .catalog import CATALOG_MODELS, catalog_version
+from .models import UserProfile, UserRecommendation
+from .profiles import ProfileSnapshot
+
+
+MAX_MEDITATION_TYPES = 16
+BATCH_USERS = 1024
+PRECOMPUTED_ITEMS = 10
+
+
+class CatalogMatrix:
+    """Feature matrix for one catalog: row i describes the item with id ids[i]."""
+
+    __slots__ = ('kind', 'ids', 'names', 'columns', 'features', 'version', '_column_index')
+
+    def __init__(self, kind, ids, names, columns, features, version=None):
+        self.kind = kind
+        self.version = version
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.names = list(names)
+        self.columns = tuple(columns)
+        self.features = np.ascontiguousarray(features, dtype=np.float32)
+        self._column_index = {name: i for i, name in enumerate(self.columns)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def vector(self, weights):
+        """Dense weight vector for a {column: weight} dict; unknown columns are ignored."""
+        vec = np.zeros(len(self.columns), dtype=np.float32)
+        for column, weight in weights.items():
+            i = self._column_index.get(column)
+            if i is not None:
+                vec[i] += weight
+        return vec
+
+    def lookup(self, item_ids):
+        """[(id, name)] for the ids still in the catalog, in the given order."""
+        item_ids = np.asarray(item_ids, dtype=np.int64)
+        if not len(self.ids):
+            return []
+        # ids are sorted (rows are loaded ordered by id)
+        pos = np.searchsorted(self.ids, item_ids)
+        found = (pos < len(self.ids)) & (self.ids[np.minimum(pos, len(self.ids) - 1)] == item_ids)
+        return [(int(self.ids[p]), self.names[p]) for p in pos[found]]
+
+
+def _scaled(values):
+    # Min-max to [0, 1]; a constant column becomes all zeros
+    col = np.asarray(values, dtype=np.float32)
+    if not len(col):
+        return col
+    low, high = col.min(), col.max()
+    return (col - low) / (high - low) if high > low else np.zeros_like(col)
+
+
+def _one_hot(values, categories):
+    index = {c: i for i, c in enumerate(categories)}
+    out = np.zeros((len(values), len(categories)), dtype=np.float32)
+    for row, value in enumerate(values):
+        i = index.get(value)
+        if i is not None:
+            out[row, i] = 1.0
+    return out
+
+
+def encode(kind, rows, version=None):
+    """Build a CatalogMatrix from value rows as returned by `_catalog_rows`."""
+    ids = [r[0] for r in rows]
+    names = [r[1] for r in rows]
+    if kind == 'workouts':
+        categories = [c for c, _ in CATALOG_MODELS[kind].INTENSITY_CHOICES]
+        duration = np.array([r[3] for r in rows], dtype=np.float32)
+        calories = np.array([r[4] for r in rows], dtype=np.float32)
+        columns = [f'intensity:{c}' for c in categories] + ['duration', 'calories', 'calories_per_minute']
+        blocks = [_one_hot([r[2] for r in rows], categories), _scaled(duration)[:, None],
+                  _scaled(calories)[:, None], _scaled(calories / np.maximum(duration, 1))[:, None]]
+    elif kind == 'meals':
+        categories = [c for c, _ in CATALOG_MODELS[kind].MEAL_TYPE_CHOICES]
+        columns = [f'meal_type:{c}' for c in categories] + ['calories', 'protein', 'carbs', 'fat', 'prep_time']
+        blocks = [_one_hot([r[2] for r in rows], categories)] + [_scaled([r[i] for r in rows])[:, None] for i in range(3, 8)]
+    else:
+        categories = [c for c, _ in CATALOG_MODELS[kind].DIFFICULTY_CHOICES]
+        types = [(r[4] or '').strip().lower() for r in rows]
+        vocabulary = [t for t, _ in Counter(t for t in types if t).most_common(MAX_MEDITATION_TYPES)]
+        columns = [f'difficulty:{c}' for c in categories] + ['duration'] + [f'type:{t}' for t in vocabulary]
+        blocks = [_one_hot([r[2] for r in rows], categories), _scaled([r[3] for r in rows])[:, None],
+                  _one_hot(types, vocabulary)]
+    features = np.hstack(blocks) if rows else np.zeros((0, len(columns)), dtype=np.float32)
+    return CatalogMatrix(kind, ids, names, columns, features, version)
+
+
+_FIELDS = {
+    'workouts': ('id', 'name', 'intensity', 'duration_minutes', 'calories_burned'),
+    'meals': ('id', 'name', 'meal_type', 'calories', 'protein_grams', 'carbs_grams', 'fat_grams', 'preparation_time'),
+    'meditations': ('id', 'title', 'difficulty', 'duration_minutes', 'meditation_type'),
+}
+
+
+def _catalog_rows(kind):
+    return list(CATALOG_MODELS[kind].objects.order_by('id').values_list(*_FIELDS[kind]))
+
+
+_matrices = {}
+_matrices_lock = threading.Lock()
+
+
+def get_matrix(kind):
+    """The current CatalogMatrix for `kind`, rebuilt after any catalog change."""
+    version = catalog_version(kind)
+    cached = _matrices.get(kind)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    with _matrices_lock:
+        cached = _matrices.get(kind)
+        if cached is None or cached[0] != version:
+            cached = (version, encode(kind, _catalog_rows(kind), version))
+            _matrices[kind] = cached
+    return cached[1]
+
+
+def profile_weights(kind, snapshot):
+    """{column: weight} describing what suits `snapshot` (None = no profile)."""
+    w = {}
+
+    def add(column, weight):
+        w[column] = w.get(column, 0.0) + weight
+
+    if kind == 'workouts':
+        level = snapshot.activity_level if snapshot else 'moderate'
+        if level == 'low':
+            add('intensity:low', 1.0)
+            add('intensity:high', -1.0)
+            add('duration', -0.5)
+        elif level == 'high':
+            add('intensity:high', 1.0)
+            add('duration', 0.3)
+            add('calories_per_minute', 0.5)
+        else:
+            add('intensity:medium', 1.0)
+        if snapshot:
+            if snapshot.bmi_category in ('Overweight', 'Obese'):
+                add('calories', 1.0)
+                add('calories_per_minute', 0.5)
+            elif snapshot.bmi_category == 'Underweight':
+                add('calories', -0.5)
+            if snapshot.high_stress:
+                add('intensity:low', 0.3)
+            if snapshot.low_sleep:
+                add('intensity:high', -0.3)
+    elif kind == 'meals':
+        add('prep_time', -0.2)
+        category = snapshot.bmi_category if snapshot else None
+        if category in ('Overweight', 'Obese'):
+            add('calories', -1.0)
+            add('protein', 0.5)
+            add('fat', -0.5)
+        elif category == 'Underweight':
+            add('calories', 1.0)
+            add('protein', 1.0)
+        else:
+            add('protein', 0.5)
+        if snapshot and snapshot.activity_level == 'high':
+            add('carbs', 0.5)
+            add('protein', 0.5)
+    else:
+        add('difficulty:beginner', 0.5 if snapshot else 1.0)
+        add('duration', -0.3)
+        if snapshot and snapshot.high_stress:
+            add('duration', -0.5)
+            add('type:breathing', 1.0)
+            add('type:mindfulness', 0.5)
+        if snapshot and snapshot.low_sleep:
+            add('type:sleep', 1.0)
+            add('type:body scan', 1.0)
+            add('type:visualization', 0.5)
+    return w
+
+
+def _top_k(scores, k):
+    """Indices of the k highest scores, best first (scores: 1-D, or 2-D row-wise)."""
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros(scores.shape[:-1] + (0,), dtype=np.int64)
+    part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=-1), axis=-1, kind='stable')
+    return np.take_along_axis(part, order, axis=-1)
+
+
+def top_items(kind, snapshot, k=5, exclude=()):
+    """[(id, name, score)] of the k best `kind` items for `snapshot`, skipping ids in `exclude`."""
+    matrix = get_matrix(kind)
+    if not len(matrix):
+        return []
+    scores = matrix.features @ matrix.vector(profile_weights(kind, snapshot))
+    if exclude:
+        scores[np.isin(matrix.ids, np.fromiter(exclude, dtype=np.int64))] = -np.inf
+    picks = [i for i in _top_k(scores, k) if np.isfinite(scores[i])]
+    return [(int(matrix.ids[i]), matrix.names[i], float(scores[i])) for i in picks]
+
+
+def batch_top_ids(kind, snapshots, k=PRECOMPUTED_ITEMS, matrix=None):
+    """Top-k item ids for each snapshot, as an (n_users, k) array."""
+    matrix = matrix or get_matrix(kind)
+    if not len(matrix) or not snapshots:
+        return np.zeros((len(snapshots), 0), dtype=np.int64)
+    result = []
+    for start in range(0, len(snapshots), BATCH_USERS):
+        chunk = snapshots[start:start + BATCH_USERS]
+        weights = np.stack([matrix.vector(profile_weights(kind, s)) for s in chunk])
+        distinct, inverse = np.unique(weights, axis=0, return_inverse=True)
+        top = matrix.ids[_top_k(distinct @ matrix.features.T, k)]
+        result.append(top[inverse.reshape(-1)])
+    return np.vstack(result)
+
+
+def precompute(user_ids=None, k=PRECOMPUTED_ITEMS, batch_size=1000):
+    """Store the top k of every catalog for each user; return the number of users processed."""
+    matrices = {kind: get_matrix(kind) for kind in CATALOG_MODELS}
+    users = User.objects.order_by('pk').values_list('pk', flat=True)
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+    computed_at = timezone.now()
+    done = 0
+    batch = []
+    for user_id in users.iterator(chunk_size=batch_size):
+        batch.append(user_id)
+        if len(batch) == batch_size:
+            _store(batch, matrices, k, computed_at, batch_size)
+            done += len(batch)
+            batch = []
+    if batch:
+        _store(batch, matrices, k, computed_at, batch_size)
+        done += len(batch)
+    return done
+
+
+def _store(user_ids, matrices, k, computed_at, batch_size):
+    profiles = {p.user_id: ProfileSnapshot.from_profile(p) for p in UserProfile.objects.filter(user_id__in=user_ids)}
+    snapshots = [profiles.get(user_id) for user_id in user_ids]
+    rows = []
+    for kind, matrix in matrices.items():
+        top = batch_top_ids(kind, snapshots, k, matrix)
+        rows.extend(
+            UserRecommendation(user_id=user_id, kind=kind, item_ids=ids.tolist(),
+                               catalog_version=matrix.version, computed_at=computed_at)
+            for user_id, ids in zip(user_ids, top)
+        )
+    UserRecommendation.objects.bulk_create(
+        rows, batch_size=batch_size, update_conflicts=True, unique_fields=['user', 'kind'],
+        update_fields=['item_ids', 'catalog_version', 'computed_at'],
+    )
+
+
+def stored_items(user_id, kind, k=5):
+    """[(id, name)] from the nightly run, or None if there is none for the current catalog."""
+    matrix = get_matrix(kind)
+    row = UserRecommendation.objects.filter(user_id=user_id, kind=kind).values_list(
+        'item_ids', 'catalog_version').first()
+    if row is None or row[1] != matrix.version or len(row[0]) < min(k, len(matrix)):
+        return None
+    return matrix.lookup(row[0][:k])
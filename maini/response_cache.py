@@ -0,0 +1,202 @@
+"""Cache for Gemini replies to near-identical prompts.
+
+Keys hash the normalized prompt, the system prompt version and a coarse profile
+bucket (stress, activity, BMI category), so users with similar profiles share
+answers while personalization still holds. Configure with
+``FITMIND_RESPONSE_CACHE`` in settings; sessions flagged ``cache_opt_out`` are
+never read from or written to the cache.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .llm import SYSTEM_PROMPT_VERSION
+
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_prompt(text):
+    # Case, runs of whitespace and trailing punctuation don't change the answer
+    return _WHITESPACE.sub(' ', text.lower()).strip().rstrip('?!. ')
+
+
+def profile_bucket(profile):
+    if profile is None:
+        return 'anonymous'
+    return f'{profile.stress_level}:{profile.activity_level}:{profile.bmi_category or "unknown"}'
+
+
+def make_key(prompt_text, profile=None):
+    raw = '\x1f'.join((SYSTEM_PROMPT_VERSION, profile_bucket(profile), normalize_prompt(prompt_text)))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class LocMemBackend:
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries=1000, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Store a value; return how many entries were evicted to make room."""
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl, value)
+            self._data.move_to_end(key)
+            evicted = 0
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class FileBackend:
+    """One JSON file per entry; survives restarts and is shared between workers.
+
+    Reads touch the file's mtime, so evicting the oldest mtimes approximates LRU.
+    """
+
+    SWEEP_EVERY = 64
+
+    def __init__(self, path, max_entries=10000, ttl=3600):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._writes = 0
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file(self, key):
+        return os.path.join(self.path, f'{key}.json')
+
+    def get(self, key):
+        path = self._file(key)
+        try:
+            with open(path, encoding='utf-8') as fh:
+                expires, value = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if expires < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value):
+        path = self._file(key)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as fh:
+            json.dump([time.time() + self.ttl, value], fh)
+        os.replace(tmp, path)
+        self._writes += 1
+        if self._writes % self.SWEEP_EVERY == 0:
+            return self._sweep()
+        return 0
+
+    def _sweep(self):
+        entries = []
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.name.endswith('.json'):
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        pass
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return 0
+        entries.sort()
+        for _, path in entries[:excess]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return excess
+
+    def clear(self):
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.name.endswith('.json'):
+                    os.remove(entry.path)
+
+
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.counts = {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0}
+
+    def _incr(self, field, n=1):
+        with self._lock:
+            self.counts[field] += n
+
+    def get(self, key):
+        value = self.backend.get(key)
+        self._incr('misses' if value is None else 'hits')
+        return value
+
+    def set(self, key, value):
+        evicted = self.backend.set(key, value)
+        self._incr('sets')
+        if evicted:
+            self._incr('evictions', evicted)
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.counts['hits'] + self.counts['misses']
+            return dict(self.counts, hit_ratio=self.counts['hits'] / lookups if lookups else 0.0)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the configured ResponseCache, or None when caching is disabled."""
+    global _cache
+    config = getattr(settings, 'FITMIND_RESPONSE_CACHE', None) or {}
+    backend = config.get('BACKEND')
+    if not backend:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                ttl = config.get('TTL', 3600)
+                max_entries = config.get('MAX_ENTRIES', 1000)
+                if backend == 'file':
+                    _cache = ResponseCache(FileBackend(config['PATH'], max_entries=max_entries, ttl=ttl))
+                elif backend == 'locmem':
+                    _cache = ResponseCache(LocMemBackend(max_entries=max_entries, ttl=ttl))
+                else:
+                    raise ValueError(f'Unknown FITMIND_RESPONSE_CACHE backend: {backend!r}')
+    return _cache
@@ -0,0 +1,209 @@
+"""Retention for chat data: move old rows to compressed monthly archives.
+
+``FITMIND_RETENTION['POLICIES']`` keeps each dataset (``chat_messages``,
+``session_messages``) hot for a number of days. `apply_policy` walks older
+rows oldest first (using the timestamp indexes), BATCH_SIZE at a time; each
+batch is appended to ``<ARCHIVE_DIR>/<dataset>/<YYYY-MM>.ndjson.gz`` as its
+own gzip member (in the ``maini.export`` NDJSON layout), fsynced, and only
+then deleted from the hot table and the search index in one short
+transaction. A crash between the two steps leaves a row in both places; the
+next run archives it again and restores skip ids that already exist.
+
+Sessions with archived messages get ``archived_at`` set, and a
+`SessionArchiveMonth` row per month file holding some of them; users get a
+`ChatArchiveMonth` row per chat archive file holding theirs. Restores and
+per-user exports read only those files. Restored rows keep their ids and
+timestamps and get ``restored_at``: they stay hot for another policy period,
+after which they are deleted again without being re-appended (their lines
+never left the archive).
+"""
+import gzip
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import search
+from .export import DATASETS
+from .models import ChatArchiveMonth, ChatMessage, ChatSession, SessionArchiveMonth, SessionMessage
+
+
+# dataset -> (model, timestamp field, search kind)
+ARCHIVED = {
+    'chat_messages': (ChatMessage, 'timestamp', 'chat'),
+    'session_messages': (SessionMessage, 'created_at', 'session'),
+}
+
+
+def get_config():
+    config = getattr(settings, 'FITMIND_RETENTION', None) or {}
+    return {
+        'POLICIES': config.get('POLICIES', {}),
+        'ARCHIVE_DIR': str(config.get('ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archive'))),
+        'BATCH_SIZE': config.get('BATCH_SIZE', 1000),
+    }
+
+
+def _month_path(archive_dir, dataset, month):
+    return os.path.join(archive_dir, dataset, f'{month}.ndjson.gz')
+
+
+def _append(path, records):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    data = ''.join(encoder.encode(r) + '\n' for r in records).encode('utf-8')
+    # Appending a complete gzip member keeps the file a valid .gz
+    with open(path, 'ab') as fh:
+        fh.write(gzip.compress(data))
+        fh.flush()
+        os.fsync(fh.fileno())
+
+
+def archive_batch(dataset, cutoff, batch_size, archive_dir):
+    """Archive and delete up to `batch_size` rows older than `cutoff`; return how many."""
+    model, ts_field, kind = ARCHIVED[dataset]
+    fields = DATASETS[dataset][2]
+    rows = list(_expired(model, ts_field, cutoff).order_by(ts_field, 'pk')
+                .values(*fields, 'restored_at')[:batch_size])
+    if not rows:
+        return 0
+
+    by_month = defaultdict(list)
+    for row in rows:
+        # Restored rows are already in the archive; they are only deleted
+        if row['restored_at'] is None:
+            by_month[row[ts_field].strftime('%Y-%m')].append({f: row[f] for f in fields})
+    for month, records in by_month.items():
+        _append(_month_path(archive_dir, dataset, month), records)
+
+    ids = [row['id'] for row in rows]
+    with transaction.atomic():
+        # Raw delete: the per-row post_delete signals are replaced by one bulk index removal
+        with connection.cursor() as cursor:
+            placeholders = ', '.join(['%s'] * len(ids))
+            cursor.execute(f'DELETE FROM {model._meta.db_table} WHERE id IN ({placeholders})', ids)
+        search.remove_objects(kind, ids)
+        if dataset == 'session_messages':
+            ChatSession.objects.filter(pk__in={row['session_id'] for row in rows}).update(archived_at=cutoff)
+            SessionArchiveMonth.objects.bulk_create(
+                [SessionArchiveMonth(session_id=session_id, month=month)
+                 for month, records in by_month.items() for session_id in {r['session_id'] for r in records}],
+                ignore_conflicts=True,
+            )
+        else:
+            ChatArchiveMonth.objects.bulk_create(
+                [ChatArchiveMonth(user_id=user_id, month=month)
+                 for month, records in by_month.items() for user_id in {r['user_id'] for r in records}],
+                ignore_conflicts=True,
+            )
+    return len(rows)
+
+
+def _expired(model, ts_field, cutoff):
+    # Older than the cutoff, unless restored since then
+    return model.objects.filter(**{f'{ts_field}__lt': cutoff}).exclude(restored_at__gte=cutoff)
+
+
+def apply_policy(dataset, days=None, batch_size=None, pause=0.0, max_batches=None):
+    """Archive `dataset` rows older than `days` (default: the configured policy); return the count."""
+    config = get_config()
+    days = config['POLICIES'].get(dataset) if days is None else days
+    if days is None:
+        return 0
+    cutoff = timezone.now() - timedelta(days=days)
+    batch_size = batch_size or config['BATCH_SIZE']
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(dataset, cutoff, batch_size, config['ARCHIVE_DIR'])
+        total += moved
+        batches += 1
+        if moved < batch_size:
+            break
+        if pause:
+            # Let other writers in between transactions
+            time.sleep(pause)
+    return total
+
+
+def pending_counts():
+    """{dataset: rows currently past their policy}."""
+    config = get_config()
+    counts = {}
+    for dataset, days in config['POLICIES'].items():
+        if days is not None and dataset in ARCHIVED:
+            model, ts_field, _ = ARCHIVED[dataset]
+            cutoff = timezone.now() - timedelta(days=days)
+            counts[dataset] = _expired(model, ts_field, cutoff).count()
+    return counts
+
+
+def _archived_records(dataset, match, since=None, archive_dir=None, months=None):
+    """Yield archived records of `dataset` for which match(record) is true, oldest month first.
+
+    Only month files from `since` on are read, and only those in `months` if given.
+    """
+    directory = os.path.join(archive_dir or get_config()['ARCHIVE_DIR'], dataset)
+    if not os.path.isdir(directory):
+        return
+    first_month = since.strftime('%Y-%m') if since else ''
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.ndjson.gz') or name[:7] < first_month:
+            continue
+        if months is not None and name[:7] not in months:
+            continue
+        with gzip.open(os.path.join(directory, name), 'rt', encoding='utf-8') as fh:
+            for line in fh:
+                record = json.loads(line)
+                if match(record):
+                    yield record
+
+
+def _restore(model, ts_field, kind, records, batch_size=500):
+    """Insert archived records whose ids are not in the hot table; return how many."""
+    restored = 0
+    now = timezone.now()
+    for start in range(0, len(records), batch_size):
+        chunk = records[start:start + batch_size]
+        existing = set(model.objects.filter(pk__in=[r['id'] for r in chunk]).values_list('pk', flat=True))
+        objs = []
+        for r in chunk:
+            if r['id'] in existing:
+                continue
+            existing.add(r['id'])
+            objs.append(model(**dict(r, **{ts_field: parse_datetime(r[ts_field])}), restored_at=now))
+        if not objs:
+            continue
+        with transaction.atomic():
+            model.objects.bulk_create(objs)
+            if kind == 'session':
+                objs = list(model.objects.filter(pk__in=[o.pk for o in objs]).select_related('session'))
+            search.index_objects(objs)
+        restored += len(objs)
+    return restored
+
+
+def restore_session(session):
+    """Bring a session's archived messages back into SessionMessage; return how many."""
+    months = set(session.archive_months.values_list('month', flat=True))
+    # Sessions archived before the month index existed have none: scan from the session's start
+    since = None if months else session.created_at
+    records = list(_archived_records('session_messages', lambda r: r['session_id'] == session.pk,
+                                     since=since, months=months or None))
+    restored = _restore(SessionMessage, 'created_at', 'session', records)
+    ChatSession.objects.filter(pk=session.pk).update(archived_at=None)
+    session.archived_at = None
+    return restored
+
+
+def restore_chat_messages(user_id):
+    """Bring a user's archived ChatMessage rows back; return how many."""
+    months = set(ChatArchiveMonth.objects.filter(user_id=user_id).values_list('month', flat=True))
+    records = list(_archived_records('chat_messages', lambda r: r['user_id'] == user_id, months=months))
+    return _restore(ChatMessage, 'timestamp', 'chat', records)
@@ -0,0 +1,206 @@
+"""Full-text search over the catalog and chat history.
+
+All searchable text lives in one ``maini_search`` index table created by
+migration 0007: an FTS5 virtual table on SQLite, or a table with a generated
+``tsvector`` column and GIN index on PostgreSQL. Each row's rowid is
+``object_id * 8 + kind code``, so updates and deletes are primary-key
+lookups. Model signals keep it current; bulk inserts call `index_objects`
+themselves, and ``manage.py rebuild_search_index`` repopulates it from scratch.
+
+Catalog rows have no owner and are visible to everyone; chat rows carry their
+user's id and only match for that user.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Workout, MealPlan, Meditation, ChatMessage, SessionMessage
+
+
+TABLE = 'maini_search'
+
+
+def _document(kind, obj):
+    if kind == 'workout':
+        return None, obj.name, obj.description
+    if kind == 'meal':
+        return None, obj.name, f'{obj.description}\n{obj.ingredients}'
+    if kind == 'meditation':
+        return None, obj.title, f'{obj.description}\n{obj.benefits}\n{obj.meditation_type}\n{obj.instructor}'
+    if kind == 'chat':
+        return obj.user_id, '', f'{obj.message}\n{obj.response}'
+    if kind == 'session':
+        return obj.session.user_id, obj.session.title, obj.content
+    raise KeyError(kind)
+
+
+# kind -> (code, model); the code is the low 3 bits of the index rowid
+KINDS = {
+    'workout': (1, Workout),
+    'meal': (2, MealPlan),
+    'meditation': (3, Meditation),
+    'chat': (4, ChatMessage),
+    'session': (5, SessionMessage),
+}
+KIND_FOR_MODEL = {model: kind for kind, (_, model) in KINDS.items()}
+PUBLIC_KINDS = ('workout', 'meal', 'meditation')
+
+
+def _rowid(kind, object_id):
+    return object_id * 8 + KINDS[kind][0]
+
+
+_backend = None
+
+
+def backend():
+    """'sqlite' or 'postgresql' when the index table exists, else None."""
+    global _backend
+    if _backend is None:
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            _backend = ''
+        else:
+            with connection.cursor() as cursor:
+                tables = connection.introspection.table_names(cursor)
+            # Only remember a hit; the table may appear once migrations run
+            if TABLE in tables:
+                _backend = connection.vendor
+    return _backend or None
+
+
+def index_objects(objects):
+    """Add or refresh index rows for model instances of any searchable kind."""
+    if not backend():
+        return
+    rows = []
+    for obj in objects:
+        kind = KIND_FOR_MODEL[type(obj)]
+        owner_id, title, body = _document(kind, obj)
+        rows.append((_rowid(kind, obj.pk), kind, obj.pk, owner_id, title, body))
+    if not rows:
+        return
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, kind, object_id, owner_id, title, body) VALUES (%s, %s, %s, %s, %s, %s)',
+            rows,
+        )
+
+
+def remove_object(kind, object_id):
+    if not backend():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [_rowid(kind, object_id)])
+
+
+def remove_objects(kind, object_ids):
+    if not backend() or not object_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(_rowid(kind, pk),) for pk in object_ids])
+
+
+def retitle_session(session_id, title):
+    """Update the title stored on a session's message rows after a rename."""
+    if not backend():
+        return
+    code = KINDS['session'][0]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {TABLE} SET title = %s WHERE rowid IN '
+            f'(SELECT id * 8 + {code} FROM {SessionMessage._meta.db_table} WHERE session_id = %s)',
+            [title, session_id],
+        )
+
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def _fts_query(text):
+    # Quote every token so user input can't inject FTS5 syntax; prefix-match the last one
+    tokens = _TOKEN.findall(text)
+    if not tokens:
+        return None
+    quoted = ['"%s"' % t.replace('"', '""') for t in tokens]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search(text, kinds=None, user=None, limit=20):
+    """Ranked matches as dicts: kind, id, title, snippet, score (lower is better on SQLite)."""
+    kinds = [k for k in (kinds or KINDS) if k in KINDS]
+    engine = backend()
+    if not engine or not kinds or not text.strip():
+        return []
+
+    placeholders = ', '.join(['%s'] * len(kinds))
+    if user is None:
+        owner_clause, owner_args = 'owner_id IS NULL', []
+    elif user == 'any':
+        owner_clause, owner_args = '1 = 1', []
+    else:
+        owner_clause, owner_args = '(owner_id IS NULL OR owner_id = %s)', [user.pk]
+
+    if engine == 'sqlite':
+        query = _fts_query(text)
+        if query is None:
+            return []
+        # Title matches weigh ten times body matches
+        sql = (
+            f"SELECT kind, object_id, title, snippet({TABLE}, 4, '[', ']', '…', 12), bm25({TABLE}, 0, 0, 0, 10.0, 1.0) AS score "
+            f'FROM {TABLE} WHERE {TABLE} MATCH %s AND kind IN ({placeholders}) AND {owner_clause} '
+            f'ORDER BY score LIMIT %s'
+        )
+        args = [query, *kinds, *owner_args, limit]
+    else:
+        sql = (
+            f"SELECT kind, object_id, title, ts_headline('english', body, q, 'MaxWords=24, MinWords=8'), "
+            f'-ts_rank(document, q) AS score '
+            f"FROM {TABLE}, websearch_to_tsquery('english', %s) q WHERE document @@ q AND kind IN ({placeholders}) AND {owner_clause} "
+            f'ORDER BY score LIMIT %s'
+        )
+        args = [text, *kinds, *owner_args, limit]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, args)
+        return [
+            {'kind': kind, 'id': object_id, 'title': title, 'snippet': snippet, 'score': score}
+            for kind, object_id, title, snippet, score in cursor.fetchall()
+        ]
+
+
+def matching_ids(kind, text):
+    """Subquery of every `kind` object id matching `text` (any owner), for ``pk__in``."""
+    if backend() == 'sqlite':
+        query = _fts_query(text)
+        if query is None:
+            return RawSQL(f'SELECT object_id FROM {TABLE} WHERE 0', [])
+        return RawSQL(f'SELECT object_id FROM {TABLE} WHERE {TABLE} MATCH %s AND kind = %s', [query, kind])
+    return RawSQL(f"SELECT object_id FROM {TABLE} WHERE document @@ websearch_to_tsquery('english', %s) AND kind = %s",
+                  [text, kind])
+
+
+class FullTextSearchMixin:
+    """ModelAdmin mixin: answer the admin search box from the full-text index.
+
+    ``search_fields`` still controls whether the box is shown and is used as
+    the fallback when no index exists; ``extra_search_fields`` (plain
+    foreign-key lookups such as a username) are OR-ed in with the matches.
+    Matches are a subquery, so the changelist counts and pages through all
+    of them in the database.
+    """
+
+    fulltext_kind = None
+    extra_search_fields = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not backend():
+            return super().get_search_results(request, queryset, search_term)
+
+        condition = Q(pk__in=matching_ids(self.fulltext_kind, search_term))
+        for field in self.extra_search_fields:
+            condition |= Q(**{f'{field}__icontains': search_term})
+        return queryset.filter(condition), False
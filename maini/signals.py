@@ -0,0 +1,100 @@
+from django.db.models.signals import post_init, post_save, post_delete, pre_save
+from django.utils import timezone
+from django.dispatch import receiver
+
+from . import profiles, progress, search
+from .catalog import KIND_FOR_MODEL, bump_catalog_version
+from .models import (Workout, MealPlan, Meditation, ChatMessage, ChatSession, SessionMessage, UserProfile,
+                     UserWorkout, UserMeditation)
+
+
+@receiver(post_save, sender=Workout)
+@receiver(post_save, sender=MealPlan)
+@receiver(post_save, sender=Meditation)
+@receiver(post_delete, sender=Workout)
+@receiver(post_delete, sender=MealPlan)
+@receiver(post_delete, sender=Meditation)
+def invalidate_catalog(sender, **kwargs):
+    # Any admin edit retires every cached page, fragment and payload for that catalog
+    bump_catalog_version(KIND_FOR_MODEL[sender])
+
+
+@receiver(post_save, sender=Workout)
+@receiver(post_save, sender=MealPlan)
+@receiver(post_save, sender=Meditation)
+@receiver(post_save, sender=ChatMessage)
+@receiver(post_save, sender=SessionMessage)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_objects([instance])
+
+
+@receiver(post_delete, sender=Workout)
+@receiver(post_delete, sender=MealPlan)
+@receiver(post_delete, sender=Meditation)
+@receiver(post_delete, sender=ChatMessage)
+@receiver(post_delete, sender=SessionMessage)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_object(search.KIND_FOR_MODEL[sender], instance.pk)
+
+
+# Session message index rows carry the session title; follow renames
+
+@receiver(post_init, sender=ChatSession)
+def remember_title(sender, instance, **kwargs):
+    # __dict__: reading a deferred title would cost a query per loaded session
+    instance._indexed_title = instance.__dict__.get('title')
+
+
+@receiver(post_save, sender=ChatSession)
+def retitle_search_index(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if created or raw or (update_fields is not None and 'title' not in update_fields):
+        return
+    if instance.title != instance._indexed_title:
+        search.retitle_session(instance.pk, instance.title)
+        instance._indexed_title = instance.title
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile_snapshot(sender, instance, **kwargs):
+    profiles.invalidate(instance.user_id)
+
+
+# Completion tracking: remember each row's (completed, completed_date) as
+# loaded, and hand changes to maini.progress after every save or delete.
+
+@receiver(post_init, sender=UserWorkout)
+@receiver(post_init, sender=UserMeditation)
+def remember_completion_state(sender, instance, **kwargs):
+    instance._completion_state = progress.completion_state(instance)
+
+
+@receiver(pre_save, sender=UserWorkout)
+@receiver(pre_save, sender=UserMeditation)
+def prepare_completion(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.completed and not instance.completed_date:
+        instance.completed_date = timezone.localdate()
+    if instance.pk and progress.UNKNOWN in instance._completion_state:
+        # Loaded with .only()/.defer(): fetch what is stored before it is overwritten
+        stored = sender.objects.filter(pk=instance.pk).values_list('completed', 'completed_date').first()
+        instance._completion_state = stored or (False, None)
+
+
+@receiver(post_save, sender=UserWorkout)
+@receiver(post_save, sender=UserMeditation)
+def track_completion(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    new = progress.completion_state(instance)
+    old = (False, None) if created else instance._completion_state
+    progress.record_completion_change(instance, old, new)
+    instance._completion_state = new
+
+
+@receiver(post_delete, sender=UserWorkout)
+@receiver(post_delete, sender=UserMeditation)
+def untrack_completion(sender, instance, **kwargs):
+    progress.record_completion_change(instance, instance._completion_state, (False, None))
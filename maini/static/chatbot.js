@@ -0,0 +1,384 @@
+// URLs come from data attributes on <body>, set by the template
+const chatbotUrl = document.body.dataset.chatbotUrl;
+
+// CSRF helper - ensure token is available
+function getCsrf() {
+    let token = document.querySelector('[name=csrfmiddlewaretoken]')?.value;
+    if (!token) {
+        console.warn('No CSRF token found in DOM, using empty string');
+        token = '';
+    }
+    console.log('CSRF token:', token ? 'present' : 'missing');
+    return token;
+}
+
+let currentSessionId = null;
+// Cursors for the next (older) page of sessions / messages; null when exhausted
+let sessionsCursor = null;
+let sessionsLoading = false;
+let messagesCursor = null;
+let messagesLoading = false;
+
+async function fetchSessions(append = false){
+    if (sessionsLoading) return;
+    sessionsLoading = true;
+    try {
+        const url = append && sessionsCursor ? `/api/chatsessions/?cursor=${encodeURIComponent(sessionsCursor)}` : '/api/chatsessions/';
+        const res = await fetch(url);
+        if(!res.ok) return;
+        const j = await res.json();
+        const list = document.getElementById('sessionsList');
+        if (!append) list.innerHTML = '';
+        sessionsCursor = j.next_cursor;
+        renderSessions(list, j.sessions);
+    } finally {
+        sessionsLoading = false;
+    }
+}
+
+function renderSessions(list, sessions){
+    sessions.forEach(s => {
+        const el = document.createElement('div');
+        el.style.padding = '8px';
+        el.style.borderRadius = '8px';
+        el.style.cursor = 'pointer';
+        el.style.marginBottom = '6px';
+        el.style.background = '#fbfbfb';
+        el.textContent = s.title || ('Chat ' + s.id);
+        el.onclick = () => loadSession(s.id);
+        list.appendChild(el);
+    });
+}
+
+async function createSession(){
+    const title = prompt('Title for new chat (optional)') || 'New chat';
+    const res = await fetch('/api/chatsessions/', {
+        method: 'POST',
+        headers: {'Content-Type':'application/json','X-CSRFToken': getCsrf()},
+        body: JSON.stringify({title})
+    });
+    if(res.ok){ await fetchSessions(); }
+}
+
+async function loadSession(id){
+    currentSessionId = id;
+    messagesCursor = null;
+    const res = await fetch(`/api/chatsessions/${id}/messages/`);
+    if(!res.ok) return;
+    const j = await res.json();
+    const container = document.getElementById('messagesContainer');
+    container.innerHTML = '';
+    messagesCursor = j.next_cursor;
+    j.messages.forEach(m => addMessageToChat(m.content, m.role));
+}
+
+// Prepend the previous page of history, keeping the visible message in place
+async function loadOlderMessages(){
+    if (!currentSessionId || !messagesCursor || messagesLoading) return;
+    messagesLoading = true;
+    const sessionId = currentSessionId;
+    try {
+        const res = await fetch(`/api/chatsessions/${sessionId}/messages/?cursor=${encodeURIComponent(messagesCursor)}`);
+        if(!res.ok || sessionId !== currentSessionId) return;
+        const j = await res.json();
+        const container = document.getElementById('messagesContainer');
+        const previousHeight = container.scrollHeight;
+        const first = container.firstChild;
+        j.messages.forEach(m => {
+            const div = document.createElement('div');
+            div.className = `message ${m.role}`;
+            const content = document.createElement('div');
+            content.className = 'message-content';
+            content.textContent = m.content;
+            div.appendChild(content);
+            container.insertBefore(div, first);
+        });
+        container.scrollTop += container.scrollHeight - previousHeight;
+        messagesCursor = j.next_cursor;
+    } finally {
+        messagesLoading = false;
+    }
+}
+
+document.getElementById('sessionsList').addEventListener('scroll', (e) => {
+    const el = e.target;
+    if (sessionsCursor && el.scrollTop + el.clientHeight >= el.scrollHeight - 40) fetchSessions(true);
+});
+document.getElementById('messagesContainer').addEventListener('scroll', (e) => {
+    if (e.target.scrollTop < 40) loadOlderMessages();
+});
+
+document.getElementById('newSessionBtn').addEventListener('click', createSession);
+
+// Initialize
+fetchSessions();
+// Profile functions
+async function loadProfile(){
+    try {
+        console.log('Loading profile...');
+        const res = await fetch('/api/profile/');
+        const statusEl = document.getElementById('profileStatus');
+        if(!res.ok) {
+            console.error('Profile load failed:', res.status, res.statusText);
+            statusEl.textContent = `Error: ${res.status} ${res.statusText}`;
+            return;
+        }
+        const j = await res.json();
+        console.log('Profile loaded:', j);
+        const p = j.profile || {};
+
+        // Load values, handle null/undefined properly
+        document.getElementById('pf_age').value = (p.age !== null && p.age !== undefined && p.age !== 0) ? p.age : '';
+        document.getElementById('pf_height').value = (p.height_cm !== null && p.height_cm !== undefined && p.height_cm !== 0) ? p.height_cm : '';
+        document.getElementById('pf_weight').value = (p.weight_kg !== null && p.weight_kg !== undefined && p.weight_kg !== 0) ? p.weight_kg : '';
+        document.getElementById('pf_sleep').value = (p.sleep_hours !== null && p.sleep_hours !== undefined && p.sleep_hours !== 0) ? p.sleep_hours : '';
+        document.getElementById('pf_activity_mins').value = (p.activity_minutes !== null && p.activity_minutes !== undefined && p.activity_minutes !== 0) ? p.activity_minutes : '';
+        document.getElementById('pf_activity_level').value = p.activity_level || 'moderate';
+        document.getElementById('pf_stress_level').value = p.stress_level || 'medium';
+        showProfileSummary(p);
+        statusEl.textContent = '';
+    } catch(e) {
+        console.error('Profile load exception:', e);
+        document.getElementById('profileStatus').textContent = 'Load error';
+    }
+}
+
+async function saveProfile(){
+    try {
+        // Helper to safely convert to number or null
+        const toNum = (val) => {
+            const n = Number(val);
+            return isNaN(n) || val === '' ? null : n;
+        };
+
+        const payload = {
+            age: toNum(document.getElementById('pf_age').value),
+            height_cm: toNum(document.getElementById('pf_height').value),
+            weight_kg: toNum(document.getElementById('pf_weight').value),
+            sleep_hours: toNum(document.getElementById('pf_sleep').value),
+            activity_minutes: toNum(document.getElementById('pf_activity_mins').value),
+            activity_level: document.getElementById('pf_activity_level').value || 'moderate',
+            stress_level: document.getElementById('pf_stress_level').value || 'medium',
+        };
+        console.log('Saving profile:', payload);
+        const statusEl = document.getElementById('profileStatus');
+
+        const headers = {'Content-Type':'application/json'};
+        const csrfToken = getCsrf();
+        if (csrfToken) {
+            headers['X-CSRFToken'] = csrfToken;
+        }
+
+        const res = await fetch('/api/profile/', {
+            method: 'POST',
+            headers: headers,
+            body: JSON.stringify(payload)
+        });
+        console.log('Save response status:', res.status);
+        const responseText = await res.text();
+        console.log('Save response body:', responseText);
+
+        if(res.ok){
+            try {
+                const j = JSON.parse(responseText);
+                console.log('Saved successfully:', j);
+
+                const profile = j.profile || {};
+                showProfileSummary(profile);
+                statusEl.textContent = 'Saved ✓';
+
+                // Auto-generate a personalized message based on saved profile
+                const age = profile.age || '?';
+                const stress = profile.stress_level || 'medium';
+                const activity = profile.activity_level || 'moderate';
+                const sleep = profile.sleep_hours || '?';
+                const bmi = profile.bmi ? profile.bmi.toFixed(1) : '?';
+
+                // Create an automatic wellness greeting
+                let autoMessage = `I've saved my profile: Age ${age}, BMI ${bmi} (${profile.bmi_category || 'Normal'}), Sleep ${sleep}hrs, ${stress} stress, ${activity} activity level. Give me personalized wellness advice.`;
+
+                // Send this auto-message to chatbot
+                addMessageToChat(autoMessage, 'user');
+                showTypingIndicator();
+
+                const chatResponse = await fetch(chatbotUrl, {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'X-CSRFToken': csrfToken || ''
+                    },
+                    body: JSON.stringify({ message: autoMessage })
+                });
+
+                removeTypingIndicator();
+
+                if(chatResponse.ok){
+                    const chatData = await chatResponse.json();
+                    addMessageToChat(chatData.response, 'bot');
+                } else {
+                    addMessageToChat('Error getting personalized response.', 'bot');
+                }
+
+                setTimeout(() => statusEl.textContent = '', 3000);
+            } catch(e) {
+                console.error('Error parsing response:', e);
+                statusEl.textContent = 'Saved but could not parse response';
+            }
+        } else {
+            console.error('Save failed:', res.status, responseText);
+            statusEl.textContent = `Save failed: ${res.status}`;
+        }
+    } catch(e) {
+        console.error('Profile save exception:', e);
+        document.getElementById('profileStatus').textContent = 'Save error: ' + e.message;
+    }
+}
+
+function showProfileSummary(p){
+    const el = document.getElementById('profileSummary');
+    if(!p) { el.textContent = ''; return }
+    el.textContent = `BMI: ${p.bmi || '—'} ${p.bmi_category ? '('+p.bmi_category+')' : ''}`;
+}
+
+document.getElementById('loadProfileBtn').addEventListener('click', loadProfile);
+document.getElementById('saveProfileBtn').addEventListener('click', saveProfile);
+// Load profile on open
+loadProfile();
+
+const messagesContainer = document.getElementById('messagesContainer');
+const chatForm = document.getElementById('chatForm');
+const messageInput = document.getElementById('messageInput');
+
+chatForm.addEventListener('submit', async (e) => {
+    e.preventDefault();
+
+    const userMessage = messageInput.value.trim();
+    if (!userMessage) return;
+
+    // Add user message to chat
+    addMessageToChat(userMessage, 'user');
+    messageInput.value = '';
+
+    // Show typing indicator
+    showTypingIndicator();
+
+    try {
+        console.log('Sending message:', userMessage);
+
+        // Inside a saved chat, stream the Gemini reply token by token
+        if (currentSessionId) {
+            await streamSessionMessage(currentSessionId, userMessage);
+            return;
+        }
+
+        // Send message to server - profile is automatically fetched on server side
+        const response = await fetch(chatbotUrl, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': document.querySelector('[name=csrfmiddlewaretoken]').value,
+            },
+            body: JSON.stringify({ message: userMessage })
+        });
+
+        console.log('Response status:', response.status);
+
+        if (!response.ok) {
+            throw new Error(`Failed to send message: ${response.status}`);
+        }
+
+        const data = await response.json();
+        console.log('Received response:', data);
+        removeTypingIndicator();
+        addMessageToChat(data.response, 'bot');
+
+    } catch (error) {
+        removeTypingIndicator();
+        console.error('Error:', error);
+        addMessageToChat('Sorry, I encountered an error. Please try again.', 'bot');
+    }
+});
+
+// Read server-sent events from the streaming session endpoint and grow one bot bubble
+async function streamSessionMessage(sessionId, text) {
+    const response = await fetch(`/api/chatsessions/${sessionId}/messages/stream/`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCsrf(),
+        },
+        body: JSON.stringify({ message: text })
+    });
+    if (!response.ok || !response.body) {
+        throw new Error(`Failed to send message: ${response.status}`);
+    }
+
+    removeTypingIndicator();
+    const bubble = addMessageToChat('', 'bot');
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            let data = '';
+            frame.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            if (!data) continue;
+            const payload = JSON.parse(data);
+            if (event === 'error') {
+                bubble.textContent = payload.error;
+            } else if (event === 'done') {
+                bubble.textContent = payload.reply;
+            } else if (payload.delta) {
+                bubble.textContent += payload.delta;
+            }
+            messagesContainer.scrollTop = messagesContainer.scrollHeight;
+        }
+    }
+}
+
+function addMessageToChat(text, sender) {
+    const messageDiv = document.createElement('div');
+    messageDiv.className = `message ${sender}`;
+
+    const contentDiv = document.createElement('div');
+    contentDiv.className = 'message-content';
+    contentDiv.textContent = text;
+
+    messageDiv.appendChild(contentDiv);
+    messagesContainer.appendChild(messageDiv);
+
+    // Auto-scroll to bottom
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    return contentDiv;
+}
+
+function showTypingIndicator() {
+    const typingDiv = document.createElement('div');
+    typingDiv.className = 'message bot';
+    typingDiv.id = 'typingIndicator';
+
+    const contentDiv = document.createElement('div');
+    contentDiv.className = 'message-content';
+    contentDiv.innerHTML = '<div class="typing-indicator"><span class="typing-dot"></span><span class="typing-dot"></span><span class="typing-dot"></span></div>';
+
+    typingDiv.appendChild(contentDiv);
+    messagesContainer.appendChild(typingDiv);
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+}
+
+function removeTypingIndicator() {
+    const typing = document.getElementById('typingIndicator');
+    if (typing) typing.remove();
+}
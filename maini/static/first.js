@@ -0,0 +1,27 @@
+const chatbotFloatBtn = document.getElementById('chatbotFloatBtn');
+const chatbotModal = document.getElementById('chatbotModal');
+const chatbotModalClose = document.getElementById('chatbotModalClose');
+
+// Open chatbot modal
+chatbotFloatBtn.addEventListener('click', () => {
+    chatbotModal.classList.add('active');
+});
+
+// Close chatbot modal
+chatbotModalClose.addEventListener('click', () => {
+    chatbotModal.classList.remove('active');
+});
+
+// Close modal when clicking outside the content
+chatbotModal.addEventListener('click', (e) => {
+    if (e.target === chatbotModal) {
+        chatbotModal.classList.remove('active');
+    }
+});
+
+// Close modal with Escape key
+document.addEventListener('keydown', (e) => {
+    if (e.key === 'Escape' && chatbotModal.classList.contains('active')) {
+        chatbotModal.classList.remove('active');
+    }
+});
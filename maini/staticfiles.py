@@ -0,0 +1,52 @@
+"""WhiteNoise static file serving that does not cost a thread per request under ASGI.
+
+``WhiteNoiseMiddleware`` is sync-only, so in an async stack Django runs it,
+and everything under it, through ``sync_to_async``: every request, static or
+not, hops to a thread and back, and the async views below are re-entered via
+``async_to_sync``. `StaticFilesMiddleware` is the same middleware made async
+capable: non-static requests pass straight through on the event loop, and
+static files are answered with an async body so Django's ASGI handler does
+not consume a sync file iterator in a thread either. Under WSGI it behaves
+exactly like WhiteNoise.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        path = request.path_info
+        if not self.autorefresh:
+            static_file = self.files.get(path)
+        elif path.startswith(self.static_prefix):
+            # DEBUG: looks the file up on disk through the finders
+            static_file = await sync_to_async(self.find_file)(path)
+        else:
+            static_file = None
+        if static_file is None:
+            return await self.get_response(request)
+        response = self.serve(static_file, request)
+        response.streaming_content = _read_async(response.file_to_stream, response.block_size)
+        return response
+
+
+async def _read_async(file, block_size):
+    # Assets are small and usually in the page cache, so reading them on the loop beats a thread hop
+    if file is None:
+        return
+    while chunk := file.read(block_size):
+        yield chunk
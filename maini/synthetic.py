@@ -0,0 +1,330 @@
+"""Synthetic data for scale testing: users, profiles, catalogs, assignments and chats.
+
+`generate` creates ``BASE_COUNTS`` times a scale factor of catalog items and
+users, then fills in each user's profile, workout/meal/meditation
+assignments, ChatMessage history and chat sessions with messages
+(``PER_USER`` gives the average of each). Scale 1 is about 110k message rows;
+scale 100 is about 11M.
+
+Everything is drawn from per-user random generators seeded with
+``(seed, user index)``, and timestamps count back from the start of the day,
+so a seed gives the same data however the work is split across processes.
+Users are inserted first; their assignments and chats are then generated and
+bulk-inserted `CHUNK_USERS` users per transaction, in `workers` forked
+processes when asked (on SQLite, which allows one writer, the workers only
+build rows and the parent process inserts them). The two message tables,
+most of the rows, are written with ``executemany`` on plain tuples: building
+model instances for them costs more than the inserts.
+
+``bulk_create`` skips signals: run ``rebuild_search_index`` and
+``rebuild_progress`` afterwards if the search index and progress counters
+should cover the generated rows.
+"""
+import multiprocessing
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from .catalog import bump_catalog_version
+from .models import (ChatMessage, ChatSession, MealPlan, Meditation, SessionMessage, UserMealPlan, UserMeditation,
+                     UserProfile, UserWorkout, Workout)
+from .progress import credit_completions
+
+
+BASE_COUNTS = {'users': 1000, 'workouts': 100, 'meals': 100, 'meditations': 50}
+# Average rows per user; each user gets between 0 and twice the average
+PER_USER = {'workouts': 5, 'meals': 3, 'meditations': 4, 'chat_messages': 20, 'sessions': 3, 'session_messages': 30}
+PROFILE_SHARE = 0.9
+CHUNK_USERS = 500
+BATCH_SIZE = 5000
+
+FIRST_NAMES = ['alex', 'sam', 'maria', 'li', 'omar', 'priya', 'john', 'fatima', 'kenji', 'ana', 'david', 'chen',
+               'sofia', 'raj', 'emma', 'noah', 'aisha', 'lucas', 'mei', 'ivan']
+LAST_NAMES = ['smith', 'garcia', 'wang', 'khan', 'patel', 'kim', 'silva', 'mueller', 'rossi', 'novak', 'sato',
+              'brown', 'lopez', 'reddy', 'cohen', 'nguyen']
+WORKOUT_WORDS = (['Morning', 'Power', 'Core', 'Express', 'Endurance', 'Recovery', 'Full Body', 'Lower Body'],
+                 ['Run', 'HIIT', 'Yoga Flow', 'Circuit', 'Cycling', 'Pilates', 'Strength', 'Swim', 'Stretch'])
+MEAL_WORDS = (['Grilled', 'Roasted', 'Spicy', 'Mediterranean', 'Green', 'Protein', 'Overnight', 'Quick'],
+              ['Chicken Bowl', 'Salmon Plate', 'Oats', 'Lentil Curry', 'Tofu Stir-fry', 'Smoothie', 'Wrap', 'Salad'])
+MEDITATION_WORDS = (['Calm', 'Deep', 'Evening', 'Mindful', 'Gentle', 'Focused', 'Guided', 'Quiet'],
+                    ['Breathing', 'Body Scan', 'Visualization', 'Loving Kindness', 'Sleep', 'Mindfulness'])
+TOPICS = {
+    'workout': ('How can I fit a workout into a busy {day}?',
+                'Try a {n}-minute circuit: squats, push-ups and lunges, 40 seconds on and 20 off, three rounds.'),
+    'nutrition': ('What should I eat after training on {day}?',
+                  'Aim for about {n} g of protein with some carbs, for example rice with chicken or tofu.'),
+    'sleep': ('I only slept {n} hours last night, any tips?',
+              'Keep a fixed wake-up time, cut caffeine after noon and dim screens an hour before bed.'),
+    'stress': ('Work has been stressful since {day}.',
+               'A {n}-minute breathing practice helps: inhale for 4, hold for 1, exhale for 6.'),
+    'motivation': ('I keep skipping my {day} sessions.',
+                   'Make it smaller: commit to {n} minutes and let yourself stop after that.'),
+}
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+class GenerateError(ValueError):
+    pass
+
+
+def scaled_counts(scale):
+    return {name: max(1, round(count * scale)) for name, count in BASE_COUNTS.items()}
+
+
+def user_prefix(seed):
+    return f'synth{seed}_'
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the auto_now / auto_now_add values set on the objects."""
+    fields = [f for model in models for f in model._meta.concrete_fields
+              if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def _when(rng, anchor, days):
+    return anchor - timedelta(seconds=rng.randrange(days * 86400))
+
+
+def _catalog_rows(kind, count, seed, anchor, days):
+    rng = random.Random(f'{seed}:{kind}')
+    objs = []
+    for i in range(1, count + 1):
+        created = _when(rng, anchor, days)
+        if kind == 'workouts':
+            name = f'{rng.choice(WORKOUT_WORDS[0])} {rng.choice(WORKOUT_WORDS[1])} {seed}-{i}'
+            minutes = rng.randint(5, 90)
+            objs.append(Workout(
+                name=name, description=f'{name}: a {minutes}-minute session.', intensity=rng.choice(['low', 'medium', 'high']),
+                duration_minutes=minutes, calories_burned=minutes * rng.randint(4, 13), created_at=created, updated_at=created,
+            ))
+        elif kind == 'meals':
+            name = f'{rng.choice(MEAL_WORDS[0])} {rng.choice(MEAL_WORDS[1])} {seed}-{i}'
+            protein, carbs, fat = rng.uniform(2, 60), rng.uniform(5, 120), rng.uniform(2, 50)
+            objs.append(MealPlan(
+                name=name, meal_type=rng.choice(['breakfast', 'lunch', 'dinner', 'snack']), description=f'{name}.',
+                calories=round(4 * protein + 4 * carbs + 9 * fat), protein_grams=round(protein, 1),
+                carbs_grams=round(carbs, 1), fat_grams=round(fat, 1), ingredients='See recipe card.',
+                preparation_time=rng.randint(5, 75), created_at=created, updated_at=created,
+            ))
+        else:
+            words = MEDITATION_WORDS
+            kind_word = rng.choice(words[1])
+            title = f'{rng.choice(words[0])} {kind_word} {seed}-{i}'
+            objs.append(Meditation(
+                title=title, description=f'{title}.', difficulty=rng.choice(['beginner', 'intermediate', 'advanced']),
+                duration_minutes=rng.randint(3, 45), instructor=rng.choice(FIRST_NAMES).title(),
+                meditation_type=kind_word, benefits='Calmer mind, better focus.', created_at=created, updated_at=created,
+            ))
+    return objs
+
+
+def _message(rng):
+    user_text, reply = TOPICS[rng.choice(list(TOPICS))]
+    values = {'day': rng.choice(DAYS), 'n': rng.randint(4, 40)}
+    return user_text.format(**values), reply.format(**values)
+
+
+def _user_rows(index, user_id, seed, catalog_ids, anchor, days):
+    """Rows for one user: ({model: [objects]}, [chat message tuples], [(session, [message tuples])])."""
+    rng = random.Random(f'{seed}:user:{index}')
+    adapt = connection.ops.adapt_datetimefield_value
+    rows = {UserProfile: [], UserWorkout: [], UserMealPlan: [], UserMeditation: []}
+    chats = []
+    if rng.random() < PROFILE_SHARE:
+        height = rng.gauss(170, 10)
+        rows[UserProfile].append(UserProfile(
+            user_id=user_id, age=rng.randint(16, 80), height_cm=round(height, 1),
+            weight_kg=round(rng.gauss(22.5, 4) * (height / 100) ** 2, 1), sleep_hours=rng.choice([5, 6, 6.5, 7, 7.5, 8, 9]),
+            activity_minutes=rng.randint(0, 120), activity_level=rng.choice(['low', 'moderate', 'high']),
+            stress_level=rng.choice(['low', 'medium', 'high']), updated_at=_when(rng, anchor, days),
+        ))
+    for model, kind, fk in ((UserWorkout, 'workouts', 'workout_id'), (UserMeditation, 'meditations', 'meditation_id')):
+        ids = catalog_ids[kind]
+        for item_id in rng.sample(ids, min(len(ids), rng.randint(0, 2 * PER_USER[kind]))):
+            assigned = _when(rng, anchor, days)
+            completed = rng.random() < 0.6
+            done = (assigned + timedelta(days=rng.randint(0, 14))).date() if completed else None
+            rows[model].append(model(**{'user_id': user_id, fk: item_id}, completed=completed,
+                                     completed_date=min(done, anchor.date()) if done else None,
+                                     assigned_date=assigned.date()))
+    ids = catalog_ids['meals']
+    for item_id in rng.sample(ids, min(len(ids), rng.randint(0, 2 * PER_USER['meals']))):
+        rows[UserMealPlan].append(UserMealPlan(user_id=user_id, meal_plan_id=item_id, is_active=rng.random() < 0.7,
+                                               assigned_date=_when(rng, anchor, days).date()))
+    for _ in range(rng.randint(0, 2 * PER_USER['chat_messages'])):
+        message, response = _message(rng)
+        chats.append((user_id, message, response, adapt(_when(rng, anchor, days)),
+                      rng.choice([None, None, True, False])))
+    sessions = []
+    for _ in range(rng.randint(0, 2 * PER_USER['sessions'])):
+        at = _when(rng, anchor, days)
+        session = ChatSession(user_id=user_id, title=f'{rng.choice(list(TOPICS)).title()} chat', created_at=at)
+        messages = []
+        for n in range(rng.randint(0, PER_USER['session_messages']) * 2):
+            at += timedelta(seconds=rng.randint(5, 600))
+            if n % 2 == 0:
+                text, reply = _message(rng)
+            messages.append(('user', text, adapt(at)) if n % 2 == 0 else ('assistant', reply, adapt(at)))
+        session.updated_at = at
+        sessions.append((session, messages))
+    return rows, chats, sessions
+
+
+def _insert_rows(model, fields, rows, batch_size):
+    """INSERT tuples of `fields` values into `model`'s table (no model instances, no signals)."""
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+    sql = f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({", ".join(["%s"] * len(fields))})'
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
+
+
+# Set in each process by _init_worker (or directly when running in-process)
+_job = {}
+
+
+def _init_worker(seed, catalog_ids, anchor, days, batch_size):
+    _job.update(seed=seed, catalog_ids=catalog_ids, anchor=anchor, days=days, batch_size=batch_size)
+
+
+def build_chunk(users):
+    """Generate the rows for [(index, user id)]: ({model: [objects]}, chat tuples, sessions)."""
+    job = _job
+    rows = {}
+    chats = []
+    sessions = []
+    for index, user_id in users:
+        user_rows, user_chats, user_sessions = _user_rows(index, user_id, job['seed'], job['catalog_ids'],
+                                                          job['anchor'], job['days'])
+        for model, objs in user_rows.items():
+            rows.setdefault(model, []).extend(objs)
+        chats.extend(user_chats)
+        sessions.extend(user_sessions)
+    return rows, chats, sessions
+
+
+def insert_chunk(built):
+    """Insert one `build_chunk` result in a transaction; return {table: rows inserted}."""
+    rows, chats, sessions = built
+    batch_size = _job['batch_size']
+    counts = {}
+    with explicit_timestamps(*rows, ChatSession), transaction.atomic():
+        for model, objs in rows.items():
+            model.objects.bulk_create(objs, batch_size=batch_size)
+            counts[model._meta.db_table] = len(objs)
+        _insert_rows(ChatMessage, ('user', 'message', 'response', 'timestamp', 'is_helpful'), chats, batch_size)
+        ChatSession.objects.bulk_create([session for session, _ in sessions], batch_size=batch_size)
+        messages = [(session.pk, *message) for session, session_messages in sessions for message in session_messages]
+        _insert_rows(SessionMessage, ('session', 'role', 'content', 'created_at'), messages, batch_size)
+    counts[ChatMessage._meta.db_table] = len(chats)
+    counts[ChatSession._meta.db_table] = len(sessions)
+    counts[SessionMessage._meta.db_table] = len(messages)
+    return counts
+
+
+def fill_users(users):
+    return insert_chunk(build_chunk(users))
+
+
+def _bounded_map(pool, fn, items, window):
+    """pool.map that keeps at most `window` results pending, so memory stays flat."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _insert_catalogs(counts, seed, anchor, days, batch_size):
+    catalog_ids = {}
+    for kind, model in (('workouts', Workout), ('meals', MealPlan), ('meditations', Meditation)):
+        objs = _catalog_rows(kind, counts[kind], seed, anchor, days)
+        with explicit_timestamps(model), transaction.atomic():
+            model.objects.bulk_create(objs, batch_size=batch_size)
+        catalog_ids[kind] = [obj.pk for obj in objs]
+        bump_catalog_version(kind)
+    return catalog_ids
+
+
+def _insert_users(count, seed, anchor, days, batch_size):
+    rng = random.Random(f'{seed}:users')
+    prefix = user_prefix(seed)
+    # One hash for every user: hashing per user would dominate the run
+    password = make_password(f'synthetic-{seed}')
+    users = []
+    for i in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        users.append(User(username=f'{prefix}{first}.{last}.{i}', email=f'{first}.{last}.{i}@example.com',
+                          first_name=first.title(), last_name=last.title(), password=password,
+                          date_joined=_when(rng, anchor, days)))
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=batch_size)
+    if any(user.pk is None for user in users):
+        # Backends that cannot return ids from a bulk insert
+        ids = dict(User.objects.filter(username__startswith=prefix).values_list('username', 'pk'))
+        for user in users:
+            user.pk = ids[user.username]
+    return [(i, user.pk) for i, user in enumerate(users)]
+
+
+def generate(scale=1.0, seed=0, workers=1, batch_size=BATCH_SIZE, days=365, progress=None):
+    """Insert a synthetic dataset; return {table: rows inserted}.
+
+    `progress(counts)` is called with the running totals after each chunk of users.
+    """
+    if scale <= 0:
+        raise GenerateError('scale must be positive')
+    if User.objects.filter(username__startswith=user_prefix(seed)).exists():
+        raise GenerateError(f'data for seed {seed} already exists; pick another seed')
+    counts = scaled_counts(scale)
+    anchor = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+
+    catalog_ids = _insert_catalogs(counts, seed, anchor, days, batch_size)
+    users = _insert_users(counts['users'], seed, anchor, days, batch_size)
+    totals = {User._meta.db_table: len(users), Workout._meta.db_table: counts['workouts'],
+              MealPlan._meta.db_table: counts['meals'], Meditation._meta.db_table: counts['meditations']}
+    chunks = [users[i:i + CHUNK_USERS] for i in range(0, len(users), CHUNK_USERS)]
+    job = (seed, catalog_ids, anchor, days, batch_size)
+
+    def add(chunk_counts):
+        for table, n in chunk_counts.items():
+            totals[table] = totals.get(table, 0) + n
+        if progress:
+            progress(totals)
+
+    if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        # Children open their own connections; an inherited one must not be shared
+        connections.close_all()
+        _init_worker(*job)
+        # SQLite takes one writer at a time: there the workers only build rows and this process inserts them
+        single_writer = connection.vendor == 'sqlite'
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'),
+                                 initializer=_init_worker, initargs=job) as pool:
+            for result in _bounded_map(pool, build_chunk if single_writer else fill_users, chunks, 2 * workers):
+                add(insert_chunk(result) if single_writer else result)
+    else:
+        _init_worker(*job)
+        for chunk in chunks:
+            add(fill_users(chunk))
+    # Bulk inserts skip the completion signals, so credit the completed rows here
+    credit_completions(user__username__startswith=user_prefix(seed))
+    return totals
@@ -1,3 +1,1188 @@
-from django.test import TestCase
+import asyncio
+import base64
+import contextlib
+import gzip
+import io
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import requests
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, IntegrityError, OperationalError, connection
+from django.db.models import Count
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import (
+    dashboard, llm, log, metrics, profiles, progress, recommend, response_cache, retention, synthetic, transcripts,
+    views,
+)
+from .catalog import CATALOG_MODELS, CATALOG_QUERY, catalog_ordering, catalog_version
+from .context import build_session_prompt, fold_summary, select_window
+from .intents import INTENT_PRIORITY, KEYWORD_INTENTS, PHRASE_INTENTS, route_intent
+from .models import (
+    ChatMessage, ChatSession, DailyActivity, Meditation, MealPlan, SessionMessage, UserMealPlan, UserMeditation, UserProfile,
+    UserProgress, UserWorkout, Workout,
+)
+
+
+class DashboardQueryCountTests(TestCase):
+    # session + user (auth), user+progress, 3 assignment prefetches, weekly rollup
+    EXPECTED_QUERIES = 7
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('dash@example.com', 'dash@example.com', 'pw')
+        UserProfile.objects.create(user=self.user, height_cm=170, weight_kg=90, stress_level='high',
+                                   activity_level='low')
+        self.client.force_login(self.user)
+
+    def assign(self, n):
+        # Catalog names are unique; continue numbering from earlier calls
+        start = Workout.objects.count()
+        for i in range(start, start + n):
+            workout = Workout.objects.create(name=f'Workout {i}', description='d', intensity='low',
+                                             duration_minutes=10 + i, calories_burned=50 * i)
+            meal = MealPlan.objects.create(name=f'Meal {i}', meal_type='lunch', description='d', calories=400,
+                                           protein_grams=20, carbs_grams=40, fat_grams=10, ingredients='x',
+                                           preparation_time=15)
+            meditation = Meditation.objects.create(title=f'Meditation {i}', description='d', difficulty='beginner',
+                                                   duration_minutes=5 + i, meditation_type='Breathing', benefits='b')
+            UserWorkout.objects.create(user=self.user, workout=workout, completed=i % 2 == 0)
+            UserMealPlan.objects.create(user=self.user, meal_plan=meal)
+            UserMeditation.objects.create(user=self.user, meditation=meditation, completed=i % 3 == 0)
+
+    def fetch(self):
+        response = self.client.get('/api/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_query_count_does_not_grow_with_assignments(self):
+        self.assign(2)
+        self.fetch()  # warm the profile snapshot and catalog caches
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            data = self.fetch()
+        self.assertEqual(len(data['workouts']['pending']) + len(data['workouts']['completed']), 2)
+
+        self.assign(25)
+        self.fetch()
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            data = self.fetch()
+        self.assertEqual(len(data['meal_plans']), 27)
+        self.assertEqual(data['progress']['workouts_completed'], 14)
+
+    def test_lists_keep_only_the_newest_assignments(self):
+        self.assign(5)
+        self.fetch()
+        with mock.patch.object(dashboard, 'ASSIGNMENTS_PER_LIST', 2), self.assertNumQueries(self.EXPECTED_QUERIES):
+            data = self.fetch()
+        newest = UserWorkout.objects.order_by('-assigned_date', '-id')
+        for state, completed in (('pending', False), ('completed', True)):
+            expected = list(newest.filter(completed=completed).values_list('id', flat=True)[:2])
+            self.assertEqual([w['id'] for w in data['workouts'][state]], expected)
+            self.assertEqual(len(data['meditations'][state]), 2)
+        self.assertEqual(len(data['meal_plans']), 2)
+
+    def test_bmi_is_rounded_in_reasons(self):
+        self.assign(1)
+        make_catalog(1, start=10)
+        reasons = {r['kind']: r['reason'] for r in self.fetch()['recommendations']}
+        self.assertEqual(reasons['workouts'], 'Your BMI is 31.1 (Obese).')
+
+    def test_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/api/dashboard/').status_code, 403)
+
+
+def make_catalog(n, start=0):
+    # n rows per catalog with distinct names and a few tied sort values
+    for i in range(start, start + n):
+        Workout.objects.create(name=f'Workout {i}', description='d', intensity=('low', 'high')[i % 2],
+                               duration_minutes=10 + i % 3, calories_burned=50 * (i % 4))
+        MealPlan.objects.create(name=f'Meal {i}', meal_type='lunch', description='d', calories=400 + i % 3,
+                                protein_grams=20, carbs_grams=40, fat_grams=10, ingredients='x',
+                                preparation_time=15 + i % 2)
+        Meditation.objects.create(title=f'Meditation {i}', description='d', difficulty='beginner',
+                                  duration_minutes=5 + i % 2, meditation_type='Breathing', benefits='b')
+
+
+class CatalogApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_catalog(7)
+
+    def page_through(self, kind, sort):
+        ids, cursor = [], None
+        for _ in range(10):
+            params = {'sort': sort, 'limit': 3}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get(f'/api/catalog/{kind}/', params)
+            self.assertEqual(response.status_code, 200, (kind, sort, response.content))
+            data = response.json()
+            ids += [row['id'] for row in data['results']]
+            cursor = data['next_cursor']
+            if not cursor:
+                return ids
+        self.fail(f'{kind} sorted by {sort} did not finish paging')
+
+    def test_pages_through_every_sort(self):
+        for kind, spec in CATALOG_QUERY.items():
+            model = CATALOG_MODELS[kind]
+            for field in ('id',) + spec['sort']:
+                for sort in (field, f'-{field}'):
+                    ordering = catalog_ordering(kind, sort)
+                    expected = list(model.objects.order_by(*ordering).values_list('id', flat=True))
+                    self.assertEqual(self.page_through(kind, sort), expected, (kind, sort))
+
+    def test_rejects_non_finite_ranges(self):
+        for raw in ('nan', 'inf', '-Infinity', 'ten'):
+            response = self.client.get('/api/catalog/meals/', {'calories_min': raw})
+            self.assertEqual(response.status_code, 400, raw)
+        response = self.client.get('/api/catalog/meals/', {'calories_min': '401.5'})
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_rejects_unknown_sort(self):
+        response = self.client.get('/api/catalog/workouts/', {'sort': 'description'})
+        self.assertEqual(response.status_code, 400)
+
+
+def cursor_token(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+class TamperedCursorTests(TestCase):
+    BAD_CURSORS = [
+        'not base64 at all!',
+        cursor_token({'a': 1}),
+        cursor_token(['garbage', 1]),
+        cursor_token([{'a': 1}, 1]),
+        cursor_token(['x']),
+        cursor_token([None, 1]),
+        cursor_token(['2026-01-01T00:00:00+00:00', 1, 2]),
+    ]
+
+    def setUp(self):
+        cache.clear()
+        make_catalog(3)
+        self.user = User.objects.create_user('cursor@example.com', 'cursor@example.com', 'pw')
+        self.session = ChatSession.objects.create(user=self.user, title='t')
+        SessionMessage.objects.create(session=self.session, role='user', content='hi')
+        self.client.force_login(self.user)
+
+    def test_bad_cursors_are_400(self):
+        paths = ['/api/chatsessions/', f'/api/chatsessions/{self.session.id}/messages/',
+                 '/api/catalog/meals/', '/api/catalog/workouts/?sort=created_at']
+        for path in paths:
+            for cursor in self.BAD_CURSORS:
+                sep = '&' if '?' in path else '?'
+                response = self.client.get(f'{path}{sep}cursor={cursor}')
+                self.assertEqual(response.status_code, 400, (path, cursor))
+
+    def test_issued_cursor_still_works(self):
+        ChatSession.objects.create(user=self.user, title='second')
+        first = self.client.get('/api/chatsessions/?limit=1').json()
+        second = self.client.get('/api/chatsessions/', {'limit': 1, 'cursor': first['next_cursor']}).json()
+        self.assertEqual(len(second['sessions']), 1)
+        self.assertNotEqual(first['sessions'][0]['id'], second['sessions'][0]['id'])
+
+
+class CatalogVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_catalog(3)
+
+    def test_version_comes_from_the_table(self):
+        version = catalog_version('workouts')
+        cache.clear()  # as seen by a process that never saw the writes
+        self.assertEqual(catalog_version('workouts'), version)
+
+        workout = Workout.objects.first()
+        workout.duration_minutes += 1
+        workout.save()
+        edited = catalog_version('workouts')
+        self.assertNotEqual(edited, version)
+        workout.delete()
+        self.assertNotIn(catalog_version('workouts'), (version, edited))
+
+    @mock.patch('maini.catalog.CATALOG_VERSION_TTL', 0)
+    def test_etag_follows_writes_from_other_processes(self):
+        first = self.client.get('/workouts/')['ETag']
+        self.assertEqual(self.client.get('/workouts/', HTTP_IF_NONE_MATCH=first).status_code, 304)
+        # A write in another process: no signal reaches this one's cache
+        Workout.objects.filter(pk=Workout.objects.first().pk).update(name='Renamed', updated_at=timezone.now())
+        response = self.client.get('/workouts/', HTTP_IF_NONE_MATCH=first)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Renamed')
+
+
+class StoredRecommendationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_catalog(6)
+        self.user = User.objects.create_user('rec@example.com', 'rec@example.com', 'pw')
+        UserProfile.objects.create(user=self.user, activity_level='low', stress_level='high')
+
+    def test_nightly_rows_served_by_a_fresh_process(self):
+        recommend.precompute()
+        # The web process has its own cache and matrices, built after the job ran
+        cache.clear()
+        recommend._matrices.clear()
+        items = recommend.stored_items(self.user.pk, 'workouts', 3)
+        self.assertEqual(len(items), 3)
+
+    def test_catalog_change_retires_nightly_rows(self):
+        recommend.precompute()
+        make_catalog(1, start=6)
+        self.assertIsNone(recommend.stored_items(self.user.pk, 'workouts', 3))
+
+
+@mock.patch.object(transcripts.TranscriptQueue, '_ensure_worker')
+class TranscriptQueueTests(TestCase):
+    # No background thread: each test flushes by hand on the test's connection
+
+    def setUp(self):
+        spool = tempfile.TemporaryDirectory()
+        self.addCleanup(spool.cleanup)
+        self.spool_dir = spool.name
+        self.user = User.objects.create_user('queue@example.com', 'queue@example.com', 'pw')
+        self.session = ChatSession.objects.create(user=self.user, title='t')
+
+    def entry(self, content, at):
+        return {'kind': 'session', 'session_id': self.session.pk, 'role': 'user', 'content': content,
+                'at': at.isoformat()}
+
+    def close(self, queue):
+        if queue._spool is not None:
+            queue._spool.close()
+
+    def test_flush_keeps_send_times(self, _):
+        queue = transcripts.TranscriptQueue(self.spool_dir)
+        sent = timezone.now() - timedelta(minutes=5)
+        queue.put(self.entry('first', sent))
+        queue.put(self.entry('second', sent + timedelta(seconds=1)))
+        self.assertEqual(queue.flush(), 2)
+        stored = list(self.session.messages.values_list('content', 'created_at'))
+        self.assertEqual(stored, [('first', sent), ('second', sent + timedelta(seconds=1))])
+        self.assertEqual(os.listdir(self.spool_dir), [])
+        self.assertEqual(queue.snapshot()['pending'], 0)
+
+    def test_replays_spool_of_dead_process(self, _):
+        sent = timezone.now()
+        dead = transcripts.TranscriptQueue(self.spool_dir)
+        dead.put(self.entry('already stored', sent))
+        dead.put(self.entry('lost', sent))
+        self.close(dead)
+        transcripts.write_entries([self.entry('already stored', sent)])
+
+        queue = transcripts.TranscriptQueue(self.spool_dir)
+        self.assertEqual(queue.claim_orphans(min_age=0), 2)
+        self.assertEqual(queue.flush(), 1)
+        self.assertEqual(sorted(self.session.messages.values_list('content', flat=True)), ['already stored', 'lost'])
+        self.assertEqual(os.listdir(self.spool_dir), [])
+
+    def test_full_backlog_does_not_write_on_the_request_path(self, _):
+        queue = transcripts.TranscriptQueue(self.spool_dir, max_pending=1, flush_interval=0.01)
+        with mock.patch.object(transcripts, 'write_entries', side_effect=DatabaseError('locked')) as write:
+            queue.put(self.entry('one', timezone.now()))
+            queue.put(self.entry('two', timezone.now()))
+        self.close(queue)
+        write.assert_not_called()
+        self.assertEqual(queue.snapshot()['pending'], 2)
+        self.assertEqual(queue.counts['backlogged'], 2)
+
+    def test_bad_row_is_dead_lettered_without_blocking_the_rest(self, _):
+        queue = transcripts.TranscriptQueue(self.spool_dir)
+        write = transcripts.write_entries
+
+        def reject_bad(entries):
+            if any(e['content'] == 'bad' for e in entries):
+                raise IntegrityError('FOREIGN KEY constraint failed')
+            return write(entries)
+
+        with mock.patch.object(transcripts, 'write_entries', side_effect=reject_bad):
+            queue.put(self.entry('before', timezone.now()))
+            queue.put(self.entry('bad', timezone.now()))
+            queue.put(self.entry('after', timezone.now()))
+            self.assertEqual(queue.flush(), 2)
+            for attempt in range(transcripts.MAX_ATTEMPTS - 2):
+                with self.assertRaises(IntegrityError):
+                    queue.flush()
+            self.assertEqual(queue.snapshot()['pending'], 1)
+            with self.assertLogs('maini.transcripts', 'ERROR'):
+                queue.flush()
+            queue.put(self.entry('later', timezone.now()))
+            self.assertEqual(queue.flush(), 1)
+        self.close(queue)
+        self.assertEqual(sorted(self.session.messages.values_list('content', flat=True)), ['after', 'before', 'later'])
+        self.assertEqual(os.listdir(self.spool_dir), [transcripts.DEAD_LETTER])
+        with open(os.path.join(self.spool_dir, transcripts.DEAD_LETTER)) as fh:
+            [dead] = [json.loads(line) for line in fh]
+        self.assertEqual((dead['content'], dead['attempts']), ('bad', transcripts.MAX_ATTEMPTS))
+        self.assertEqual(queue.counts['dead'], 1)
+
+    def test_database_outage_does_not_use_up_attempts(self, _):
+        queue = transcripts.TranscriptQueue(self.spool_dir)
+        queue.put(self.entry('one', timezone.now()))
+        with mock.patch.object(transcripts, 'write_entries', side_effect=OperationalError('database is locked')):
+            for attempt in range(transcripts.MAX_ATTEMPTS + 1):
+                with self.assertRaises(OperationalError):
+                    queue.flush()
+        self.assertEqual(queue.flush(), 1)
+        self.assertNotIn(transcripts.DEAD_LETTER, os.listdir(self.spool_dir))
+
+    def test_queued_messages_reach_the_prompt_before_the_flush(self, _):
+        config = {'ENABLED': True, 'SPOOL_DIR': self.spool_dir}
+        with self.settings(FITMIND_TRANSCRIPT_QUEUE=config), mock.patch.object(transcripts, '_queue', None):
+            transcripts.record_session_messages(self.session, [('user', 'my knee hurts'), ('assistant', 'rest it')])
+            self.assertFalse(self.session.messages.exists())
+            self.assertEqual(transcripts.pending_for_session(self.session.pk),
+                             [(None, 'assistant', 'rest it'), (None, 'user', 'my knee hurts')])
+            self.assertIn('user: my knee hurts', build_session_prompt(self.session, 'what now?'))
+            queue = transcripts.get_queue()
+            queue.flush()
+            self.close(queue)
+            self.assertEqual(transcripts.pending_for_session(self.session.pk), [])
+        self.assertEqual(self.session.messages.count(), 2)
+
+    def test_disabled_by_default_writes_through(self, _):
+        transcripts.record_session_messages(self.session, [('user', 'hi')])
+        self.assertEqual(self.session.messages.count(), 1)
+
+
+class StreamBreakerTests(TestCase):
+    def setUp(self):
+        self.breaker = llm.CircuitBreaker(threshold=1, reset_timeout=30.0)
+        self.breaker.record_failure()
+        self.breaker._opened_at -= 60  # half-open: the next call is the trial
+        sse = b'data: {"candidates": [{"content": {"parts": [{"text": "Hi"}]}}]}\n\n' * 3
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=sse)))
+        for patcher in (mock.patch.object(llm, 'breaker', self.breaker),
+                        mock.patch.object(llm.GeminiClient, '_async_client',
+                                          lambda _: contextlib.nullcontext(self.client)),
+                        mock.patch.dict(os.environ, {'GOOGLE_API_KEY': 'test'})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_abandoned_stream_frees_the_trial_slot(self):
+        async def read_one():
+            stream = llm.stream_gemini('hi')
+            self.assertEqual(await anext(stream), 'Hi')
+            await stream.aclose()  # the browser went away mid-reply
+
+        asyncio.run(read_one())
+        self.assertEqual(self.breaker.state, 'half-open')
+        self.assertTrue(self.breaker.allow())
+
+    def test_finished_stream_closes_the_circuit(self):
+        async def read_all():
+            return [text async for text in llm.stream_gemini('hi')]
+
+        self.assertEqual(asyncio.run(read_all()), ['Hi', 'Hi', 'Hi'])
+        self.assertEqual(self.breaker.state, 'closed')
+
+
+class GeminiAsyncClientTests(TestCase):
+    def test_each_call_closes_its_client_unless_the_loop_pools_one(self):
+        gemini = llm.GeminiClient()
+
+        async def clients():
+            async with gemini._async_client() as own:
+                pass
+            gemini.pool_async_client()
+            async with gemini._async_client() as first, gemini._async_client() as second:
+                pass
+            pooled_open = not first.is_closed
+            await gemini.aclose()
+            return own, first, second, pooled_open
+
+        own, first, second, pooled_open = asyncio.run(clients())
+        self.assertTrue(own.is_closed)  # WSGI: a fresh loop per request, nothing to reuse
+        self.assertIs(first, second)
+        self.assertTrue(pooled_open)
+        self.assertTrue(first.is_closed)
+        self.assertEqual(len(gemini._async_clients), 0)
+
+
+class GeminiRetryTests(TestCase):
+    def setUp(self):
+        self.breaker = llm.CircuitBreaker(threshold=5)
+        self.gemini = llm.GeminiClient(max_retries=2, deadline=25.0)
+        for patcher in (mock.patch.object(llm, 'breaker', self.breaker),
+                        mock.patch.object(self.gemini, '_delay', return_value=0),
+                        mock.patch.dict(os.environ, {'GOOGLE_API_KEY': 'test'})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def generate(self, *outcomes):
+        with mock.patch.object(self.gemini.session, 'post', side_effect=outcomes) as post:
+            try:
+                return self.gemini.generate('hi'), post.call_count
+            except llm.LLMUnavailable:
+                return None, post.call_count
+
+    def test_connect_errors_are_retried(self):
+        ok = mock.Mock(status_code=200, json=lambda: {'candidates': [{'text': 'Hello'}]})
+        reply, calls = self.generate(requests.ConnectTimeout(), requests.ConnectionError(), ok)
+        self.assertEqual((reply, calls), ('Hello', 3))
+
+    def test_read_timeouts_are_not_resent(self):
+        self.assertEqual(self.generate(requests.ReadTimeout()), (None, 1))
+        self.assertEqual(self.breaker._failures, 1)
+
+    def test_broken_responses_feed_the_breaker(self):
+        self.assertEqual(self.generate(requests.exceptions.ChunkedEncodingError()), (None, 1))
+        self.assertEqual(self.breaker._failures, 1)
+
+    def test_no_retry_past_the_deadline(self):
+        clock = [0.0]
+
+        def slow_connect(*args, **kwargs):
+            clock[0] += 3.05
+            raise requests.ConnectTimeout()
+
+        self.gemini.deadline = 8.0  # room for two connect timeouts, not three
+        with mock.patch.object(llm.time, 'monotonic', lambda: clock[0]), \
+                mock.patch.object(self.gemini.session, 'post', side_effect=slow_connect) as post:
+            self.assertRaises(llm.LLMUnavailable, self.gemini.generate, 'hi')
+        self.assertEqual(post.call_count, 2)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        archive = tempfile.TemporaryDirectory()
+        self.addCleanup(archive.cleanup)
+        retention_settings = self.settings(FITMIND_RETENTION={'ARCHIVE_DIR': archive.name})
+        retention_settings.enable()
+        self.addCleanup(retention_settings.disable)
+        self.user = User.objects.create_user('export@example.com', 'export@example.com', 'pw')
+        self.session = ChatSession.objects.create(user=self.user, title='t')
+        old = SessionMessage.objects.create(session=self.session, role='user', content='old question')
+        SessionMessage.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=200))
+        SessionMessage.objects.create(session=self.session, role='assistant', content='new answer')
+        self.client.force_login(self.user)
+
+    def lines(self, content):
+        return [json.loads(line) for line in content.decode().splitlines()]
+
+    def test_includes_archived_rows(self):
+        self.assertEqual(retention.apply_policy('session_messages', days=90), 1)
+        response = self.client.get('/api/export/', {'dataset': 'session_messages'})
+        rows = self.lines(b''.join(response.streaming_content))
+        self.assertEqual([r['content'] for r in rows], ['old question', 'new answer'])
+
+    def test_other_users_archive_is_not_exported(self):
+        retention.apply_policy('session_messages', days=90)
+        other = User.objects.create_user('other@example.com', 'other@example.com', 'pw')
+        self.client.force_login(other)
+        response = self.client.get('/api/export/', {'dataset': 'session_messages'})
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+    def test_chat_export_reads_only_the_users_archive_months(self):
+        ChatMessage.objects.create(user=self.user, message='old chat', response='r')
+        ChatMessage.objects.update(timestamp=timezone.now() - timedelta(days=200))
+        self.assertEqual(retention.apply_policy('chat_messages', days=90), 1)
+        response = self.client.get('/api/export/', {'dataset': 'chat_messages'})
+        self.assertEqual([r['message'] for r in self.lines(b''.join(response.streaming_content))], ['old chat'])
+
+        self.client.force_login(User.objects.create_user('reader@example.com'))
+        with mock.patch('maini.retention.gzip.open') as read_archive:
+            response = self.client.get('/api/export/', {'dataset': 'chat_messages,session_messages'})
+            self.assertEqual(b''.join(response.streaming_content), b'')
+        read_archive.assert_not_called()
+
+    async def test_streams_asynchronously_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/api/export/', {'dataset': 'session_messages,chat_sessions'})
+        self.assertTrue(response.is_async)
+        content = b''.join([piece async for piece in response.streaming_content])
+        self.assertEqual(len(self.lines(content)), 3)
+
+    def test_command_writes_gzipped_csv(self):
+        ChatMessage.objects.create(user=self.user, message='hi, there', response='hello')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'chat.csv.gz')
+        call_command('export_data', '--dataset', 'chat_messages', '--format', 'csv', '--gzip', '-o', path,
+                     stdout=io.StringIO(), stderr=io.StringIO())
+        with gzip.open(path, 'rt') as fh:
+            lines = fh.read().splitlines()
+        self.assertIn('"hi, there"', lines[1])
+        self.assertEqual(len(lines), 2)
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        archive = tempfile.TemporaryDirectory()
+        self.addCleanup(archive.cleanup)
+        self.archive_dir = archive.name
+        retention_settings = self.settings(FITMIND_RETENTION={'ARCHIVE_DIR': archive.name})
+        retention_settings.enable()
+        self.addCleanup(retention_settings.disable)
+        self.user = User.objects.create_user('keep@example.com', 'keep@example.com', 'pw')
+        self.session = ChatSession.objects.create(user=self.user, title='t')
+        old = timezone.now() - timedelta(days=200)
+        for i in range(3):
+            SessionMessage.objects.create(session=self.session, role='user', content=f'old {i}', created_at=old)
+        SessionMessage.objects.create(session=self.session, role='user', content='recent')
+
+    def archived_lines(self):
+        directory = os.path.join(self.archive_dir, 'session_messages')
+        return sum(len(gzip.open(os.path.join(directory, name)).read().splitlines())
+                   for name in os.listdir(directory))
+
+    def test_archive_restore_archive(self):
+        self.assertEqual(retention.apply_policy('session_messages', days=90), 3)
+        self.session.refresh_from_db()
+        self.assertIsNotNone(self.session.archived_at)
+        self.assertEqual(self.session.messages.count(), 1)
+        self.assertEqual(self.archived_lines(), 3)
+
+        self.assertEqual(retention.restore_session(self.session), 3)
+        self.assertEqual(self.session.messages.count(), 4)
+        # Just restored: kept hot for another policy period
+        self.assertEqual(retention.apply_policy('session_messages', days=90), 0)
+
+        # 100 days on, the restored rows and 'recent' have all expired
+        later = timezone.now() + timedelta(days=100)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            self.assertEqual(retention.apply_policy('session_messages', days=90), 4)
+        self.assertFalse(self.session.messages.exists())
+        # Restored rows were deleted without appending duplicates; only 'recent' is new
+        self.assertEqual(self.archived_lines(), 4)
+        self.assertEqual(retention.restore_session(self.session), 4)
+
+    def test_restore_reads_only_indexed_months(self):
+        retention.apply_policy('session_messages', days=90)
+        # Another month file that a full scan would trip over
+        with open(os.path.join(self.archive_dir, 'session_messages', '1999-01.ndjson.gz'), 'wb') as fh:
+            fh.write(b'not gzip')
+        self.assertEqual(retention.restore_session(self.session), 3)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('find@example.com', 'find@example.com', 'pw')
+        self.client.force_login(self.user)
+
+    def test_catalog_and_own_chat_history(self):
+        make_catalog(2)
+        Workout.objects.filter(name='Workout 1').update(description='kettlebell swings')
+        Workout.objects.get(name='Workout 1').save()  # signals reindex
+        session = ChatSession.objects.create(user=self.user, title='Swings')
+        SessionMessage.objects.create(session=session, role='user', content='are kettlebell swings safe?')
+        other = ChatSession.objects.create(user=User.objects.create_user('x@example.com'), title='Other')
+        SessionMessage.objects.create(session=other, role='user', content='kettlebell for beginners')
+
+        results = self.client.get('/api/search/', {'q': 'kettlebell'}).json()['results']
+        self.assertEqual(sorted((r['kind'], r['title']) for r in results),
+                         [('session', 'Swings'), ('workout', 'Workout 1')])
+        self.client.logout()
+        results = self.client.get('/api/search/', {'q': 'kettlebell'}).json()['results']
+        self.assertEqual([r['kind'] for r in results], ['workout'])
+
+    def test_renamed_session_is_found_by_its_new_title(self):
+        session = ChatSession.objects.create(user=self.user, title='Untitled')
+        SessionMessage.objects.create(session=session, role='user', content='hello there')
+        session.title = 'Marathon plan'
+        session.save()
+        results = self.client.get('/api/search/', {'q': 'marathon'}).json()['results']
+        self.assertEqual([(r['kind'], r['title']) for r in results], [('session', 'Marathon plan')])
+
+    def test_admin_search_pages_through_every_match(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(admin)
+        for i in range(25):
+            Workout.objects.create(name=f'Plank {i}', description='core plank hold', intensity='low',
+                                   duration_minutes=5, calories_burned=20)
+        Workout.objects.create(name='Squat', description='legs', intensity='low', duration_minutes=5,
+                               calories_burned=20)
+        with mock.patch('maini.admin.WorkoutAdmin.list_per_page', 10):
+            response = self.client.get('/admin/maini/workout/', {'q': 'plank', 'p': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cl'].result_count, 25)
+        self.assertEqual(len(response.context['cl'].result_list), 5)
+
+
+class ProgressCreditTests(TestCase):
+    def setUp(self):
+        make_catalog(1)
+        self.user = User.objects.create_user('credit@example.com')
+        self.workout = Workout.objects.get()
+        self.workout.calories_burned = 300
+        self.workout.duration_minutes = 30
+        self.workout.save()
+
+    def totals(self):
+        progress_row = UserProgress.objects.get(user=self.user)
+        daily = DailyActivity.objects.get(user=self.user)
+        return progress_row.total_calories_burned, daily.calories_burned, daily.active_minutes
+
+    def test_uncompleting_takes_back_what_was_credited(self):
+        done = UserWorkout.objects.create(user=self.user, workout=self.workout, completed=True,
+                                          completed_date=timezone.localdate())
+        self.assertEqual(self.totals(), (300, 300, 30))
+        Workout.objects.filter(pk=self.workout.pk).update(calories_burned=500, duration_minutes=45)
+        done = UserWorkout.objects.get(pk=done.pk)
+        done.completed = False
+        done.save()
+        self.assertEqual(self.totals(), (0, 0, 0))
+
+    def test_rebuild_sums_credited_amounts(self):
+        UserWorkout.objects.create(user=self.user, workout=self.workout, completed=True,
+                                   completed_date=timezone.localdate())
+        Workout.objects.filter(pk=self.workout.pk).update(calories_burned=500)
+        progress.rebuild([self.user.pk])
+        self.assertEqual(self.totals(), (300, 300, 30))
+
+    def test_credit_completions_backfills_bulk_rows(self):
+        UserWorkout.objects.bulk_create([UserWorkout(user=self.user, workout=self.workout, completed=True,
+                                                     completed_date=timezone.localdate())])
+        progress.credit_completions(user=self.user)
+        self.assertEqual(UserWorkout.objects.values_list('credited_calories', 'credited_minutes').get(), (300, 30))
+
+
+@override_settings(WHITENOISE_USE_FINDERS=True, WHITENOISE_AUTOREFRESH=False)
+class StaticFilesTests(TestCase):
+    async def test_async_stack_serves_an_async_body(self):
+        response = await AsyncClient().get('/static/style.css')
+        self.assertEqual(response.status_code, 200)
+        # An async body, so Django's ASGI handler does not read the file in a thread
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        with open(os.path.join(os.path.dirname(__file__), 'static', 'style.css'), 'rb') as fh:
+            self.assertEqual(body, fh.read())
+
+    def test_sync_stack_still_serves_them(self):
+        response = self.client.get('/static/style.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content))
+
+
+class ChatbotTests(TestCase):
+    def setUp(self):
+        make_catalog(3)
+        self.user = User.objects.create_user('chat@example.com', 'chat@example.com', 'pw')
+        UserProfile.objects.create(user=self.user, age=30, height_cm=170, weight_kg=70, stress_level='high')
+
+    async def test_turn_is_answered_and_saved_in_one_thread_hop(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        with mock.patch('maini.views.sync_to_async', wraps=views.sync_to_async) as hop:
+            response = await client.post('/chatbot/', {'message': 'I feel stressed'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Direct Answer', response.json()['response'])
+        self.assertEqual(hop.call_count, 1)
+        self.assertEqual(await ChatMessage.objects.filter(user=self.user).acount(), 1)
+
+    def test_gemini_fallback_answers_from_the_rules_when_unavailable(self):
+        with mock.patch.object(llm.GeminiClient, 'generate', side_effect=llm.LLMUnavailable()):
+            reply = views.call_gemini('how do I sleep better?')
+        self.assertIn('Direct Answer', reply)
+
+
+def legacy_intent(message_lower):
+    # The per-intent keyword scan generate_chatbot_response did before the router
+    words = set(message_lower.split())
+    for intent in INTENT_PRIORITY:
+        if (any(term in message_lower for term in PHRASE_INTENTS.get(intent, ()))
+                or any(word in words for word in KEYWORD_INTENTS.get(intent, ()))):
+            return intent
+    return None
+
+
+class IntentRouterTests(TestCase):
+    def test_matches_the_legacy_scan(self):
+        vocabulary = [w for words in KEYWORD_INTENTS.values() for w in words]
+        vocabulary += [t for terms in PHRASE_INTENTS.values() for t in terms]
+        vocabulary += ['distressed', 'running', 'bedtime', 'i', 'the', 'today', 'help', 'please', 'stressful']
+        rng = random.Random(0)
+        for _ in range(3000):
+            message = ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(0, 8)))
+            self.assertEqual(route_intent(message), legacy_intent(message), message)
+
+    def test_crisis_wins_over_an_overlapping_phrase(self):
+        self.assertEqual(route_intent("so much stress i can't go on"), 'crisis')
+        self.assertEqual(route_intent('the stress of cooking dinner'), 'meditation')
+        self.assertIsNone(route_intent('tell me about the olympics'))
+
+
+class ChatbotBatchTests(TestCase):
+    def setUp(self):
+        make_catalog(3)
+        self.user = User.objects.create_user('batch@example.com', 'batch@example.com', 'pw')
+
+    def post(self, body):
+        return self.client.post('/api/chatbot/batch/', body, content_type='application/json')
+
+    def test_answers_in_order_and_saves_for_logged_in_users(self):
+        self.client.force_login(self.user)
+        response = self.post({'messages': ['How do I sleep better?', '  ', 'a gym workout']})
+        self.assertEqual(response.status_code, 200)
+        replies = response.json()['responses']
+        self.assertEqual(len(replies), 3)
+        self.assertEqual(replies[1], 'Please ask me something!')
+        self.assertEqual(replies[0], views.generate_chatbot_response('How do I sleep better?'))
+        self.assertEqual(list(ChatMessage.objects.filter(user=self.user).order_by('id').values_list('message', flat=True)),
+                         ['How do I sleep better?', 'a gym workout'])
+        results = self.client.get('/api/search/', {'q': 'gym'}).json()['results']
+        self.assertEqual([r['kind'] for r in results], ['chat'])
+
+    def test_anonymous_batches_are_not_saved(self):
+        self.assertEqual(self.post({'messages': ['hi']}).status_code, 200)
+        self.assertFalse(ChatMessage.objects.exists())
+
+    def test_rejects_bad_batches(self):
+        for body in ({}, {'messages': []}, {'messages': ['ok', 3]}, {'messages': ['x'] * (views.MAX_BATCH_MESSAGES + 1)}):
+            self.assertEqual(self.post(body).status_code, 400, body)
+        response = self.client.post('/api/chatbot/batch/', 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ChatSessionApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('sessions@example.com', 'sessions@example.com', 'pw')
+        self.client.force_login(self.user)
+
+    def test_sessions_page_newest_first(self):
+        for i in range(5):
+            self.client.post('/api/chatsessions/', {'title': f'Chat {i}'}, content_type='application/json')
+        first = self.client.get('/api/chatsessions/', {'limit': 3}).json()
+        second = self.client.get('/api/chatsessions/', {'limit': 3, 'cursor': first['next_cursor']}).json()
+        titles = [s['title'] for s in first['sessions'] + second['sessions']]
+        self.assertEqual(titles, [f'Chat {i}' for i in range(4, -1, -1)])
+        self.assertIsNone(second['next_cursor'])
+
+    def test_messages_page_backwards_and_other_users_get_404(self):
+        session = ChatSession.objects.create(user=self.user, title='t')
+        for i in range(5):
+            SessionMessage.objects.create(session=session, role='user', content=f'm{i}')
+        url = f'/api/chatsessions/{session.id}/messages/'
+        first = self.client.get(url, {'limit': 3}).json()
+        second = self.client.get(url, {'limit': 3, 'cursor': first['next_cursor']}).json()
+        self.assertEqual([m['content'] for m in second['messages'] + first['messages']], [f'm{i}' for i in range(5)])
+        self.client.force_login(User.objects.create_user('intruder@example.com'))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_posting_relays_to_gemini_and_saves_both_turns(self):
+        session = ChatSession.objects.create(user=self.user, title='t', cache_opt_out=True)
+        with mock.patch.object(llm.GeminiClient, 'agenerate', return_value='Drink water.') as agenerate:
+            response = self.client.post(f'/api/chatsessions/{session.id}/messages/', {'message': 'tips?'},
+                                        content_type='application/json')
+        self.assertEqual(response.json(), {'reply': 'Drink water.'})
+        self.assertTrue(agenerate.call_args.args[0].endswith('user: tips?'))
+        self.assertEqual(list(session.messages.order_by('id').values_list('role', 'content')),
+                         [('user', 'tips?'), ('assistant', 'Drink water.')])
+
+    async def stream(self, session, message, *fragments, error=None):
+        async def fake_stream(prompt):
+            for fragment in fragments:
+                yield fragment
+            if error:
+                raise error
+
+        await self.async_client.aforce_login(self.user)
+        with mock.patch.object(llm, 'stream_gemini', fake_stream), \
+                mock.patch.object(views, 'generate_chatbot_response', return_value='Rest today.'):
+            response = await self.async_client.post(f'/api/chatsessions/{session.id}/messages/stream/',
+                                                    {'message': message}, content_type='application/json')
+            if response.status_code != 200:
+                return response, None
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            body = b''.join([piece async for piece in response.streaming_content]).decode()
+        return response, [frame.splitlines() for frame in body.split('\n\n') if frame]
+
+    async def test_stream_relays_fragments_and_saves_the_reply(self):
+        session = await ChatSession.objects.acreate(user=self.user, title='t', cache_opt_out=True)
+        _, frames = await self.stream(session, 'tips?', 'Drink ', 'water.')
+        self.assertEqual(frames, [['data: {"delta": "Drink "}'], ['data: {"delta": "water."}'],
+                                  ['event: done', 'data: {"reply": "Drink water."}']])
+        stored = [m async for m in session.messages.order_by('id').values_list('role', 'content')]
+        self.assertEqual(stored, [('user', 'tips?'), ('assistant', 'Drink water.')])
+
+    async def test_stream_failure_falls_back_to_the_rule_engine(self):
+        session = await ChatSession.objects.acreate(user=self.user, title='t', cache_opt_out=True)
+        with self.assertLogs('maini.views', 'WARNING'):
+            _, frames = await self.stream(session, 'tips?', 'Drink ', error=httpx.ReadError('reset'))
+        self.assertEqual(frames[-1], ['event: done', 'data: {"reply": "Rest today."}'])
+        self.assertEqual(await session.messages.filter(role='assistant').values_list('content', flat=True).aget(),
+                         'Rest today.')
+
+    async def test_stream_rejects_a_non_string_message(self):
+        session = await ChatSession.objects.acreate(user=self.user, title='t')
+        for message in (5, ['hi'], None):
+            response, _ = await self.stream(session, message)
+            self.assertEqual(response.status_code, 400, message)
+        self.assertFalse(await session.messages.aexists())
+
+
+class ProfileSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('snap@example.com', 'snap@example.com', 'pw')
+
+    def test_saving_or_deleting_the_profile_drops_the_snapshot(self):
+        self.assertIsNone(profiles.get_snapshot(self.user))
+        profile = UserProfile.objects.create(user=self.user, height_cm=180, weight_kg=70, stress_level='low')
+        self.assertEqual(profiles.get_snapshot(self.user).stress_level, 'low')
+        profile.stress_level = 'high'
+        profile.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(profiles.get_snapshot(self.user).stress_level, 'high')
+        with self.assertNumQueries(0):
+            profiles.get_snapshot(self.user)
+        profile.delete()
+        self.assertIsNone(profiles.get_snapshot(self.user))
+
+    def test_changes_made_elsewhere_show_up_after_the_ttl(self):
+        # As another worker sees a save: its cache never got the signal
+        UserProfile.objects.create(user=self.user, height_cm=180, weight_kg=70, stress_level='low')
+        self.assertEqual(profiles.get_snapshot(self.user).stress_level, 'low')
+        UserProfile.objects.filter(user=self.user).update(stress_level='high')
+        self.assertEqual(profiles.get_snapshot(self.user).stress_level, 'low')
+        later = time.time() + profiles.SNAPSHOT_TIMEOUT + 1
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=later):
+            self.assertEqual(profiles.get_snapshot(self.user).stress_level, 'high')
+
+    def test_profile_api_returns_the_updated_values(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/api/profile/').json()['profile']['stress_level'], 'medium')
+        response = self.client.post('/api/profile/', {'stress_level': 'high', 'weight_kg': 90, 'height_cm': 180},
+                                    content_type='application/json')
+        self.assertEqual(response.json()['profile']['stress_level'], 'high')
+        self.assertEqual(self.client.get('/api/profile/').json()['profile']['bmi_category'], 'Overweight')
+
+
+class CatalogImportTests(TestCase):
+    def write(self, name, text):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, name)
+        with open(path, 'w') as fh:
+            fh.write(text)
+        return path
+
+    def test_upserts_by_name_and_reports_bad_rows(self):
+        row = {'description': 'd', 'intensity': 'low', 'duration_minutes': 10, 'calories_burned': 50}
+        path = self.write('w.jsonl', '\n'.join(json.dumps(r) for r in [
+            {'name': 'Row', **row}, {'name': 'Row', **row, 'calories_burned': 80},
+            {'name': 'Bad', **row, 'duration_minutes': 'long'}, {'name': 'Swim', **row},
+        ]))
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_catalog', 'workouts', path, stdout=out, stderr=err)
+        self.assertIn('2 imported, 1 invalid, 1 duplicate keys', out.getvalue())
+        self.assertIn(':3: duration_minutes', err.getvalue())
+        self.assertEqual(Workout.objects.get(name='Row').calories_burned, 80)
+
+        path = self.write('w.csv', 'name,description,intensity,duration_minutes,calories_burned\nRow,d,high,10,90\n')
+        call_command('import_catalog', 'workouts', path, stdout=io.StringIO())
+        self.assertEqual(Workout.objects.count(), 2)
+        self.assertEqual(Workout.objects.values_list('intensity', 'calories_burned').get(name='Row'), ('high', 90))
+
+    def test_dry_run_writes_nothing(self):
+        path = os.path.join(os.path.dirname(__file__), 'seed', 'meditations.json')
+        call_command('import_catalog', 'meditations', path, '--dry-run', stdout=io.StringIO())
+        self.assertFalse(Meditation.objects.exists())
+
+
+class MetricsTests(TestCase):
+    def test_requests_are_timed_per_view(self):
+        make_catalog(1)
+        self.client.get('/api/catalog/workouts/')
+        text = self.client.get('/metrics').content.decode()
+        self.assertIn('fitmind_request_duration_seconds_count{view="api_catalog",method="GET",status="200"}', text)
+        self.assertRegex(text, r'fitmind_request_db_queries_count\{view="api_catalog"\} [1-9]')
+        self.assertIn('# TYPE fitmind_llm_circuit_open gauge', text)
+
+    def test_n_plus_one_suspects_are_counted_and_logged(self):
+        with self.settings(FITMIND_METRICS={'N_PLUS_ONE_THRESHOLD': 1}), \
+                self.assertLogs('maini.metrics', 'WARNING') as logs:
+            self.client.get('/api/catalog/workouts/')
+        self.assertIn('N+1 suspect: GET /api/catalog/workouts/', logs.output[0])
+        self.assertRegex(metrics.render(), r'fitmind_n_plus_one_suspects_total\{view="api_catalog"\} [1-9]')
+
+    def test_token_protects_the_endpoint(self):
+        with self.settings(FITMIND_METRICS={'TOKEN': 'secret'}):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+
+class LoggingTests(TestCase):
+    def test_request_ids_are_echoed_or_assigned(self):
+        response = self.client.get('/metrics', HTTP_X_REQUEST_ID='abc-123')
+        self.assertEqual(response['X-Request-ID'], 'abc-123')
+        response = self.client.get('/metrics', HTTP_X_REQUEST_ID='not valid!')
+        self.assertRegex(response['X-Request-ID'], r'^[0-9a-f]{32}$')
+
+    def test_django_request_lines_after_a_stream_carry_the_current_request(self):
+        records = []
+        handler = logging.Handler()
+        handler.addFilter(log.RequestContextFilter())
+        handler.emit = records.append
+        logger = logging.getLogger('django.request')
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+
+        streamer = User.objects.create_user('streamer@example.com')
+        self.client.force_login(streamer)
+        response = self.client.get('/api/export/', {'dataset': 'chat_messages'})
+        b''.join(response.streaming_content)
+        response.close()
+
+        other = User.objects.create_user('other@example.com')
+        self.client.force_login(other)
+        response = self.client.get('/api/catalog/meals/', {'sort': 'nope'})
+        self.assertEqual(response.status_code, 400)
+        [record] = [r for r in records if r.getMessage().startswith('Bad Request')]
+        self.assertEqual(record.request_id, response['X-Request-ID'])
+        self.assertNotEqual(record.user_id, streamer.pk)
+        self.assertIsNone(log.current_request.get())
+
+    def record(self, level, msg, **extra):
+        return logging.makeLogRecord({'name': 'maini.test', 'levelno': level, 'levelname': logging.getLevelName(level),
+                                      'msg': msg, **extra})
+
+    def test_json_lines_carry_the_request_and_extras(self):
+        token = log.current_request.set(log.RequestState(SimpleNamespace(), 'req-1', True))
+        self.addCleanup(log.current_request.reset, token)
+        record = self.record(logging.INFO, 'saved', chars=12)
+        self.assertTrue(log.RequestContextFilter().filter(record))
+        data = json.loads(log.JsonFormatter().format(record))
+        self.assertEqual((data['message'], data['request_id'], data['chars']), ('saved', 'req-1', 12))
+        self.assertNotIn('user_id', data)
+
+    def test_debug_is_sampled_per_request(self):
+        sampling = log.SamplingFilter(0.5)
+        token = log.current_request.set(log.RequestState(None, 'req-2', False))
+        self.addCleanup(log.current_request.reset, token)
+        self.assertFalse(sampling.filter(self.record(logging.DEBUG, 'dropped')))
+        self.assertTrue(sampling.filter(self.record(logging.WARNING, 'kept')))
+
+    def test_queue_handler_writes_from_its_listener(self):
+        stream = io.StringIO()
+        handler = log.queue_handler(stream=stream)
+        handler.handle(self.record(logging.WARNING, 'queued %s', args=('row',)))
+        handler.listener.stop()
+        self.assertEqual(json.loads(stream.getvalue())['message'], 'queued row')
+
+
+class SessionContextTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('context@example.com')
+        self.session = ChatSession.objects.create(user=user, title='t')
+
+    def add(self, *contents):
+        return [SessionMessage.objects.create(session=self.session, role='user', content=c).pk for c in contents]
+
+    def test_window_keeps_the_newest_rows_that_fit(self):
+        history = [(3, 'user', 'c' * 10), (2, 'assistant', 'b' * 10), (1, 'user', 'a' * 10)]
+        kept, dropped = select_window(history, reserved=0, budget=40)
+        self.assertEqual([row[0] for row in kept], [2, 3])
+        self.assertEqual([row[0] for row in dropped], [1])
+
+    def test_summary_drops_its_oldest_lines_over_budget(self):
+        self.assertEqual(fold_summary('user: one\nuser: two', ['user: three'], budget=25), 'user: two\nuser: three')
+
+    def test_turns_that_leave_the_window_are_folded_once(self):
+        ids = self.add(*[f'message {i} ' + 'x' * 1000 for i in range(8)])
+        prompt = build_session_prompt(self.session, 'next?')
+        self.session.refresh_from_db()
+        folded = self.session.summary.split('\n')
+        self.assertTrue(folded)
+        self.assertTrue(all(line.startswith('user: message ') for line in folded))
+        self.assertEqual(self.session.summary_through, ids[len(folded) - 1])
+        for i in range(8):
+            # Folded turns appear only as (shortened) summary lines
+            self.assertEqual(f'message {i} ' + 'x' * 1000 in prompt, i >= len(folded))
+
+        # The next turn folds only what left the window since
+        build_session_prompt(self.session, 'and then?')
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.summary.split('\n'), folded)
+        self.add('y' * 1000)
+        build_session_prompt(self.session, 'more?')
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.summary.split('\n')[:len(folded)], folded)
+        self.assertEqual(len(self.session.summary.split('\n')), len(folded) + 1)
+
+    @mock.patch('maini.context.MAX_MESSAGES', 5)
+    def test_rows_older_than_the_fetched_tail_are_folded_too(self):
+        ids = self.add(*[f'short {i}' for i in range(12)])
+        prompt = build_session_prompt(self.session, 'hi')
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.summary.split('\n'), [f'user: short {i}' for i in range(7)])
+        self.assertEqual(self.session.summary_through, ids[6])
+        self.assertTrue(prompt.endswith('\n'.join(f'user: short {i}' for i in range(7, 12)) + '\nuser: hi'))
+
+    @mock.patch('maini.context.MAX_MESSAGES', 5)
+    def test_a_concurrent_turn_does_not_overwrite_the_summary(self):
+        self.add(*[f'short {i}' for i in range(12)])
+        stale = ChatSession.objects.get(pk=self.session.pk)
+        build_session_prompt(self.session, 'first')
+        self.add('short 12')
+        prompt = build_session_prompt(stale, 'second')
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.summary.split('\n'), [f'user: short {i}' for i in range(7)])
+        self.assertEqual(stale.summary, self.session.summary)
+        self.assertIn('user: short 6', prompt)
+
+
+class ResponseCacheTests(TestCase):
+    def snapshot(self, **fields):
+        profile = UserProfile(user_id=1, height_cm=170, weight_kg=65, stress_level='medium', activity_level='moderate')
+        for field, value in fields.items():
+            setattr(profile, field, value)
+        return profiles.ProfileSnapshot.from_profile(profile)
+
+    def test_key_normalizes_the_prompt_and_varies_with_the_profile_bucket(self):
+        key = response_cache.make_key
+        calm = self.snapshot()
+        self.assertEqual(key('How do I sleep better?', calm), key('  how do i   SLEEP better', calm))
+        self.assertNotEqual(key('how do i sleep', calm), key('how do i sleep', self.snapshot(stress_level='high')))
+        self.assertNotEqual(key('how do i sleep', calm), key('how do i sleep', self.snapshot(weight_kg=95)))
+        self.assertNotEqual(key('how do i sleep', calm), key('how do i sleep', None))
+        # Age is not in the bucket: similar profiles share replies
+        self.assertEqual(key('how do i sleep', calm), key('how do i sleep', self.snapshot(age=60)))
+
+    def test_users_with_different_profiles_never_share_a_reply(self):
+        replies = response_cache.ResponseCache(response_cache.LocMemBackend())
+        calm, stressed = self.snapshot(), self.snapshot(stress_level='high')
+        with mock.patch('maini.response_cache._cache', replies), \
+                mock.patch.object(llm.GeminiClient, 'generate', side_effect=['for calm', 'for stressed']) as generate:
+            self.assertEqual(views.call_gemini('tips?', profile=calm, cacheable=True), 'for calm')
+            self.assertEqual(views.call_gemini('tips?', profile=stressed, cacheable=True), 'for stressed')
+            self.assertEqual(views.call_gemini('Tips', profile=calm, cacheable=True), 'for calm')
+        self.assertEqual(generate.call_count, 2)
+        self.assertEqual(replies.snapshot(), {'hits': 1, 'misses': 2, 'sets': 2, 'evictions': 0, 'hit_ratio': 1 / 3})
+
+    def test_locmem_evicts_the_least_recently_used_and_expires(self):
+        replies = response_cache.ResponseCache(response_cache.LocMemBackend(max_entries=2, ttl=60))
+        replies.set('a', 'A')
+        replies.set('b', 'B')
+        replies.get('a')
+        replies.set('c', 'C')
+        self.assertEqual([replies.get(k) for k in 'abc'], ['A', None, 'C'])
+        self.assertEqual(replies.snapshot()['evictions'], 1)
+        with mock.patch('maini.response_cache.time.time', return_value=time.time() + 61):
+            self.assertIsNone(replies.get('a'))
+
+    def test_file_backend_round_trips_expires_and_sweeps_the_oldest(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        backend = response_cache.FileBackend(directory.name, max_entries=2, ttl=60)
+        backend.SWEEP_EVERY = 3
+        backend.set('a', 'A')
+        os.utime(os.path.join(directory.name, 'a.json'), (1, 1))
+        backend.set('b', 'B')
+        self.assertEqual(backend.set('c', 'C'), 1)
+        self.assertEqual([backend.get(k) for k in 'abc'], [None, 'B', 'C'])
+        # Another process (a second backend on the same directory) sees the entries
+        self.assertEqual(response_cache.FileBackend(directory.name).get('b'), 'B')
+        with mock.patch('maini.response_cache.time.time', return_value=time.time() + 61):
+            self.assertIsNone(backend.get('b'))
+        self.assertFalse(os.path.exists(os.path.join(directory.name, 'b.json')))
+
+
+class CatalogNaturalKeyMigrationTests(TransactionTestCase):
+    before = [('maini', '0009_user_recommendations')]
+    after = [('maini', '0010_catalog_natural_keys')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_duplicates_are_renamed_before_the_constraints(self):
+        self.addCleanup(self.migrate, MigrationExecutor(connection).loader.graph.leaf_nodes('maini'))
+        apps = self.migrate(self.before)
+        Workout = apps.get_model('maini', 'Workout')
+        row = {'description': 'd', 'intensity': 'low', 'duration_minutes': 10, 'calories_burned': 50}
+        ids = [Workout.objects.create(name=name, **row).pk for name in ('Run', 'Run', 'Run (2)', 'Run', 'Swim')]
+
+        apps = self.migrate(self.after)
+        Workout = apps.get_model('maini', 'Workout')
+        self.assertEqual(dict(Workout.objects.values_list('pk', 'name')),
+                         dict(zip(ids, ['Run', 'Run (3)', 'Run (2)', 'Run (4)', 'Swim'])))
+        with self.assertRaises(IntegrityError):
+            Workout.objects.create(name='Run', **row)
+
+
+class SyntheticDataTests(TransactionTestCase):
+    # Workers fork and the parent closes its connections, which a TestCase transaction would not survive
+    SCALE = 0.01
+    SEED = 7
+    FIELDS = {
+        User: ('username', 'email', 'first_name', 'last_name', 'date_joined'),
+        Workout: ('name', 'description', 'intensity', 'duration_minutes', 'calories_burned', 'created_at'),
+        MealPlan: ('name', 'meal_type', 'calories', 'protein_grams', 'carbs_grams', 'fat_grams', 'created_at'),
+        Meditation: ('title', 'difficulty', 'duration_minutes', 'instructor', 'meditation_type', 'created_at'),
+        UserProfile: ('user__username', 'age', 'height_cm', 'weight_kg', 'sleep_hours', 'activity_level',
+                      'stress_level', 'updated_at'),
+        UserWorkout: ('user__username', 'workout__name', 'completed', 'completed_date', 'assigned_date',
+                      'credited_calories'),
+        UserMealPlan: ('user__username', 'meal_plan__name', 'is_active', 'assigned_date'),
+        UserMeditation: ('user__username', 'meditation__title', 'completed', 'completed_date', 'assigned_date',
+                         'credited_minutes'),
+        ChatMessage: ('user__username', 'message', 'response', 'timestamp', 'is_helpful'),
+        ChatSession: ('user__username', 'title', 'created_at', 'updated_at'),
+        SessionMessage: ('session__user__username', 'session__created_at', 'role', 'content', 'created_at'),
+    }
+
+    def dataset(self):
+        # Everything generated, keyed by natural keys: ids differ between runs
+        return {model.__name__: sorted(model.objects.values_list(*fields), key=repr)
+                for model, fields in self.FIELDS.items()}
+
+    def regenerate(self, **options):
+        # Each seed loads once: drop the previous run (users cascade to their rows) before the next
+        User.objects.filter(username__startswith=synthetic.user_prefix(self.SEED)).delete()
+        for model in (Workout, MealPlan, Meditation):
+            model.objects.all().delete()
+        synthetic.generate(self.SCALE, self.SEED, **options)
+        return self.dataset()
+
+    def test_command_inserts_the_scaled_counts(self):
+        out = io.StringIO()
+        call_command('generate_fixtures', '--scale', str(self.SCALE), '--seed', str(self.SEED), stdout=out)
+        counts = synthetic.scaled_counts(self.SCALE)
+        self.assertEqual(User.objects.count(), counts['users'])
+        self.assertEqual((Workout.objects.count(), MealPlan.objects.count(), Meditation.objects.count()),
+                         (counts['workouts'], counts['meals'], counts['meditations']))
+        reported = dict(line.strip().split(': ') for line in out.getvalue().splitlines() if line.startswith('  '))
+        for model in self.FIELDS:
+            self.assertEqual(int(reported.get(model._meta.db_table, 0)), model.objects.count(), model)
+        self.assertGreater(SessionMessage.objects.count(), 0)
+
+        per_user = {UserWorkout: 'workouts', UserMealPlan: 'meals', UserMeditation: 'meditations',
+                    ChatMessage: 'chat_messages', ChatSession: 'sessions'}
+        for model, kind in per_user.items():
+            most = max(User.objects.annotate(n=Count(model._meta.get_field('user').remote_field.related_name))
+                       .values_list('n', flat=True))
+            self.assertLessEqual(most, 2 * synthetic.PER_USER[kind], kind)
+        most = max(ChatSession.objects.annotate(n=Count('messages')).values_list('n', flat=True))
+        self.assertLessEqual(most, 2 * synthetic.PER_USER['session_messages'])
+
+        with self.assertRaises(CommandError):
+            call_command('generate_fixtures', '--scale', str(self.SCALE), '--seed', str(self.SEED), stdout=out)
+
+    def test_same_seed_same_data_with_or_without_workers(self):
+        with mock.patch.object(synthetic, 'CHUNK_USERS', 3):
+            single = self.regenerate()
+            self.assertEqual(self.regenerate(), single)
+            self.assertEqual(self.regenerate(workers=2), single)
+        self.assertEqual(len(single['User']), synthetic.scaled_counts(self.SCALE)['users'])
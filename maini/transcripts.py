@@ -0,0 +1,366 @@
+"""Write-behind persistence for chat transcripts.
+
+Views hand finished messages to `record_session_messages` /
+`record_chat_message` instead of inserting them. Each entry is appended to a
+spool file under ``FITMIND_TRANSCRIPT_QUEUE['SPOOL_DIR']`` and kept in memory;
+a background thread writes the queue with one ``bulk_create`` per model (and
+one UPDATE for the sessions' ``updated_at``) whenever BATCH_SIZE entries are
+waiting or FLUSH_INTERVAL seconds have passed, then deletes the spool files
+it covered.
+
+If the process dies first, its spool files stay behind. Any running queue
+claims spool files nobody has touched for ORPHAN_AGE seconds (a live queue
+whose writes are failing keeps touching its own) and writes them, skipping
+rows that already made it to the database; ``manage.py replay_transcripts``
+does the same on demand.
+
+When a batch fails, its rows are retried one at a time so one bad row cannot
+hold up the rest. A row that fails on its own MAX_ATTEMPTS times is moved to
+``dead-letter.jsonl`` in the spool directory and logged; connection errors
+(the database being down) never count against a row.
+
+Rows are visible to `pending_for_session` (and so to prompt building) from
+the moment they are queued, but only reach the message APIs after the flush.
+The queue is opt-in: with ``ENABLED`` off (the default) every call writes
+straight through.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import InterfaceError, OperationalError, connection, transaction
+from django.utils import timezone
+
+from . import search
+from .models import ChatMessage, ChatSession, SessionMessage
+
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = 'transcripts-'
+ORPHAN_AGE = 60
+ORPHAN_SCAN_EVERY = 30
+MAX_ATTEMPTS = 3
+DEAD_LETTER = 'dead-letter.jsonl'
+# Failures that say nothing about the row itself
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+
+
+def write_entries(entries):
+    """Insert queued entries in one transaction; return how many rows were written.
+
+    Rows whose session or user has been deleted since are dropped. Entries
+    flagged ``replayed`` are skipped if an identical row is already stored.
+    """
+    session_ids = {e['session_id'] for e in entries if e['kind'] == 'session'}
+    user_ids = {e['user_id'] for e in entries if e['kind'] == 'chat'}
+    sessions = ChatSession.objects.in_bulk(session_ids) if session_ids else {}
+    live_users = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True)) if user_ids else set()
+
+    messages, chats = [], []
+    for e in entries:
+        at = datetime.fromisoformat(e['at'])
+        if e['kind'] == 'session':
+            session = sessions.get(e['session_id'])
+            if session is None:
+                continue
+            if e.get('replayed') and SessionMessage.objects.filter(
+                    session_id=session.pk, role=e['role'], content=e['content'], created_at=at).exists():
+                continue
+            messages.append(SessionMessage(session=session, role=e['role'], content=e['content'], created_at=at))
+        elif e['user_id'] in live_users:
+            if e.get('replayed') and ChatMessage.objects.filter(
+                    user_id=e['user_id'], message=e['message'], timestamp=at).exists():
+                continue
+            chats.append(ChatMessage(user_id=e['user_id'], message=e['message'], response=e['response'], timestamp=at))
+
+    with transaction.atomic():
+        if messages:
+            objs = SessionMessage.objects.bulk_create(messages)
+            ChatSession.objects.filter(pk__in={obj.session_id for obj in objs}).update(updated_at=timezone.now())
+            search.index_objects(objs)
+        if chats:
+            search.index_objects(ChatMessage.objects.bulk_create(chats))
+    return len(messages) + len(chats)
+
+
+def read_segment(path):
+    entries = []
+    with open(path, encoding='utf-8') as fh:
+        for line in fh:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A torn final line from a crash mid-write
+                continue
+            entry['replayed'] = True
+            entries.append(entry)
+    return entries
+
+
+class TranscriptQueue:
+    def __init__(self, spool_dir, batch_size=100, flush_interval=0.5, max_pending=5000, fsync=False):
+        self.spool_dir = str(spool_dir)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.fsync = fsync
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._drained = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._inflight = []
+        # Spool files holding exactly the entries in _pending
+        self._segments = []
+        self._spool = None
+        self._seq = 0
+        self._thread = None
+        self._stopping = False
+        self.counts = {'queued': 0, 'written': 0, 'batches': 0, 'errors': 0, 'replayed': 0, 'backlogged': 0, 'dead': 0}
+
+    def _new_segment_path(self):
+        self._seq += 1
+        return os.path.join(self.spool_dir, f'{SEGMENT_PREFIX}{os.getpid()}-{self._seq}.jsonl')
+
+    def put(self, entry):
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        self._ensure_worker()
+        with self._lock:
+            if self._spool is None:
+                path = self._new_segment_path()
+                self._spool = open(path, 'a', encoding='utf-8')
+                self._segments.append(path)
+            self._spool.write(line)
+            self._spool.flush()
+            if self.fsync:
+                os.fsync(self._spool.fileno())
+            self._pending.append(entry)
+            self.counts['queued'] += 1
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.notify()
+            if len(self._pending) >= self.max_pending:
+                # The database is falling behind. Slow the producer down for up to
+                # one interval, but never write (or fail) on the request path: the
+                # entry is already spooled
+                self.counts['backlogged'] += 1
+                self._drained.wait(self.flush_interval)
+
+    def pending(self, kind, key, value):
+        """Queued entries of `kind` with entry[key] == value, oldest first."""
+        with self._lock:
+            return [e for e in self._inflight + self._pending if e['kind'] == kind and e[key] == value]
+
+    def flush(self):
+        """Write everything queued so far; return the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                entries, segments = self._pending, self._segments
+                self._pending, self._segments = [], []
+                self._inflight = entries
+                if self._spool is not None:
+                    self._spool.close()
+                    self._spool = None
+            try:
+                written = write_entries(entries)
+            except Exception:
+                written, retry, dead = self._write_rows(entries)
+                if not written and not dead:
+                    with self._lock:
+                        self._inflight = []
+                        self._pending[:0] = entries
+                        self._segments[:0] = segments
+                        self.counts['errors'] += 1
+                    # Still ours: keep them from looking orphaned to other processes
+                    for path in segments:
+                        try:
+                            os.utime(path)
+                        except OSError:
+                            pass
+                    raise
+                self._dead_letter(dead)
+                with self._lock:
+                    self.counts['errors'] += 1
+                    self.counts['dead'] += len(dead)
+                    if retry:
+                        # Re-spool the leftovers before the old segments go
+                        path = self._new_segment_path()
+                        with open(path, 'w', encoding='utf-8') as fh:
+                            fh.writelines(json.dumps(e, separators=(',', ':')) + '\n' for e in retry)
+                        self._pending[:0] = retry
+                        self._segments.insert(0, path)
+            with self._lock:
+                self._inflight = []
+                self.counts['written'] += written
+                self.counts['batches'] += 1
+                self._drained.notify_all()
+            for path in segments:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            return written
+
+    def _write_rows(self, entries):
+        """Write a failed batch one row at a time; return (written, to retry, dead)."""
+        written, retry, dead = 0, [], []
+        for i, entry in enumerate(entries):
+            try:
+                written += write_entries([entry])
+            except TRANSIENT_ERRORS:
+                retry.extend(entries[i:])
+                break
+            except Exception as exc:
+                entry['attempts'] = entry.get('attempts', 0) + 1
+                if entry['attempts'] < MAX_ATTEMPTS:
+                    retry.append(entry)
+                else:
+                    entry['error'] = repr(exc)
+                    dead.append(entry)
+        return written, retry, dead
+
+    def _dead_letter(self, entries):
+        if not entries:
+            return
+        path = os.path.join(self.spool_dir, DEAD_LETTER)
+        with open(path, 'a', encoding='utf-8') as fh:
+            for entry in entries:
+                fh.write(json.dumps(entry, separators=(',', ':')) + '\n')
+                logger.error('dropping transcript entry after %d failed writes (%s); kept in %s',
+                             entry['attempts'], entry['error'], path)
+
+    def claim_orphans(self, min_age=ORPHAN_AGE):
+        """Take over spool files left by dead processes; return how many entries were claimed."""
+        with self._lock:
+            own = set(self._segments)
+        claimed = 0
+        now = time.time()
+        with os.scandir(self.spool_dir) as it:
+            candidates = [e.path for e in it if e.name.startswith(SEGMENT_PREFIX) and e.path not in own]
+        for path in candidates:
+            try:
+                if now - os.path.getmtime(path) < min_age:
+                    continue
+                with self._lock:
+                    target = self._new_segment_path()
+                # Atomic: if another process renamed it first, this fails and we move on
+                os.rename(path, target)
+            except OSError:
+                continue
+            entries = read_segment(target)
+            with self._lock:
+                self._pending[:0] = entries
+                self._segments.append(target)
+                self.counts['replayed'] += len(entries)
+            claimed += len(entries)
+        return claimed
+
+    def _ensure_worker(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='transcript-writer', daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        next_scan = 0.0
+        while True:
+            if time.monotonic() >= next_scan:
+                next_scan = time.monotonic() + ORPHAN_SCAN_EVERY
+                try:
+                    self.claim_orphans()
+                except OSError:
+                    logger.exception('could not scan transcript spool %s', self.spool_dir)
+            with self._lock:
+                if not self._stopping and len(self._pending) < self.batch_size:
+                    self._wakeup.wait(self.flush_interval)
+                stopping = self._stopping
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('transcript flush failed; retrying in %.1fs', self.flush_interval)
+                connection.close()
+                if stopping:
+                    break
+                time.sleep(self.flush_interval)
+            if stopping:
+                break
+        connection.close()
+
+    def stop(self, timeout=5.0):
+        """Flush what is queued and stop the worker (registered with atexit)."""
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts, pending=len(self._pending) + len(self._inflight))
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Return the TranscriptQueue, or None when write-behind is disabled."""
+    global _queue
+    config = getattr(settings, 'FITMIND_TRANSCRIPT_QUEUE', None) or {}
+    if not config.get('ENABLED'):
+        return None
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = TranscriptQueue(
+                    config['SPOOL_DIR'],
+                    batch_size=config.get('BATCH_SIZE', 100),
+                    flush_interval=config.get('FLUSH_INTERVAL', 0.5),
+                    max_pending=config.get('MAX_PENDING', 5000),
+                    fsync=config.get('FSYNC', False),
+                )
+    return _queue
+
+
+def _submit(entries):
+    queue = get_queue()
+    if queue is None:
+        write_entries(entries)
+        return
+    for entry in entries:
+        queue.put(entry)
+
+
+def record_session_messages(session, messages):
+    """Persist (role, content) pairs for `session`, in order."""
+    at = timezone.now().isoformat()
+    _submit([{'kind': 'session', 'session_id': session.pk, 'role': role, 'content': content, 'at': at}
+             for role, content in messages])
+
+
+def record_chat_message(user, message, response):
+    _submit([{'kind': 'chat', 'user_id': user.pk, 'message': message, 'response': response,
+              'at': timezone.now().isoformat()}])
+
+
+def pending_for_session(session_id):
+    """Queued, not yet written messages of a session as (None, role, content), newest first."""
+    queue = get_queue()
+    if queue is None:
+        return []
+    return [(None, e['role'], e['content']) for e in reversed(queue.pending('session', 'session_id', session_id))]
@@ -2,14 +2,31 @@ from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.auth import authenticate, login as auth_login, logout as auth_logout
 from django.contrib.auth.models import User
-from django.http import JsonResponse, HttpResponseForbidden
+from django.http import HttpResponse, JsonResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-import os
-import requests
+from django.db import transaction
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 import json
+import logging
+from datetime import datetime
 from .models import Workout, MealPlan, Meditation, ChatMessage
-from .models import Workout, MealPlan, Meditation, ChatMessage, ChatSession, SessionMessage, UserProfile
+from .models import Workout, MealPlan, Meditation, ChatMessage, ChatSession, UserProfile
+from .intents import route_intent
+from .profiles import aget_snapshot, get_snapshot
+from .context import build_session_prompt
+from .dashboard import build_dashboard
+from .pagination import InvalidCursor, akeyset_page, keyset_page, page_size
+from .catalog import (
+    CATALOG_MODELS, CATALOG_QUERY, QUERY_CACHE_TIMEOUT, SERIALIZED_FIELDS, CatalogQueryError,
+    catalog_facets, catalog_ordering, catalog_page, catalog_version, parse_catalog_filters, query_cache_key,
+)
+from . import export, llm, metrics, recommend, response_cache, retention, search, transcripts
+
+
+logger = logging.getLogger(__name__)
 
 
 def first(request):
@@ -20,19 +37,155 @@ def dashboard(request):
     return render(request, 'dashboard.html')
 
 
+@require_http_methods(["GET"])
+def api_dashboard(request):
+    # Assignments, progress and suggestions for the signed-in user, in a fixed number of queries
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=403)
+    return JsonResponse(build_dashboard(request.user))
+
+
+@require_http_methods(["GET"])
+def api_recommendations(request):
+    """Top catalog items for the signed-in user: the nightly precomputed list, or scored live.
+
+    ?kind= limits to one catalog, ?limit= sets items per catalog (max 10).
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=403)
+    kinds = list(recommend.CATALOG_MODELS)
+    kind = request.GET.get('kind')
+    if kind:
+        if kind not in kinds:
+            return JsonResponse({'error': f'kind must be one of {", ".join(kinds)}'}, status=400)
+        kinds = [kind]
+    try:
+        limit = min(max(int(request.GET.get('limit', 5)), 1), recommend.PRECOMPUTED_ITEMS)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+
+    profile = None
+    result = {}
+    for kind in kinds:
+        items = recommend.stored_items(request.user.pk, kind, limit)
+        precomputed = items is not None
+        if not precomputed:
+            profile = profile or get_snapshot(request.user)
+            items = [(item_id, name) for item_id, name, _ in recommend.top_items(kind, profile, limit)]
+        result[kind] = {'precomputed': precomputed, 'items': [{'id': i, 'name': n} for i, n in items]}
+    return JsonResponse(result)
+
+
+# Catalog pages: the querysets stay lazy and are only evaluated when the
+# template's versioned fragment cache misses.
+@catalog_page('workouts')
 def workouts(request):
     workout_list = Workout.objects.all()
-    return render(request, 'workouts.html', {'workouts': workout_list})
+    return render(request, 'workouts.html', {'workouts': workout_list, 'catalog_version': catalog_version('workouts')})
 
 
+@catalog_page('meditations')
 def meditation(request):
     meditation_list = Meditation.objects.all()
-    return render(request, 'meditation.html', {'meditations': meditation_list})
+    return render(request, 'meditation.html', {'meditations': meditation_list, 'catalog_version': catalog_version('meditations')})
 
 
+@catalog_page('meals')
 def nutrition(request):
     meal_list = MealPlan.objects.all()
-    return render(request, 'nutrition.html', {'meals': meal_list})
+    return render(request, 'nutrition.html', {'meals': meal_list, 'catalog_version': catalog_version('meals')})
+
+
+@require_http_methods(["GET"])
+def api_catalog(request, kind):
+    # Filtered, sorted, cursor-paginated catalog listing with facet counts
+    if kind not in CATALOG_QUERY:
+        return JsonResponse({'error': 'unknown catalog'}, status=404)
+
+    key = query_cache_key(kind, request.GET.dict())
+    payload = cache.get(key)
+    if payload is None:
+        try:
+            filters = parse_catalog_filters(kind, request.GET)
+            ordering = catalog_ordering(kind, request.GET.get('sort'))
+            lookups = {}
+            for conditions in filters.values():
+                lookups.update(conditions)
+            # Cursors are built from the ordering fields, so each must be selected
+            fields = SERIALIZED_FIELDS[kind]
+            fields += tuple(f.lstrip('-') for f in ordering if f.lstrip('-') not in fields)
+            items = CATALOG_MODELS[kind].objects.filter(**lookups).values(*fields)
+            page, next_cursor = keyset_page(items, ordering, request.GET.get('cursor'), page_size(request))
+        except (CatalogQueryError, InvalidCursor) as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        payload = {
+            'results': [{k: v.isoformat() if isinstance(v, datetime) else v for k, v in row.items()}
+                        for row in page],
+            'next_cursor': next_cursor,
+            'facets': catalog_facets(kind, filters),
+        }
+        cache.set(key, payload, QUERY_CACHE_TIMEOUT)
+    return JsonResponse(payload)
+
+
+@require_http_methods(["GET"])
+def api_search(request):
+    # Ranked full-text search; catalog hits for everyone, chat history only for its owner
+    text = request.GET.get('q', '').strip()
+    if not text:
+        return JsonResponse({'error': 'q is required'}, status=400)
+    kinds = [k for k in request.GET.get('kind', '').split(',') if k] or None
+    if not request.user.is_authenticated:
+        kinds = [k for k in (kinds or search.PUBLIC_KINDS) if k in search.PUBLIC_KINDS]
+    results = search.search(text, kinds=kinds, user=request.user if request.user.is_authenticated else None,
+                            limit=page_size(request))
+    return JsonResponse({'results': results})
+
+
+@require_http_methods(["GET"])
+def api_export(request):
+    """Stream the signed-in user's data as NDJSON or CSV (?dataset=a,b &format= &gzip=1).
+
+    Staff may export another user with ?user=<id>, or everyone with ?user=all.
+    Archived chat history is included.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=403)
+    user_id = request.user.pk
+    requested = request.GET.get('user')
+    if requested and requested != str(user_id):
+        if not request.user.is_staff:
+            return JsonResponse({'error': 'Only staff can export other users'}, status=403)
+        if requested == 'all':
+            user_id = None
+        elif requested.isdigit():
+            user_id = int(requested)
+        else:
+            return JsonResponse({'error': 'user must be an id or "all"'}, status=400)
+    fmt = request.GET.get('format', 'ndjson')
+    compress = request.GET.get('gzip') in ('1', 'true')
+    try:
+        datasets = export.check_export([d for d in request.GET.get('dataset', '').split(',') if d], fmt)
+    except export.ExportError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    content_type = 'application/gzip' if compress else ('text/csv' if fmt == 'csv' else 'application/x-ndjson')
+    # Under ASGI a sync iterator would be buffered whole before the first byte is sent
+    chunks = export.aexport_chunks if isinstance(request, ASGIRequest) else export.export_chunks
+    response = StreamingHttpResponse(chunks(datasets, user_id, fmt, compress), content_type=content_type)
+    filename = export.export_filename(datasets, user_id, fmt, compress)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@require_http_methods(["GET"])
+def metrics_view(request):
+    # Prometheus scrape endpoint; see FITMIND_METRICS['TOKEN']
+    token = metrics.get_config()['TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden('metrics token required')
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 def login(request):
@@ -86,65 +239,106 @@ def logout(request):
 
 @csrf_exempt
 @require_http_methods(["GET", "POST"])
-def chatbot(request):
+async def chatbot(request):
     if request.method == 'GET':
-        return render(request, 'chatbot.html')
+        # The template reads request.user, which may query; keep that off the event loop
+        return await sync_to_async(render)(request, 'chatbot.html')
     
     if request.method == 'POST':
         try:
+            user = await request.auser()
             data = json.loads(request.body)
             user_message = data.get('message', '').strip()
             
             if not user_message:
                 return JsonResponse({'response': 'Please ask me something!'}, status=400)
             
-            print(f"[DEBUG] Received message: {user_message}")
-            print(f"[DEBUG] User authenticated: {request.user.is_authenticated}")
-            print(f"[DEBUG] User: {request.user.username if request.user.is_authenticated else 'Anonymous'}")
-            
-            # Get user profile if authenticated
-            profile = None
-            if request.user.is_authenticated:
-                try:
-                    profile = UserProfile.objects.get(user=request.user)
-                    print(f"[DEBUG] Profile loaded: age={profile.age}, BMI={profile.bmi()}, stress={profile.stress_level}, activity_level={profile.activity_level}")
-                except UserProfile.DoesNotExist:
-                    profile = None
-                    print("[DEBUG] No profile found for user")
-            else:
-                print("[DEBUG] User not authenticated")
-            
-            # Generate response based on profile and message
-            response_text = generate_chatbot_response(user_message, profile)
-            print(f"[DEBUG] Generated response: {response_text[:100]}...")
-            
-            # Save chat message if user is authenticated
-            if request.user.is_authenticated:
-                ChatMessage.objects.create(
-                    user=request.user,
-                    message=user_message,
-                    response=response_text
-                )
-            
+            # Profile lookup, reply and save all touch the DB: one thread hop for the lot
+            response_text = await sync_to_async(chatbot_turn)(user, user_message)
             return JsonResponse({'response': response_text})
         
         except json.JSONDecodeError:
             return JsonResponse({'response': 'Invalid request format.'}, status=400)
-        except Exception as e:
-            print(f"[DEBUG] Exception: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception('chatbot request failed')
             return JsonResponse({'response': 'An error occurred. Please try again.'}, status=500)
 
 
+def chatbot_turn(user, user_message):
+    """Answer one chatbot message for `user` and save it if they are logged in."""
+    # Get user profile if authenticated (cached snapshot, no query when warm)
+    profile = get_snapshot(user)
+    logger.debug('chatbot message received', extra={
+        'chars': len(user_message), 'authenticated': user.is_authenticated, 'has_profile': profile is not None,
+    })
+    response_text = generate_chatbot_response(user_message, profile)
+    logger.debug('chatbot reply generated', extra={'chars': len(response_text)})
+    if user.is_authenticated:
+        transcripts.record_chat_message(user, user_message, response_text)
+    return response_text
+
+
+MAX_BATCH_MESSAGES = 500
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def chatbot_batch(request):
+    # Answer a list of messages in one request: one profile lookup, one bulk insert.
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'invalid json'}, status=400)
+
+    user_messages = data.get('messages') if isinstance(data, dict) else None
+    if not isinstance(user_messages, list) or not user_messages:
+        return JsonResponse({'error': 'messages must be a non-empty list'}, status=400)
+    if len(user_messages) > MAX_BATCH_MESSAGES:
+        return JsonResponse({'error': f'at most {MAX_BATCH_MESSAGES} messages per batch'}, status=400)
+    if not all(isinstance(m, str) for m in user_messages):
+        return JsonResponse({'error': 'messages must be strings'}, status=400)
+
+    profile = get_snapshot(request.user)
+
+    responses = []
+    rows = []
+    for raw in user_messages:
+        user_message = raw.strip()
+        if not user_message:
+            responses.append('Please ask me something!')
+            continue
+        response_text = generate_chatbot_response(user_message, profile)
+        responses.append(response_text)
+        if request.user.is_authenticated:
+            rows.append(ChatMessage(user=request.user, message=user_message, response=response_text))
+
+    if rows:
+        with transaction.atomic():
+            ChatMessage.objects.bulk_create(rows)
+            # bulk_create skips post_save, so index the new rows here
+            search.index_objects(rows)
+
+    return JsonResponse({'responses': responses})
+
+
+def _catalog_picks(kind, profile, k=3):
+    # Best-matching catalog items, from the vectorized scorer in maini.recommend
+    items = recommend.top_items(kind, profile, k)
+    return f"\n\nFrom our catalog: {', '.join(name for _, name, _ in items)}." if items else ''
+
+
 def generate_chatbot_response(user_message, profile=None):
-    """Generate personalized responses based on message and user profile."""
+    """Generate personalized responses based on message and user profile.
+
+    The topic is picked by the precompiled router in ``maini.intents``; keyword
+    lists and their priority order live there. `profile` is a
+    ``maini.profiles.ProfileSnapshot`` (or None).
+    """
     message_lower = user_message.lower()
-    words = set(message_lower.split())
+    intent = route_intent(message_lower)
 
     # Safety checks for crisis language
-    crisis_terms = ['suicide', 'self-harm', 'kill myself', "i can't go on", 'hurt myself', 'want to die']
-    if any(term in message_lower for term in crisis_terms):
+    if intent == 'crisis':
         direct = "I’m really sorry you’re feeling this way — I’m here with you."
         guidance = (
             "If you are in immediate danger, please call your local emergency services right now. "
@@ -155,24 +349,23 @@ def generate_chatbot_response(user_message, profile=None):
         return f"Direct Answer: {direct}\n\nPersonalized Guidance: {guidance}\n\nMotivation Line: {motivation}"
 
     # Meditation & Mindfulness
-    meditation_keywords = {'meditation', 'mindfulness', 'breathe', 'breathing', 'relax', 'relaxation', 'calm', 'peace', 'focus', 'anxiety', 'worry'}
-    if any(word in words for word in meditation_keywords) or 'stress' in message_lower:
+    if intent == 'meditation':
         direct = "Try a short guided breathing practice to settle your mind."
-        if profile and profile.stress_level == 'high':
+        if profile and profile.high_stress:
             direct += " Given your high stress level, this is especially important for you."
         
         guidance = ("1) Sit comfortably and close your eyes. 2) Inhale for 4 counts, hold 1, exhale for 6 — repeat 6 times. "
                     "3) If you have 5 minutes, try a body-scan: notice toes → legs → torso → shoulders → jaw.")
         
-        if profile and profile.sleep_hours and profile.sleep_hours < 6:
+        if profile and profile.low_sleep:
             guidance += f"\n\nNote: Your sleep is low ({profile.sleep_hours}hrs). Meditation can help improve sleep quality."
         
+        guidance += _catalog_picks('meditations', profile)
         motivation = "Small practices add up — great choice taking this step."
         return f"Direct Answer: {direct}\n\nPersonalized Guidance: {guidance}\n\nMotivation Line: {motivation}"
 
     # Workout & Exercise
-    workout_keywords = {'workout', 'exercise', 'training', 'gym', 'pushups', 'squat', 'fitness', 'run', 'walk', 'cardio', 'strength', 'sport', 'active', 'move'}
-    if any(word in words for word in workout_keywords):
+    if intent == 'workout':
         direct = "You can do a short, effective bodyweight workout right now."
         
         # Personalize based on activity level
@@ -192,38 +385,38 @@ def generate_chatbot_response(user_message, profile=None):
             guidance = ("1) Warm-up 3 minutes. 2) Circuit — 3 rounds: 10 squats, 10 push-ups, 20s plank. "
                        "3) Cool down with stretching. Total time ~15–20 minutes.")
         
-        if profile and profile.sleep_hours and profile.sleep_hours < 6:
+        if profile and profile.low_sleep:
             guidance += f"\n\nTip: Your sleep is low ({profile.sleep_hours}hrs). Good recovery sleep helps. Prioritize sleep tonight!"
         
+        guidance += _catalog_picks('workouts', profile)
         motivation = "Consistency beats intensity — you're building a healthy habit."
         return f"Direct Answer: {direct}\n\nPersonalized Guidance: {guidance}\n\nMotivation Line: {motivation}"
 
     # Nutrition & Diet
-    nutrition_keywords = {'diet', 'nutrition', 'meal', 'calories', 'protein', 'vegetarian', 'vegan', 'snack', 'eat', 'food', 'weight', 'cook', 'recipe', 'healthy'}
-    if any(word in words for word in nutrition_keywords):
+    if intent == 'nutrition':
         direct = "Aim for balanced meals with protein, vegetables, and whole grains."
         
         # Personalize based on BMI
         if profile:
-            bmi = profile.bmi()
+            bmi = profile.bmi
             if bmi and bmi > 25:
-                direct += f" Your BMI is {bmi:.1f} ({profile.bmi_category()}). Focus on whole foods and portion control."
+                direct += f" Your BMI is {bmi:.1f} ({profile.bmi_category}). Focus on whole foods and portion control."
             elif bmi and bmi < 18.5:
-                direct += f" Your BMI is {bmi:.1f} ({profile.bmi_category()}). Eat enough calories with nutrient-dense foods."
+                direct += f" Your BMI is {bmi:.1f} ({profile.bmi_category}). Eat enough calories with nutrient-dense foods."
         
         guidance = ("1) Swap refined carbs for whole grains (brown rice, whole wheat bread). "
                    "2) Add a protein source each meal (eggs, lentils, tofu, chicken). "
                    "3) For late-night cravings try a small protein-rich snack: Greek yogurt or a handful of nuts.")
         
-        if profile and profile.stress_level == 'high':
+        if profile and profile.high_stress:
             guidance += "\n\nTip: Reduce caffeine and sugar during stressful times — they can increase anxiety."
         
+        guidance += _catalog_picks('meals', profile)
         motivation = "Small swaps make big differences over time — you've got this."
         return f"Direct Answer: {direct}\n\nPersonalized Guidance: {guidance}\n\nMotivation Line: {motivation}"
 
     # Sleep & Rest
-    sleep_keywords = {'sleep', 'insomnia', 'tired', 'rest', 'fatigue', 'sleepy', 'awake', 'bed', 'nap', 'dream'}
-    if any(word in words for word in sleep_keywords):
+    if intent == 'sleep':
         direct = "Improve sleep with a consistent wind-down routine."
         
         if profile and profile.sleep_hours:
@@ -242,15 +435,14 @@ def generate_chatbot_response(user_message, profile=None):
         return f"Direct Answer: {direct}\n\nPersonalized Guidance: {guidance}\n\nMotivation Line: {motivation}"
 
     # Mental Health & Mood (new)
-    mood_keywords = {'mood', 'happy', 'sad', 'depressed', 'energy', 'motivation', 'confidence', 'brain', 'mental', 'feeling', 'emotion'}
-    if any(word in words for word in mood_keywords):
+    if intent == 'mood':
         direct = "Taking care of your mental health is just as important as physical fitness."
         
         if profile:
             suggestions = []
-            if profile.stress_level == 'high':
+            if profile.high_stress:
                 suggestions.append("meditation or breathing exercises (you have high stress)")
-            if profile.sleep_hours and profile.sleep_hours < 6:
+            if profile.low_sleep:
                 suggestions.append("improving sleep (you're sleeping less than ideal)")
             if profile.activity_level == 'low':
                 suggestions.append("light exercise (movement boosts mood)")
@@ -266,8 +458,7 @@ def generate_chatbot_response(user_message, profile=None):
         return f"Direct Answer: {direct}\n\nPersonalized Guidance: {guidance}\n\nMotivation Line: {motivation}"
 
     # Habit Building (new)
-    habit_keywords = {'habit', 'routine', 'goal', 'progress', 'improve', 'change', 'build', 'track', 'consistency'}
-    if any(word in words for word in habit_keywords):
+    if intent == 'habit':
         direct = "Building healthy habits takes patience and self-compassion."
         
         guidance = ("1) Start small: one tiny habit (5 min). 2) Track daily for a week — see momentum. "
@@ -286,9 +477,9 @@ def generate_chatbot_response(user_message, profile=None):
         if profile:
             # Suggest based on profile weaknesses
             suggestions = []
-            if profile.stress_level == 'high':
+            if profile.high_stress:
                 suggestions.append("meditation (your stress is high)")
-            if profile.sleep_hours and profile.sleep_hours < 6:
+            if profile.low_sleep:
                 suggestions.append("sleep routine (your sleep is low)")
             if profile.activity_minutes and profile.activity_minutes < 30:
                 suggestions.append("a quick workout (boost your activity)")
@@ -306,8 +497,8 @@ def generate_chatbot_response(user_message, profile=None):
     guidance = "Choose one topic: meditation (5 min), a quick workout (15 min), a meal swap, better sleep, or building a habit. I'll give a short plan."
     
     if profile:
-        bmi = profile.bmi()
-        guidance += f"\n\nYour profile shows: BMI {bmi:.1f} ({profile.bmi_category()}), stress level '{profile.stress_level}', activity level '{profile.activity_level}'. I can tailor advice!"
+        bmi = profile.bmi
+        guidance += f"\n\nYour profile shows: BMI {bmi:.1f} ({profile.bmi_category}), stress level '{profile.stress_level}', activity level '{profile.activity_level}'. I can tailor advice!"
     
     motivation = "You're taking a great step — let's make it simple and do-able."
     return f"Direct Answer: {direct}\n\nPersonalized Guidance: {guidance}\n\nMotivation Line: {motivation}"
@@ -315,15 +506,21 @@ def generate_chatbot_response(user_message, profile=None):
 
 # --- New API endpoints for chat sessions and Gemini relay ---
 @require_http_methods(["GET", "POST"])
-def api_chatsessions(request):
+async def api_chatsessions(request):
     # List or create chat sessions for the authenticated user
-    if not request.user.is_authenticated:
+    user = await request.auser()
+    if not user.is_authenticated:
         return HttpResponseForbidden('Authentication required')
 
     if request.method == 'GET':
-        sessions = request.user.chat_sessions.all().order_by('-updated_at')
-        data = [{'id': s.id, 'title': s.title, 'updated_at': s.updated_at.isoformat()} for s in sessions]
-        return JsonResponse({'sessions': data})
+        # Newest first, one page at a time; pass back `next_cursor` as ?cursor= for more
+        sessions = user.chat_sessions.only('id', 'title', 'updated_at')
+        try:
+            page, next_cursor = await akeyset_page(sessions, ('-updated_at', '-id'), request.GET.get('cursor'), page_size(request))
+        except InvalidCursor:
+            return JsonResponse({'error': 'invalid cursor'}, status=400)
+        data = [{'id': s.id, 'title': s.title, 'updated_at': s.updated_at.isoformat()} for s in page]
+        return JsonResponse({'sessions': data, 'next_cursor': next_cursor})
 
     # POST -> create new session with optional title
     try:
@@ -331,24 +528,33 @@ def api_chatsessions(request):
     except Exception:
         payload = {}
     title = payload.get('title') or 'New chat'
-    sess = ChatSession.objects.create(user=request.user, title=title)
-    return JsonResponse({'id': sess.id, 'title': sess.title})
+    sess = await ChatSession.objects.acreate(user=user, title=title, cache_opt_out=bool(payload.get('cache_opt_out')))
+    return JsonResponse({'id': sess.id, 'title': sess.title, 'cache_opt_out': sess.cache_opt_out})
 
 
 @require_http_methods(["GET", "POST"])
-def api_session_messages(request, session_id):
+async def api_session_messages(request, session_id):
     # Get or append messages for a given session. Posting a user message will relay to Gemini and save assistant reply.
-    if not request.user.is_authenticated:
+    user = await request.auser()
+    if not user.is_authenticated:
         return HttpResponseForbidden('Authentication required')
 
     try:
-        session = ChatSession.objects.get(id=session_id, user=request.user)
+        session = await ChatSession.objects.aget(id=session_id, user=user)
     except ChatSession.DoesNotExist:
         return JsonResponse({'error': 'session not found'}, status=404)
 
     if request.method == 'GET':
-        msgs = [{'role': m.role, 'content': m.content, 'created_at': m.created_at.isoformat()} for m in session.messages.all()]
-        return JsonResponse({'messages': msgs, 'session': {'id': session.id, 'title': session.title}})
+        # Pages walk backwards from the newest message; each page is returned oldest-first
+        history = session.messages.values('id', 'role', 'content', 'created_at')
+        try:
+            page, next_cursor = await akeyset_page(history, ('-created_at', '-id'), request.GET.get('cursor'), page_size(request))
+        except InvalidCursor:
+            return JsonResponse({'error': 'invalid cursor'}, status=400)
+        msgs = [{'role': m['role'], 'content': m['content'], 'created_at': m['created_at'].isoformat()} for m in reversed(page)]
+        return JsonResponse({'messages': msgs, 'next_cursor': next_cursor,
+                             'session': {'id': session.id, 'title': session.title,
+                                         'archived': session.archived_at is not None}})
 
     # POST: user sends message -> save, send to Gemini, save assistant reply, return reply
     try:
@@ -357,24 +563,14 @@ def api_session_messages(request, session_id):
         if not user_text:
             return JsonResponse({'error': 'empty message'}, status=400)
 
-        # Save user message
-        SessionMessage.objects.create(session=session, role='user', content=user_text)
-
-        # Build simple context: last N messages
-        history = session.messages.all().order_by('created_at')
-        prompt_parts = []
-        for m in history:
-            prompt_parts.append(f"{m.role}: {m.content}")
-        prompt_parts.append(f"user: {user_text}")
-        prompt = "\n".join(prompt_parts[-20:])
+        prompt, profile = await sync_to_async(open_session_turn)(session, user, user_text)
 
         # Call Gemini
-        assistant_reply = call_gemini(prompt)
+        assistant_reply = await acall_gemini(prompt, fallback_message=user_text, profile=profile,
+                                             cacheable=not session.cache_opt_out)
 
-        # Save assistant reply
-        SessionMessage.objects.create(session=session, role='assistant', content=assistant_reply)
-        session.updated_at = session.updated_at
-        session.save()
+        # Save assistant reply; the writer bumps session.updated_at when it lands
+        await sync_to_async(transcripts.record_session_messages)(session, [('assistant', assistant_reply)])
 
         return JsonResponse({'reply': assistant_reply})
 
@@ -384,99 +580,160 @@ def api_session_messages(request, session_id):
         return JsonResponse({'error': str(e)}, status=500)
 
 
-def call_gemini(prompt_text: str) -> str:
+def open_session_turn(session, user, user_text):
+    """Build the prompt from prior turns, save the user message; return (prompt, profile snapshot)."""
+    prompt = build_session_prompt(session, user_text)
+    transcripts.record_session_messages(session, [('user', user_text)])
+    return prompt, get_snapshot(user)
+
+
+@require_http_methods(["POST"])
+async def api_session_restore(request, session_id):
+    # Bring archived messages (see maini.retention) back into the session's history
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponseForbidden('Authentication required')
+    try:
+        session = await ChatSession.objects.aget(id=session_id, user=user)
+    except ChatSession.DoesNotExist:
+        return JsonResponse({'error': 'session not found'}, status=404)
+    restored = await sync_to_async(retention.restore_session)(session) if session.archived_at else 0
+    return JsonResponse({'restored': restored})
+
+
+@require_http_methods(["POST"])
+async def api_session_messages_stream(request, session_id):
+    # Streaming variant of api_session_messages: relays Gemini tokens as server-sent events.
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponseForbidden('Authentication required')
+
+    try:
+        session = await ChatSession.objects.aget(id=session_id, user=user)
+    except ChatSession.DoesNotExist:
+        return JsonResponse({'error': 'session not found'}, status=404)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'invalid json'}, status=400)
+    message = data.get('message') if isinstance(data, dict) else None
+    if message is not None and not isinstance(message, str):
+        return JsonResponse({'error': 'message must be a string'}, status=400)
+    user_text = (message or '').strip()
+    if not user_text:
+        return JsonResponse({'error': 'empty message'}, status=400)
+
+    prompt, profile = await sync_to_async(open_session_turn)(session, user, user_text)
+    reply_cache = None if session.cache_opt_out else response_cache.get_cache()
+
+    async def events():
+        parts = []
+        cache_key = None
+        cached = None
+        if reply_cache:
+            cache_key = response_cache.make_key(prompt, profile)
+            cached = reply_cache.get(cache_key)
+
+        if cached is not None:
+            parts.append(cached)
+            yield llm.sse_event({'delta': cached})
+        else:
+            try:
+                async for chunk in llm.stream_gemini(prompt):
+                    parts.append(chunk)
+                    yield llm.sse_event({'delta': chunk})
+                if cache_key and parts:
+                    reply_cache.set(cache_key, ''.join(parts))
+            except Exception as e:
+                # Not configured, circuit open or the stream broke: answer from the rule-based
+                # engine like acall_gemini. A partial reply is dropped; 'done' replaces it client-side
+                if not isinstance(e, (llm.NotConfigured, llm.LLMUnavailable)):
+                    logger.warning('Gemini stream failed after %d fragments: %r', len(parts), e)
+                fallback = await sync_to_async(_unavailable_reply)(e, user_text, profile)
+                parts = [fallback]
+                yield llm.sse_event({'delta': fallback})
+
+        # Save assistant reply only once the full stream has arrived
+        assistant_reply = ''.join(parts) or "(No response from Gemini)"
+        await sync_to_async(transcripts.record_session_messages)(session, [('assistant', assistant_reply)])
+        yield llm.sse_event({'reply': assistant_reply}, event='done')
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _cached_reply(prompt_text, profile, cacheable):
+    """(cache key, cached reply or None); the key is None when the reply must not be cached."""
+    reply_cache = response_cache.get_cache() if cacheable else None
+    if not reply_cache:
+        return None, None
+    cache_key = response_cache.make_key(prompt_text, profile)
+    return cache_key, reply_cache.get(cache_key)
+
+
+def _store_reply(cache_key, reply):
+    if cache_key:
+        response_cache.get_cache().set(cache_key, reply)
+
+
+def _unavailable_reply(error, fallback_message, profile):
+    # What to answer instead when Gemini isn't configured or can't be reached
+    if isinstance(error, llm.NotConfigured):
+        return llm.NOT_CONFIGURED_REPLY
+    return generate_chatbot_response(fallback_message, profile)
+
+
+def call_gemini(prompt_text: str, fallback_message: str = None, profile=None, cacheable: bool = False) -> str:
     """Relay function to call Google Gemini 2.5 Flash via the Generative API.
     Requires environment variable `GOOGLE_API_KEY` (API key) or `GOOGLE_API_BEARER` (Bearer token).
-    Falls back to a helpful message if there's an error.
+    When Gemini is failing (or its circuit breaker is open) the rule-based
+    `generate_chatbot_response` answers `fallback_message` for `profile` instead.
+    With `cacheable`, replies are served from and stored in the response cache.
     """
-    api_key = os.environ.get('GOOGLE_API_KEY')
-    bearer = os.environ.get('GOOGLE_API_BEARER')
-
-    url = 'https://generativelanguage.googleapis.com/v1beta2/models/gemini-2.5-flash:generateMessage'
-    headers = {'Content-Type': 'application/json'}
-    params = {}
-    if api_key:
-        params['key'] = api_key
-    elif bearer:
-        headers['Authorization'] = f'Bearer {bearer}'
-    else:
-        return "(Gemini not configured) Please set GOOGLE_API_KEY or GOOGLE_API_BEARER on the server."
-
-    # Prepend a system-style FitMind prompt to guide Gemini's behavior
-    system_prompt = (
-        "You are FitMind — an intelligent, friendly, and supportive wellness chatbot. "
-        "Guide users across meditation, fitness, nutrition, sleep, mood, and habit-building. "
-        "Always be positive, ask clarifying questions only when needed, provide short actionable steps, and for any indication of self-harm or emergency encourage contacting local emergency services and a professional. "
-        "Return concise outputs in three parts: Direct Answer, Personalized Guidance, Motivation Line."
-    )
-
-    body = {
-        'messages': [
-            { 'author': 'system', 'content': [ { 'type': 'text', 'text': system_prompt } ] },
-            { 'author': 'user', 'content': [ { 'type': 'text', 'text': prompt_text } ] }
-        ],
-        'maxOutputTokens': 512,
-    }
-
+    cache_key, reply = _cached_reply(prompt_text, profile, cacheable)
+    if reply is not None:
+        return reply
     try:
-        resp = requests.post(url, headers=headers, params=params, json=body, timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
-
-        # Try to extract text from the response in a few common locations
-        # Typical structure: { 'candidates': [ { 'content': [ { 'type': 'output_text', 'text': '...' } ] } ] }
-        text = None
-        if isinstance(data, dict):
-            # check 'candidates'
-            candidates = data.get('candidates') or data.get('responses') or []
-            if candidates and isinstance(candidates, list):
-                first = candidates[0]
-                # search in nested content
-                content = first.get('content') or first.get('message') or []
-                if isinstance(content, list) and len(content) > 0:
-                    # find first item with a text-like key
-                    for c in content:
-                        if isinstance(c, dict) and ('text' in c):
-                            text = c.get('text')
-                            break
-                # fallback: first.get('text')
-                if not text:
-                    text = first.get('text')
-
-        if not text:
-            # try alternate field
-            text = data.get('output', {}).get('content', '') if isinstance(data, dict) else None
-
-        return text or "(No response from Gemini)"
-
-    except Exception as e:
-        return f"(Gemini call failed) {str(e)}"
+        reply = llm.get_client().generate(prompt_text)
+    except (llm.NotConfigured, llm.LLMUnavailable) as e:
+        return _unavailable_reply(e, fallback_message or prompt_text, profile)
+    _store_reply(cache_key, reply)
+    return reply
+
+
+async def acall_gemini(prompt_text: str, fallback_message: str = None, profile=None, cacheable: bool = False) -> str:
+    """Async `call_gemini` for async views: the Gemini request is awaited, not run in a thread."""
+    cache_key, reply = _cached_reply(prompt_text, profile, cacheable)
+    if reply is not None:
+        return reply
+    try:
+        reply = await llm.get_client().agenerate(prompt_text)
+    except (llm.NotConfigured, llm.LLMUnavailable) as e:
+        # The rule-based fallback may query the catalog
+        return await sync_to_async(_unavailable_reply)(e, fallback_message or prompt_text, profile)
+    _store_reply(cache_key, reply)
+    return reply
 
 
 @csrf_exempt
 @require_http_methods(["GET", "POST"])
-def api_profile(request):
+async def api_profile(request):
     """Get or update the authenticated user's profile."""
-    if not request.user.is_authenticated:
+    user = await request.auser()
+    if not user.is_authenticated:
         return JsonResponse({'error': 'Authentication required'}, status=403)
 
-    profile, created = UserProfile.objects.get_or_create(user=request.user)
-
     if request.method == 'GET':
-        data = {
-            'profile': {
-                'age': profile.age,
-                'height_cm': profile.height_cm,
-                'weight_kg': profile.weight_kg,
-                'sleep_hours': profile.sleep_hours,
-                'activity_minutes': profile.activity_minutes,
-                'activity_level': profile.activity_level,
-                'stress_level': profile.stress_level,
-                'bmi': profile.bmi(),
-                'bmi_category': profile.bmi_category(),
-            }
-        }
-        return JsonResponse(data)
+        snapshot = await aget_snapshot(user)
+        if snapshot is None:
+            await UserProfile.objects.aget_or_create(user=user)
+            snapshot = await aget_snapshot(user)
+        return JsonResponse({'profile': snapshot.as_dict()})
+
+    profile, created = await UserProfile.objects.aget_or_create(user=user)
 
     # POST -> update
     try:
@@ -492,28 +749,16 @@ def api_profile(request):
                 if val is not None:
                     setattr(profile, fld, val)
             except Exception as e:
-                print(f'Error setting {fld}: {e}')
+                logger.warning('could not set profile field %s: %s', fld, e)
 
     for fld in ['activity_level', 'stress_level']:
         if fld in payload and payload.get(fld) is not None:
             setattr(profile, fld, payload.get(fld))
 
     try:
-        profile.save()
+        await profile.asave()
     except Exception as e:
         return JsonResponse({'error': f'Save error: {str(e)}'}, status=500)
 
-    return JsonResponse({
-        'ok': True,
-        'profile': {
-            'age': profile.age,
-            'height_cm': profile.height_cm,
-            'weight_kg': profile.weight_kg,
-            'sleep_hours': profile.sleep_hours,
-            'activity_minutes': profile.activity_minutes,
-            'activity_level': profile.activity_level,
-            'stress_level': profile.stress_level,
-            'bmi': profile.bmi(),
-            'bmi_category': profile.bmi_category(),
-        }
-    })
+    # The save dropped the cached snapshot; this reloads it with the stored values
+    return JsonResponse({'ok': True, 'profile': (await aget_snapshot(user)).as_dict()})